@@ -0,0 +1,243 @@
+"""
+Fixed-rate and multi-rate schedulers for the control loop.
+"""
+import time
+import asyncio
+import logging
+from typing import Optional, Dict, Any, Awaitable, Iterable, Set
+
+logger = logging.getLogger(__name__)
+
+
+class FixedRateScheduler:
+    """
+    Schedules cycles on a fixed grid of the monotonic clock.
+
+    Cycle n is due at start + n * interval regardless of how long earlier
+    cycles took, so the period does not drift with the work time. A cycle
+    still running when the next one is due is an overrun. Ticks missed by
+    an overrun are dropped with the 'skip' policy, or run back to back
+    with the 'catch_up' policy (up to max_catch_up ticks).
+    """
+
+    SKIP = 'skip'
+    CATCH_UP = 'catch_up'
+
+    def __init__(self, interval: float, overrun_policy: str = SKIP, max_catch_up: int = 10):
+        """
+        Initialize fixed-rate scheduler.
+
+        Args:
+            interval: Seconds between scheduled cycles
+            overrun_policy: 'skip' or 'catch_up'
+            max_catch_up: Most missed ticks run back to back with 'catch_up'
+        """
+        if overrun_policy not in (self.SKIP, self.CATCH_UP):
+            raise ValueError(f"Unknown overrun policy: {overrun_policy}")
+
+        self.interval = interval
+        self.overrun_policy = overrun_policy
+        self.max_catch_up = max(0, max_catch_up)
+
+        self._next_tick: Optional[float] = None
+        self._cycle_start: Optional[float] = None
+        # Tick the current cycle has to finish by to not overrun
+        self._cycle_deadline: Optional[float] = None
+
+        self.stats: Dict[str, Any] = {
+            'cycles': 0,
+            'woken': 0,
+            'overruns': 0,
+            'skipped': 0,
+            'last_duration': 0.0,
+            'max_duration': 0.0,
+            'last_lateness': 0.0,
+            'max_lateness': 0.0
+        }
+
+    def start(self):
+        """Start the schedule; the first cycle is due immediately."""
+        self._next_tick = time.monotonic()
+
+    async def wait(self, wake_event: Optional[asyncio.Event] = None) -> bool:
+        """
+        Wait until the next cycle is due.
+
+        Args:
+            wake_event: Event that starts an extra cycle before the next tick;
+                an extra cycle does not move the schedule
+
+        Returns:
+            True if the cycle was started by wake_event
+        """
+        if self._next_tick is None:
+            self.start()
+
+        delay = self._next_tick - time.monotonic()
+        if delay > 0:
+            if wake_event is None:
+                await asyncio.sleep(delay)
+            else:
+                try:
+                    await asyncio.wait_for(wake_event.wait(), timeout=delay)
+                    self.stats['woken'] += 1
+                    self._begin(time.monotonic())
+                    return True
+                except asyncio.TimeoutError:
+                    pass
+
+        now = time.monotonic()
+        lateness = max(0.0, now - self._next_tick)
+        self.stats['last_lateness'] = lateness
+        self.stats['max_lateness'] = max(self.stats['max_lateness'], lateness)
+
+        missed = int(lateness // self.interval)
+        if missed and (self.overrun_policy == self.SKIP or missed > self.max_catch_up):
+            # Drop the missed ticks and realign with the grid
+            self._next_tick += missed * self.interval
+            self.stats['skipped'] += missed
+            logger.debug(f"Skipped {missed} missed cycles")
+
+        self._next_tick += self.interval
+        self._begin(now)
+        return False
+
+    def _begin(self, now: float):
+        """Record the start of a cycle."""
+        self._cycle_start = now
+        # Catch-up cycles start after the next tick and cannot overrun it
+        self._cycle_deadline = self._next_tick if self._next_tick > now else None
+        self.stats['cycles'] += 1
+
+    def end_cycle(self) -> bool:
+        """
+        Record the end of the current cycle.
+
+        Returns:
+            True if the cycle overran into the next scheduled tick
+        """
+        if self._cycle_start is None:
+            return False
+
+        now = time.monotonic()
+        duration = now - self._cycle_start
+        self._cycle_start = None
+        self.stats['last_duration'] = duration
+        self.stats['max_duration'] = max(self.stats['max_duration'], duration)
+
+        if self._cycle_deadline is not None and now > self._cycle_deadline:
+            self.stats['overruns'] += 1
+            logger.warning(
+                f"Control cycle overran by {now - self._cycle_deadline:.3f}s "
+                f"(took {duration:.3f}s, interval {self.interval}s)"
+            )
+            return True
+        return False
+
+
+class ScheduledTask:
+    """A periodic part of the control cycle with its own interval and timing stats."""
+
+    def __init__(self, name: str, interval: float):
+        """
+        Initialize scheduled task.
+
+        Args:
+            name: Task name
+            interval: Seconds between runs
+        """
+        self.name = name
+        self.interval = interval
+        self.next_due: Optional[float] = None
+
+        self.stats: Dict[str, Any] = {
+            'runs': 0,
+            'errors': 0,
+            'last_duration': 0.0,
+            'max_duration': 0.0,
+            'total_duration': 0.0
+        }
+
+    def record(self, duration: float, failed: bool = False):
+        """Record one run of the task."""
+        self.stats['runs'] += 1
+        if failed:
+            self.stats['errors'] += 1
+        self.stats['last_duration'] = duration
+        self.stats['max_duration'] = max(self.stats['max_duration'], duration)
+        self.stats['total_duration'] += duration
+
+
+class MultiRateScheduler:
+    """
+    Runs the parts of the control cycle at their own rates.
+
+    The control loop ticks at the base interval and asks at the start of
+    each cycle which tasks are due. Task intervals are kept on their own
+    fixed grid and effectively rounded to the nearest multiple of the base
+    interval; intervals shorter than the base interval run every cycle.
+    """
+
+    def __init__(self, intervals: Dict[str, float], base_interval: float):
+        """
+        Initialize multi-rate scheduler.
+
+        Args:
+            intervals: Dict mapping task name to its interval in seconds
+                (0 or less runs the task every cycle)
+            base_interval: Interval of the control loop in seconds
+        """
+        self.base_interval = base_interval
+        self.tasks: Dict[str, ScheduledTask] = {
+            name: ScheduledTask(name, interval if interval > 0 else base_interval)
+            for name, interval in intervals.items()
+        }
+
+    def start(self):
+        """Start the schedules; all tasks are due immediately."""
+        now = time.monotonic()
+        for task in self.tasks.values():
+            task.next_due = now
+
+    def due_tasks(self, include: Iterable[str] = ()) -> Set[str]:
+        """
+        Get the tasks to run this cycle and advance their schedules.
+
+        Args:
+            include: Tasks to run even if they are not due; their schedule
+                is left unchanged
+
+        Returns:
+            Names of the tasks to run
+        """
+        now = time.monotonic()
+        # Half a base tick of tolerance rounds task intervals to whole ticks
+        horizon = now + self.base_interval / 2
+        due = set()
+        for task in self.tasks.values():
+            if task.next_due is None:
+                task.next_due = now
+            if task.next_due <= horizon:
+                missed = int((horizon - task.next_due) // task.interval)
+                task.next_due += (missed + 1) * task.interval
+                due.add(task.name)
+            elif task.name in include:
+                due.add(task.name)
+        return due
+
+    async def run(self, name: str, request: Awaitable) -> Any:
+        """Run a task and record its timing."""
+        task = self.tasks[name]
+        start = time.monotonic()
+        failed = True
+        try:
+            result = await request
+            failed = False
+            return result
+        finally:
+            task.record(time.monotonic() - start, failed)
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Timing stats per task."""
+        return {name: task.stats for name, task in self.tasks.items()}
@@ -2,23 +2,109 @@
 Home Assistant integration for reading sensors and controlling entities.
 """
 import os
-import json
 import logging
 import aiohttp
 import asyncio
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Iterable, List, NamedTuple, Tuple
+
+from ha_websocket import HomeAssistantWebSocket
+from write_cache import WriteCache
+from request_scheduler import RequestScheduler, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+from resilience import RetryPolicy, CircuitBreaker, CircuitOpenError
+import json_codec
+from json_codec import EntityState
 
 logger = logging.getLogger(__name__)
 
 
+class ServiceTarget(NamedTuple):
+    """Service used to write a value to an entity."""
+    domain: str
+    service: str
+    field: str
+    convert: Optional[Callable[[Any], Any]] = None
+
+
 class HomeAssistantAPI:
     """Home Assistant API client."""
     
-    def __init__(self):
+    # Candidate services per kind of write, in probing order
+    SERVICE_CANDIDATES = {
+        'valve': [
+            ServiceTarget('number', 'set_value', 'value'),
+            ServiceTarget('cover', 'set_cover_position', 'position', int),
+        ],
+        'thermostat': [
+            ServiceTarget('climate', 'set_temperature', 'temperature'),
+            ServiceTarget('number', 'set_value', 'value'),
+        ],
+        'hrv_mode': [
+            ServiceTarget('fan', 'set_preset_mode', 'preset_mode'),
+            ServiceTarget('climate', 'set_hvac_mode', 'hvac_mode'),
+            ServiceTarget('input_select', 'select_option', 'option'),
+        ],
+    }
+    
+    # Write cache attribute and deadband class per kind of write
+    WRITE_ATTRIBUTES = {
+        'valve': ('position', 'valve'),
+        'thermostat': ('temperature', 'temperature'),
+        'hrv_mode': ('mode', None),
+    }
+    
+    # Description of each kind of write in log messages
+    WRITE_DESCRIPTIONS = {
+        'valve': 'valve position',
+        'thermostat': 'thermostat temperature',
+        'hrv_mode': 'HRV mode',
+    }
+    
+    # Request priority per kind of write
+    WRITE_PRIORITIES = {
+        'valve': PRIORITY_NORMAL,
+        'thermostat': PRIORITY_HIGH,
+        'hrv_mode': PRIORITY_NORMAL,
+    }
+    
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
         """Initialize Home Assistant API client."""
+        self.config = config or {}
         self.base_url = os.environ.get('SUPERVISOR_URL', 'http://supervisor')
         self.token = os.environ.get('SUPERVISOR_TOKEN', '')
         self.session: Optional[aiohttp.ClientSession] = None
+        self.websocket: Optional[HomeAssistantWebSocket] = None
+        
+        # Read all states with a single request per cycle
+        self.bulk_state_read = self.config.get('bulk_state_read', True)
+        
+        # Skip writes whose value has not changed since the last cycle
+        self.write_cache = WriteCache(
+            deadbands={
+                'valve': self.config.get('write_deadband_valve', 0.5),
+                'temperature': self.config.get('write_deadband_temperature', 0.1)
+            },
+            refresh_interval=self.config.get('write_refresh_interval', 300)
+        )
+        
+        # Service that worked for each (entity_id, kind of write)
+        self._service_cache: Dict[tuple, ServiceTarget] = {}
+        
+        # Bound the number of concurrent requests against the supervisor
+        self.scheduler = RequestScheduler(self.config.get('max_requests_in_flight', 8))
+        
+        # Retry transient failures and fail fast while the backend is down
+        self.retry_policy = RetryPolicy(
+            max_attempts=self.config.get('retry_attempts', 3),
+            base_delay=self.config.get('retry_base_delay', 0.2)
+        )
+        self.host_breaker = CircuitBreaker(
+            self.base_url,
+            failure_threshold=self.config.get('circuit_failure_threshold', 5),
+            recovery_timeout=self.config.get('circuit_recovery_timeout', 30)
+        )
+        self.entity_breakers: Dict[str, CircuitBreaker] = {}
+        
+        self.connection_stats = {'created': 0, 'reused': 0}
         
     async def start(self):
         """Start the API session."""
@@ -26,128 +112,403 @@ class HomeAssistantAPI:
             'Authorization': f'Bearer {self.token}',
             'Content-Type': 'application/json'
         }
+        connector = aiohttp.TCPConnector(
+            limit=self.config.get('http_connection_limit', 16),
+            keepalive_timeout=self.config.get('http_keepalive_timeout', 30),
+            ttl_dns_cache=self.config.get('http_dns_cache_ttl', 300)
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=self.config.get('http_timeout_total', 15),
+            connect=self.config.get('http_timeout_connect', 5),
+            sock_read=self.config.get('http_timeout_read', 10)
+        )
+        
+        # Count new versus reused connections
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(self._on_connection_created)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+        
         self.session = aiohttp.ClientSession(
             base_url=self.base_url,
-            headers=headers
+            headers=headers,
+            connector=connector,
+            timeout=timeout,
+            trace_configs=[trace_config]
         )
         logger.info("Home Assistant API client started")
     
+    async def _on_connection_created(self, session, context, params):
+        """Count a newly opened connection."""
+        self.connection_stats['created'] += 1
+    
+    async def _on_connection_reused(self, session, context, params):
+        """Count a request served by a pooled connection."""
+        self.connection_stats['reused'] += 1
+    
+    def get_connection_reuse_ratio(self) -> Optional[float]:
+        """Get the fraction of requests served by a pooled connection."""
+        total = self.connection_stats['created'] + self.connection_stats['reused']
+        if not total:
+            return None
+        return self.connection_stats['reused'] / total
+    
     async def stop(self):
         """Stop the API session."""
+        if self.websocket:
+            await self.websocket.stop()
+            self.websocket = None
         if self.session:
             await self.session.close()
             logger.info("Home Assistant API client stopped")
     
-    async def get_state(self, entity_id: str) -> Optional[Dict[str, Any]]:
-        """Get state of a Home Assistant entity."""
+    def begin_cycle(self, deadline: Optional[float] = None) -> int:
+        """Start a control cycle, cancelling requests still running after deadline seconds."""
+        return self.scheduler.begin_cycle(deadline)
+    
+    def end_cycle(self, cycle: Optional[int] = None):
+        """End a control cycle started by begin_cycle, clearing its deadline."""
+        self.scheduler.end_cycle(cycle)
+    
+    async def _request(self, method: str, url: str, payload: Optional[Any] = None,
+                       priority: int = PRIORITY_NORMAL,
+                       entity_id: Optional[str] = None,
+                       decode: Callable[[bytes], Any] = json_codec.loads) -> Tuple[int, Any]:
+        """
+        Send a request through the circuit breakers and request scheduler.
+        
+        Args:
+            method: HTTP method
+            url: URL relative to the API base URL
+            payload: JSON body to send
+            priority: Scheduler priority class
+            entity_id: Entity the request is about, for the per-entity breaker
+            decode: Decoder for successful response bodies
+            
+        Returns:
+            Tuple of (status, body) with the decoded JSON body for successful
+            responses and the response text otherwise
+            
+        Raises:
+            CircuitOpenError: If the host or entity circuit is open
+        """
         if not self.session:
             await self.start()
         
+        breakers = [self.host_breaker]
+        if entity_id:
+            breakers.append(self._get_entity_breaker(entity_id))
+        claimed = []
+        for breaker in breakers:
+            if not breaker.allow_request():
+                for claimed_breaker in claimed:
+                    claimed_breaker.release()
+                raise CircuitOpenError(f"Circuit for {breaker.name} is open")
+            claimed.append(breaker)
+        
         try:
-            url = f'/core/api/states/{entity_id}'
-            async with self.session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data
+            status, body = await self._send_with_retries(method, url, payload, priority, decode)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            for breaker in breakers:
+                breaker.record_failure()
+            raise
+        except BaseException:
+            # Deadlines and cancellation say nothing about the endpoint
+            for breaker in breakers:
+                breaker.release()
+            raise
+        
+        if status >= 500 and entity_id:
+            # The host answered; the error is charged to the entity only
+            self.host_breaker.release()
+            breakers[1].record_failure()
+        elif status >= 500:
+            self.host_breaker.record_failure()
+        else:
+            self.host_breaker.record_success()
+            if entity_id:
+                if status < 400:
+                    breakers[1].record_success()
                 else:
-                    logger.warning(f"Failed to get state for {entity_id}: {response.status}")
-                    return None
+                    breakers[1].record_failure()
+        return status, body
+    
+    async def _send_with_retries(self, method: str, url: str, payload: Optional[Any],
+                                 priority: int, decode: Callable[[bytes], Any]) -> Tuple[int, Any]:
+        """Send a request, retrying connection errors and 5xx responses with backoff."""
+        attempt = 1
+        while True:
+            try:
+                status, body = await self.scheduler.run(self._send(method, url, payload, decode), priority)
+                if status < 500 or attempt >= self.retry_policy.max_attempts:
+                    return status, body
+                logger.debug(f"{method} {url} returned {status}, retrying")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= self.retry_policy.max_attempts:
+                    raise
+                logger.debug(f"{method} {url} failed ({e}), retrying")
+            
+            await asyncio.sleep(self.retry_policy.get_delay(attempt))
+            attempt += 1
+    
+    def _get_entity_breaker(self, entity_id: str) -> CircuitBreaker:
+        """Get the circuit breaker for an entity."""
+        breaker = self.entity_breakers.get(entity_id)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                entity_id,
+                failure_threshold=self.host_breaker.failure_threshold,
+                recovery_timeout=self.host_breaker.recovery_timeout
+            )
+            self.entity_breakers[entity_id] = breaker
+        return breaker
+    
+    def _log_request_error(self, message: str, error: Exception):
+        """Log a request error, keeping fail-fast rejections out of the error log."""
+        if isinstance(error, CircuitOpenError):
+            logger.debug(f"{message}: {error}")
+        else:
+            logger.error(f"{message}: {error}")
+    
+    async def _send(self, method: str, url: str, payload: Optional[Any],
+                    decode: Callable[[bytes], Any]) -> Tuple[int, Any]:
+        """Send a single HTTP request."""
+        data = json_codec.dumps(payload) if payload is not None else None
+        async with self.session.request(method, url, data=data) as response:
+            if response.status in (200, 201):
+                return response.status, decode(await response.read())
+            return response.status, await response.text()
+    
+    async def get_state(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        """Get state of a Home Assistant entity."""
+        try:
+            url = f'/core/api/states/{entity_id}'
+            status, data = await self._request('GET', url, priority=PRIORITY_HIGH, entity_id=entity_id)
+            if status == 200:
+                return data
+            else:
+                logger.warning(f"Failed to get state for {entity_id}: {status}")
+                return None
+        except Exception as e:
+            self._log_request_error(f"Error getting state for {entity_id}", e)
+            return None
+    
+    async def get_states(self, entity_ids: Optional[Iterable[str]] = None) -> Optional[Dict[str, EntityState]]:
+        """
+        Get the states of all entities with a single request.
+        
+        Args:
+            entity_ids: Only keep these entities (all entities if None)
+            
+        Returns:
+            Dict mapping entity_id to its decoded state, or None on failure
+        """
+        wanted = set(entity_ids) if entity_ids is not None else None
+        try:
+            status, data = await self._request(
+                'GET', '/core/api/states',
+                priority=PRIORITY_HIGH,
+                decode=json_codec.decode_states
+            )
+            if status != 200:
+                logger.warning(f"Failed to get states: {status}")
+                return None
         except Exception as e:
-            logger.error(f"Error getting state for {entity_id}: {e}")
+            self._log_request_error(f"Error getting states", e)
             return None
+        
+        if wanted is None:
+            return {state.entity_id: state for state in data}
+        return {state.entity_id: state for state in data if state.entity_id in wanted}
     
     async def get_temperature(self, entity_id: str) -> Optional[float]:
         """Get temperature value from a sensor entity."""
         state = await self.get_state(entity_id)
         if state and 'state' in state:
-            try:
-                return float(state['state'])
-            except (ValueError, TypeError):
-                logger.warning(f"Could not parse temperature from {entity_id}: {state['state']}")
+            return self._parse_temperature(entity_id, state['state'])
         return None
     
+    def _parse_temperature(self, entity_id: str, value: Any) -> Optional[float]:
+        """Parse a temperature from a raw entity state value."""
+        try:
+            return float(value)
+        except (ValueError, TypeError):
+            logger.warning(f"Could not parse temperature from {entity_id}: {value}")
+            return None
+    
     async def set_valve_position(self, entity_id: str, position: float):
         """Set valve position (0-100) for a cover or number entity."""
-        if not self.session:
-            await self.start()
+        if not self.write_cache.should_write(entity_id, 'position', position, 'valve'):
+            logger.debug(f"Skipping unchanged valve position for {entity_id}")
+            return True
+        return await self._write_entity('valve', entity_id, position)
+    
+    async def _write_entity(self, kind: str, entity_id: str, value: Any) -> bool:
+        """
+        Write a value to an entity and record it in the write cache.
         
-        try:
-            # Try as number entity first
-            url = f'/core/api/services/number/set_value'
-            data = {
-                'entity_id': entity_id,
-                'value': position
-            }
-            async with self.session.post(url, json=data) as response:
-                if response.status == 200:
-                    logger.debug(f"Set {entity_id} to {position}%")
-                    return True
+        The caller has already checked the write cache.
+        
+        Args:
+            kind: Kind of write (key of SERVICE_CANDIDATES)
+            entity_id: Entity to write to
+            value: Value to write
             
-            # Try as cover entity (position)
-            url = f'/core/api/services/cover/set_cover_position'
-            data = {
-                'entity_id': entity_id,
-                'position': int(position)
-            }
-            async with self.session.post(url, json=data) as response:
-                if response.status == 200:
-                    logger.debug(f"Set {entity_id} to {position}%")
-                    return True
+        Returns:
+            True if the write succeeded
+        """
+        attribute = self.WRITE_ATTRIBUTES[kind][0]
+        description = self.WRITE_DESCRIPTIONS[kind]
+        try:
+            if await self._call_entity_service(entity_id, kind, value):
+                logger.debug(f"Set {description} of {entity_id} to {value}")
+                self.write_cache.record(entity_id, attribute, value)
+                return True
             
-            logger.warning(f"Failed to set valve position for {entity_id}")
+            logger.warning(f"Failed to set {description} for {entity_id}")
+            self.write_cache.invalidate(entity_id, attribute)
             return False
         except Exception as e:
-            logger.error(f"Error setting valve position for {entity_id}: {e}")
+            self._log_request_error(f"Error setting {description} for {entity_id}", e)
+            self.write_cache.invalidate(entity_id, attribute)
             return False
     
+    def _get_service_candidates(self, entity_id: str, kind: str) -> List[ServiceTarget]:
+        """
+        Get the services to try for an entity, in order.
+        
+        A cached service that worked before is used on its own. Otherwise
+        the service matching the entity_id domain is used, and entities
+        from other domains probe all candidates.
+        """
+        cached = self._service_cache.get((entity_id, kind))
+        if cached:
+            return [cached]
+        
+        candidates = self.SERVICE_CANDIDATES[kind]
+        domain = entity_id.split('.', 1)[0]
+        matching = [candidate for candidate in candidates if candidate.domain == domain]
+        return matching or candidates
+    
+    async def _call_entity_service(self, entity_id: str, kind: str, value: Any) -> bool:
+        """
+        Call the first working service for an entity and cache it.
+        
+        Args:
+            entity_id: Entity to write to
+            kind: Kind of write (key of SERVICE_CANDIDATES)
+            value: Value to write
+            
+        Returns:
+            True if a service call succeeded
+        """
+        cache_key = (entity_id, kind)
+        for target in self._get_service_candidates(entity_id, kind):
+            data = {
+                'entity_id': entity_id,
+                target.field: target.convert(value) if target.convert else value
+            }
+            try:
+                ok = await self._call_service(target.domain, target.service, data,
+                                              priority=self.WRITE_PRIORITIES[kind])
+            except Exception:
+                self._service_cache.pop(cache_key, None)
+                raise
+            if ok:
+                self._service_cache[cache_key] = target
+                return True
+        
+        # Resolve again on the next call
+        self._service_cache.pop(cache_key, None)
+        return False
+    
+    async def _call_service(self, domain: str, service: str, data: Dict[str, Any],
+                            priority: int = PRIORITY_NORMAL) -> bool:
+        """Call a Home Assistant service, returning True on success."""
+        url = f'/core/api/services/{domain}/{service}'
+        entity_id = data.get('entity_id')
+        if not isinstance(entity_id, str):
+            # Batched calls are only guarded by the host breaker
+            entity_id = None
+        status, _ = await self._request('POST', url, data, priority=priority, entity_id=entity_id)
+        return status == 200
+    
+    async def subscribe_room_temperatures(self, room_manager,
+                                          on_change: Optional[Callable[[], None]] = None):
+        """
+        Subscribe to room temperature sensors over the WebSocket API.
+        
+        Temperature changes are pushed into the room manager as they arrive
+        and on_change is called whenever a room temperature changed.
+        """
+        if not self.session:
+            await self.start()
+        
+        def handle_state_change(entity_id: str, value: Any, attributes: Dict[str, Any]):
+            value = self._temperature_value(value, attributes.get('current_temperature'))
+            if value is None:
+                # Only other attributes changed
+                return
+            if room_manager.apply_entity_state(entity_id, value) and on_change:
+                on_change()
+        
+        self.websocket = HomeAssistantWebSocket(
+            self.session,
+            self.token,
+            room_manager.get_sensor_entity_ids(),
+            handle_state_change
+        )
+        await self.websocket.start()
+    
     async def update_room_temperatures(self, room_manager):
         """Update all room temperatures from Home Assistant sensors."""
+        # Temperatures are pushed while the WebSocket subscription is live,
+        # REST polling is only used as a fallback
+        if self.websocket and self.websocket.connected:
+            return
+        
+        if self.bulk_state_read:
+            states = await self.get_states(room_manager.get_entity_ids())
+            if states is not None:
+                self._apply_room_temperatures(room_manager, states)
+                return
+            logger.debug("Bulk state read failed, falling back to per-entity reads")
+        
         tasks = []
-        for room in room_manager.rooms:
-            task = self._update_single_room(room_manager, room)
+        for entity_id in room_manager.get_sensor_entity_ids():
+            task = self._update_single_sensor(room_manager, entity_id)
             tasks.append(task)
         
         await asyncio.gather(*tasks)
     
-    async def _update_single_room(self, room_manager, room):
-        """Update temperature for a single room."""
-        temp = await self.get_temperature(room.current_temp_sensor)
-        if temp is not None:
-            room_manager.update_room_temperature(room.name, temp)
+    def _apply_room_temperatures(self, room_manager, states: Dict[str, EntityState]):
+        """Update all room temperatures from a bulk state snapshot."""
+        for entity_id in room_manager.get_sensor_entity_ids():
+            state = states.get(entity_id)
+            if state is None:
+                logger.warning(f"No state for {entity_id}")
+                continue
+            room_manager.apply_entity_state(
+                entity_id, self._temperature_value(state.state, state.attributes.current_temperature)
+            )
+    
+    @staticmethod
+    def _temperature_value(state: Any, current_temperature: Any) -> Any:
+        """Get the temperature of a sensor; climate entities carry it as an attribute."""
+        return state if current_temperature is None else current_temperature
+    
+    async def _update_single_sensor(self, room_manager, entity_id: str):
+        """Update the temperature of the rooms using a single sensor."""
+        state = await self.get_state(entity_id)
+        if state and 'state' in state:
+            temperature = (state.get('attributes') or {}).get('current_temperature')
+            room_manager.apply_entity_state(entity_id, self._temperature_value(state['state'], temperature))
     
     async def set_thermostat_temperature(self, entity_id: str, temperature: float):
         """Set target temperature on a thermostat entity."""
-        if not self.session:
-            await self.start()
-        
-        try:
-            # Try climate.set_temperature service
-            url = f'/core/api/services/climate/set_temperature'
-            data = {
-                'entity_id': entity_id,
-                'temperature': temperature
-            }
-            async with self.session.post(url, json=data) as response:
-                if response.status == 200:
-                    logger.debug(f"Set {entity_id} temperature to {temperature}°C")
-                    return True
-            
-            # Try number.set_value if it's a number entity
-            url = f'/core/api/services/number/set_value'
-            data = {
-                'entity_id': entity_id,
-                'value': temperature
-            }
-            async with self.session.post(url, json=data) as response:
-                if response.status == 200:
-                    logger.debug(f"Set {entity_id} value to {temperature}")
-                    return True
-            
-            logger.warning(f"Failed to set thermostat temperature for {entity_id}")
-            return False
-        except Exception as e:
-            logger.error(f"Error setting thermostat temperature for {entity_id}: {e}")
-            return False
+        if not self.write_cache.should_write(entity_id, 'temperature', temperature, 'temperature'):
+            logger.debug(f"Skipping unchanged thermostat temperature for {entity_id}")
+            return True
+        return await self._write_entity('thermostat', entity_id, temperature)
     
     async def get_hrv_state(self, entity_id: str) -> Optional[Dict[str, Any]]:
         """Get state of an HRV entity."""
@@ -155,82 +516,109 @@ class HomeAssistantAPI:
     
     async def set_hrv_mode(self, entity_id: str, mode: str):
         """Set mode for an HRV entity (e.g., 'on', 'off', 'auto')."""
-        if not self.session:
-            await self.start()
-        
-        try:
-            # Try fan.set_preset_mode if it's a fan entity
-            url = f'/core/api/services/fan/set_preset_mode'
-            data = {
-                'entity_id': entity_id,
-                'preset_mode': mode
-            }
-            async with self.session.post(url, json=data) as response:
-                if response.status == 200:
-                    logger.debug(f"Set {entity_id} preset mode to {mode}")
-                    return True
-            
-            # Try climate.set_hvac_mode if it's a climate entity
-            url = f'/core/api/services/climate/set_hvac_mode'
-            data = {
-                'entity_id': entity_id,
-                'hvac_mode': mode
-            }
-            async with self.session.post(url, json=data) as response:
-                if response.status == 200:
-                    logger.debug(f"Set {entity_id} HVAC mode to {mode}")
-                    return True
-            
-            # Try input_select.select_option if it's an input_select
-            url = f'/core/api/services/input_select/select_option'
-            data = {
-                'entity_id': entity_id,
-                'option': mode
-            }
-            async with self.session.post(url, json=data) as response:
-                if response.status == 200:
-                    logger.debug(f"Set {entity_id} option to {mode}")
-                    return True
-            
-            logger.warning(f"Failed to set HRV mode for {entity_id}")
-            return False
-        except Exception as e:
-            logger.error(f"Error setting HRV mode for {entity_id}: {e}")
-            return False
+        if not self.write_cache.should_write(entity_id, 'mode', mode):
+            logger.debug(f"Skipping unchanged HRV mode for {entity_id}")
+            return True
+        return await self._write_entity('hrv_mode', entity_id, mode)
     
-    async def update_valve_positions(self, room_manager):
-        """Update all HRV valve positions in Home Assistant."""
-        tasks = []
-        for room in room_manager.rooms:
+    async def update_valve_positions(self, room_manager, rooms: Optional[Iterable] = None):
+        """Update HRV valve positions in Home Assistant for the given rooms (default: all)."""
+        positions = {}
+        for room in (room_manager.rooms if rooms is None else rooms):
             for valve in room.hrv_valves:
-                task = self.set_valve_position(valve.valve_entity, valve.current_position)
-                tasks.append(task)
+                positions[valve.valve_entity] = valve.current_position
         
-        await asyncio.gather(*tasks)
+        await self.write_entities('valve', positions)
     
     async def update_hrv_devices(self, room_manager):
         """Update HRV device states based on room requirements."""
-        tasks = []
+        modes = {}
         for room in room_manager.rooms:
             if room.hrv_entity:
                 # Enable HRV if room needs heating
                 if room.needs_heating():
-                    task = self.set_hrv_mode(room.hrv_entity, 'on')
+                    modes[room.hrv_entity] = 'on'
                 else:
                     # Could set to 'auto' or 'off' based on preference
-                    task = self.set_hrv_mode(room.hrv_entity, 'auto')
-                tasks.append(task)
+                    modes[room.hrv_entity] = 'auto'
         
-        await asyncio.gather(*tasks)
+        await self.write_entities('hrv_mode', modes)
+    
+    async def write_entities(self, kind: str, values: Dict[str, Any]):
+        """
+        Write values to many entities with as few service calls as possible.
+        
+        Entities whose service is already known are grouped by service and
+        value, and each group is sent as a single service call with a list
+        of entity_ids. Entities that still need probing are written one by one.
+        
+        Args:
+            kind: Kind of write (key of SERVICE_CANDIDATES)
+            values: Dict mapping entity_id to the value to write
+        """
+        attribute, value_type = self.WRITE_ATTRIBUTES[kind]
+        groups: Dict[tuple, List[str]] = {}
+        singles = []
+        
+        for entity_id, value in values.items():
+            if not self.write_cache.should_write(entity_id, attribute, value, value_type):
+                continue
+            candidates = self._get_service_candidates(entity_id, kind)
+            if len(candidates) != 1:
+                singles.append(entity_id)
+                continue
+            target = candidates[0]
+            service_value = target.convert(value) if target.convert else value
+            groups.setdefault((target, service_value), []).append(entity_id)
+        
+        tasks = []
+        for (target, service_value), entity_ids in groups.items():
+            if len(entity_ids) > 1:
+                tasks.append(self._write_group(kind, target, service_value, entity_ids, values))
+            else:
+                singles.extend(entity_ids)
+        tasks.extend(self._write_entity(kind, entity_id, values[entity_id]) for entity_id in singles)
+        
+        if tasks:
+            logger.debug(f"Writing {len(values)} {kind} values with {len(tasks)} service calls")
+            await asyncio.gather(*tasks)
+    
+    async def _write_group(self, kind: str, target: ServiceTarget, service_value: Any,
+                           entity_ids: List[str], values: Dict[str, Any]):
+        """Write one value to a group of entities with a single service call."""
+        attribute = self.WRITE_ATTRIBUTES[kind][0]
+        data = {
+            'entity_id': entity_ids,
+            target.field: service_value
+        }
+        try:
+            ok = await self._call_service(target.domain, target.service, data,
+                                          priority=self.WRITE_PRIORITIES[kind])
+        except Exception as e:
+            self._log_request_error(f"Error calling {target.domain}.{target.service} for {len(entity_ids)} entities", e)
+            ok = False
+        
+        if ok:
+            for entity_id in entity_ids:
+                self._service_cache[(entity_id, kind)] = target
+                self.write_cache.record(entity_id, attribute, values[entity_id])
+            logger.debug(f"Set {', '.join(entity_ids)} to {service_value} via {target.domain}.{target.service}")
+            return
+        
+        # Find the failing entities by writing them one by one
+        logger.warning(f"Batched {target.domain}.{target.service} call failed, retrying per entity")
+        for entity_id in entity_ids:
+            self._service_cache.pop((entity_id, kind), None)
+        await asyncio.gather(*[
+            self._write_entity(kind, entity_id, values[entity_id])
+            for entity_id in entity_ids
+        ])
     
     async def create_sensor(self, entity_id: str, friendly_name: str, 
                            device_class: Optional[str] = None,
                            unit_of_measurement: Optional[str] = None,
                            initial_value: Optional[Any] = None):
         """Create a sensor entity in Home Assistant if it doesn't exist."""
-        if not self.session:
-            await self.start()
-        
         try:
             # Check if sensor already exists
             existing = await self.get_state(entity_id)
@@ -253,31 +641,41 @@ class HomeAssistantAPI:
                 state_data['attributes']['unit_of_measurement'] = unit_of_measurement
             
             url = f'/core/api/states/{entity_id}'
-            async with self.session.post(url, json=state_data) as response:
-                if response.status in [200, 201]:
-                    logger.info(f"Created sensor {entity_id}: {friendly_name}")
-                    return True
-                else:
-                    error_text = await response.text()
-                    logger.warning(f"Failed to create sensor {entity_id}: {response.status} - {error_text}")
-                    return False
+            status, body = await self._request('POST', url, state_data, entity_id=entity_id)
+            if status in [200, 201]:
+                logger.info(f"Created sensor {entity_id}: {friendly_name}")
+                return True
+            else:
+                logger.warning(f"Failed to create sensor {entity_id}: {status} - {body}")
+                return False
         except Exception as e:
-            logger.error(f"Error creating sensor {entity_id}: {e}")
+            self._log_request_error(f"Error creating sensor {entity_id}", e)
             return False
     
     async def set_sensor_state(self, entity_id: str, value: Any,
                               unit_of_measurement: Optional[str] = None,
                               friendly_name: Optional[str] = None,
-                              device_class: Optional[str] = None):
-        """Set the state of a sensor entity in Home Assistant."""
-        if not self.session:
-            await self.start()
+                              device_class: Optional[str] = None,
+                              priority: int = PRIORITY_LOW,
+                              attributes: Optional[Dict[str, Any]] = None):
+        """
+        Set the state of a sensor entity in Home Assistant.
+        
+        Only changes are written: the state within its deadband, the extra
+        attributes exactly.
+        """
+        value_type = 'temperature' if device_class == 'temperature' else None
+        state_changed = self.write_cache.should_write(entity_id, 'state', value, value_type)
+        attributes_changed = self.write_cache.should_write(entity_id, 'attributes', attributes)
+        if not (state_changed or attributes_changed):
+            logger.debug(f"Skipping unchanged sensor state for {entity_id}")
+            return True
         
         try:
             state_value = str(value) if value is not None else 'unknown'
             state_data = {
                 'state': state_value,
-                'attributes': {}
+                'attributes': dict(attributes or {})
             }
             
             if friendly_name:
@@ -288,14 +686,18 @@ class HomeAssistantAPI:
                 state_data['attributes']['unit_of_measurement'] = unit_of_measurement
             
             url = f'/core/api/states/{entity_id}'
-            async with self.session.post(url, json=state_data) as response:
-                if response.status in [200, 201]:
-                    logger.debug(f"Updated sensor {entity_id} to {state_value}")
-                    return True
-                else:
-                    error_text = await response.text()
-                    logger.warning(f"Failed to update sensor {entity_id}: {response.status} - {error_text}")
-                    return False
+            status, body = await self._request('POST', url, state_data, priority=priority,
+                                               entity_id=entity_id)
+            if status in [200, 201]:
+                logger.debug(f"Updated sensor {entity_id} to {state_value}")
+                self.write_cache.record(entity_id, 'state', value)
+                self.write_cache.record(entity_id, 'attributes', attributes)
+                return True
+            else:
+                logger.warning(f"Failed to update sensor {entity_id}: {status} - {body}")
+                self.write_cache.invalidate(entity_id)
+                return False
         except Exception as e:
-            logger.error(f"Error setting sensor state for {entity_id}: {e}")
+            self._log_request_error(f"Error setting sensor state for {entity_id}", e)
+            self.write_cache.invalidate(entity_id)
             return False
\ No newline at end of file
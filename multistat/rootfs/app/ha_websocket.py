@@ -0,0 +1,197 @@
+"""
+Home Assistant WebSocket client for push-based entity state updates.
+"""
+import asyncio
+import logging
+import aiohttp
+from typing import Optional, Dict, Any, Callable, Iterable, List
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+
+class HomeAssistantWebSocket:
+    """Subscribes to state changes of a fixed set of entities."""
+
+    def __init__(self, session: aiohttp.ClientSession, token: str,
+                 entity_ids: Iterable[str],
+                 on_state_change: Callable[[str, Any, Dict[str, Any]], None],
+                 url: str = '/core/websocket',
+                 reconnect_delay: float = 5.0):
+        """
+        Initialize WebSocket client.
+
+        Args:
+            session: aiohttp session used to open the WebSocket
+            token: Supervisor/Home Assistant access token
+            entity_ids: Entities to subscribe to
+            on_state_change: Callback invoked with (entity_id, state, attributes);
+                state is None when only attributes changed
+            url: WebSocket endpoint (relative to the session base URL)
+            reconnect_delay: Seconds to wait before reconnecting
+        """
+        self.session = session
+        self.token = token
+        self.entity_ids: List[str] = sorted({e for e in entity_ids if e})
+        self.on_state_change = on_state_change
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+
+        # True once the initial state snapshot has been received
+        self.connected = False
+
+        self._task: Optional[asyncio.Task] = None
+        self._msg_id = 0
+
+    async def start(self):
+        """Start the background connection task."""
+        if not self.entity_ids:
+            logger.info("No entities to subscribe to, WebSocket client not started")
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"WebSocket client started for {len(self.entity_ids)} entities")
+
+    async def stop(self):
+        """Stop the background connection task."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.connected = False
+        logger.info("WebSocket client stopped")
+
+    def _next_id(self) -> int:
+        """Return the next message id."""
+        self._msg_id += 1
+        return self._msg_id
+
+    async def _run(self):
+        """Keep the subscription alive, reconnecting when it drops."""
+        while True:
+            try:
+                await self._connect_and_listen()
+                logger.warning("WebSocket connection closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"WebSocket connection error: {e}")
+
+            self.connected = False
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _connect_and_listen(self):
+        """Connect, authenticate, subscribe and dispatch incoming events."""
+        self._msg_id = 0
+        async with self.session.ws_connect(self.url, heartbeat=30) as ws:
+            await self._authenticate(ws)
+            subscription_id = await self._subscribe(ws)
+
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    payload = msg.json(loads=json_codec.loads)
+                    # Home Assistant may coalesce several messages into a list
+                    messages = payload if isinstance(payload, list) else [payload]
+                    for message in messages:
+                        self._handle_message(message, subscription_id)
+                elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    break
+
+    async def _send(self, ws: aiohttp.ClientWebSocketResponse, message: Dict[str, Any]):
+        """Send a JSON message."""
+        await ws.send_str(json_codec.dumps_str(message))
+
+    async def _receive(self, ws: aiohttp.ClientWebSocketResponse) -> Dict[str, Any]:
+        """Receive a JSON message."""
+        return await ws.receive_json(loads=json_codec.loads)
+
+    async def _authenticate(self, ws: aiohttp.ClientWebSocketResponse):
+        """Perform the Home Assistant WebSocket authentication handshake."""
+        msg = await self._receive(ws)
+        if msg.get('type') != 'auth_required':
+            raise ConnectionError(f"Unexpected WebSocket greeting: {msg.get('type')}")
+
+        await self._send(ws, {'type': 'auth', 'access_token': self.token})
+        msg = await self._receive(ws)
+        if msg.get('type') != 'auth_ok':
+            raise ConnectionError(f"WebSocket authentication failed: {msg.get('message', msg.get('type'))}")
+
+    async def _subscribe(self, ws: aiohttp.ClientWebSocketResponse) -> int:
+        """
+        Subscribe to the configured entities.
+
+        Uses subscribe_entities when available and falls back to a state
+        trigger subscription on older Home Assistant versions.
+        """
+        msg_id = self._next_id()
+        await self._send(ws, {
+            'id': msg_id,
+            'type': 'subscribe_entities',
+            'entity_ids': self.entity_ids
+        })
+        result = await self._wait_for_result(ws, msg_id)
+        if result.get('success'):
+            logger.info("Subscribed to entity state changes")
+            return msg_id
+
+        logger.info("subscribe_entities not supported, falling back to subscribe_trigger")
+        msg_id = self._next_id()
+        await self._send(ws, {
+            'id': msg_id,
+            'type': 'subscribe_trigger',
+            'trigger': {
+                'platform': 'state',
+                'entity_id': self.entity_ids
+            }
+        })
+        result = await self._wait_for_result(ws, msg_id)
+        if not result.get('success'):
+            raise ConnectionError(f"WebSocket subscription failed: {result.get('error')}")
+
+        # A trigger subscription does not send an initial snapshot
+        self.connected = True
+        logger.info("Subscribed to state triggers")
+        return msg_id
+
+    async def _wait_for_result(self, ws: aiohttp.ClientWebSocketResponse, msg_id: int) -> Dict[str, Any]:
+        """Wait for the result message of a command, dispatching early events."""
+        while True:
+            msg = await self._receive(ws)
+            if msg.get('id') == msg_id and msg.get('type') == 'result':
+                return msg
+            self._handle_message(msg, msg_id)
+
+    def _handle_message(self, message: Dict[str, Any], subscription_id: int):
+        """Dispatch an event message to the state change callback."""
+        if message.get('type') != 'event' or message.get('id') != subscription_id:
+            return
+
+        event = message.get('event', {})
+
+        # subscribe_entities: 'a' holds full states, 'c' holds changes
+        for entity_id, state in event.get('a', {}).items():
+            if 's' in state:
+                self._dispatch(entity_id, state['s'], state.get('a') or {})
+        for entity_id, diff in event.get('c', {}).items():
+            added = diff.get('+', {})
+            if 's' in added or 'a' in added:
+                self._dispatch(entity_id, added.get('s'), added.get('a') or {})
+        if 'a' in event:
+            self.connected = True
+
+        # subscribe_trigger: state is in the trigger variables
+        trigger = event.get('variables', {}).get('trigger', {})
+        to_state = trigger.get('to_state')
+        if to_state and 'entity_id' in trigger:
+            self._dispatch(trigger['entity_id'], to_state.get('state'), to_state.get('attributes') or {})
+
+    def _dispatch(self, entity_id: str, state: Any, attributes: Dict[str, Any]):
+        """Invoke the state change callback, isolating callback errors."""
+        try:
+            self.on_state_change(entity_id, state, attributes)
+        except Exception as e:
+            logger.error(f"Error handling state change for {entity_id}: {e}")
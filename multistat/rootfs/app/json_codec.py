@@ -0,0 +1,98 @@
+"""
+JSON codec for Home Assistant payloads.
+
+Uses orjson or msgspec when installed and falls back to the standard
+library json module. With msgspec, state snapshots are decoded straight
+into EntityState structs, skipping every field the add-on does not use.
+"""
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, List
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    BACKEND = 'orjson'
+elif msgspec is not None:
+    BACKEND = 'msgspec'
+else:
+    BACKEND = 'json'
+
+
+if msgspec is not None:
+    class Attributes(msgspec.Struct):
+        """The state attributes used by the add-on; all others are skipped."""
+        current_temperature: Any = None
+
+    class EntityState(msgspec.Struct):
+        """The fields of a Home Assistant state object used by the add-on."""
+        entity_id: str
+        state: Any = None
+        attributes: Attributes = msgspec.field(default_factory=Attributes)
+
+    _msgspec_encoder = msgspec.json.Encoder()
+    _msgspec_decoder = msgspec.json.Decoder()
+    _states_decoder = msgspec.json.Decoder(List[EntityState])
+else:
+    @dataclass(slots=True)
+    class Attributes:
+        """The state attributes used by the add-on."""
+        current_temperature: Any = None
+
+    @dataclass(slots=True)
+    class EntityState:
+        """The fields of a Home Assistant state object used by the add-on."""
+        entity_id: str
+        state: Any = None
+        attributes: Attributes = field(default_factory=Attributes)
+
+    _states_decoder = None
+
+
+def loads(data) -> Any:
+    """Decode a JSON document from bytes or str."""
+    if BACKEND == 'orjson':
+        return orjson.loads(data)
+    if BACKEND == 'msgspec':
+        return _msgspec_decoder.decode(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode an object as JSON bytes."""
+    if BACKEND == 'orjson':
+        return orjson.dumps(obj)
+    if BACKEND == 'msgspec':
+        return _msgspec_encoder.encode(obj)
+    return json.dumps(obj).encode('utf-8')
+
+
+def dumps_str(obj: Any) -> str:
+    """Encode an object as a JSON string."""
+    return dumps(obj).decode('utf-8')
+
+
+def decode_states(data) -> List[EntityState]:
+    """Decode a /api/states response into EntityState objects."""
+    if _states_decoder is not None:
+        return _states_decoder.decode(data)
+
+    return [
+        EntityState(
+            state.get('entity_id'),
+            state.get('state'),
+            Attributes((state.get('attributes') or {}).get('current_temperature'))
+        )
+        for state in loads(data)
+    ]
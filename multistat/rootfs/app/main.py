@@ -8,13 +8,18 @@ import json
 import logging
 import asyncio
 import signal
+import time
 from pathlib import Path
+from typing import List, Set
 
 # Add app directory to path
 sys.path.insert(0, os.path.dirname(__file__))
 
-from room_manager import RoomManager
+from room_manager import RoomManager, Room
 from ha_integration import HomeAssistantAPI
+from request_scheduler import PRIORITY_HIGH, PRIORITY_LOW
+from cycle_scheduler import FixedRateScheduler, MultiRateScheduler
+from opentherm import OpenThermController, HeatingCurve
 
 # Configure logging
 logging.basicConfig(
@@ -27,6 +32,12 @@ logger = logging.getLogger(__name__)
 class MultiRoomThermostat:
     """Main application class for multi-room thermostat."""
     
+    # Delay after a pushed change to coalesce bursts into one cycle (seconds)
+    WEBSOCKET_DEBOUNCE = 0.05
+    
+    # Tasks that run right away after a pushed temperature change
+    PUSH_TASKS = ('valve', 'boiler', 'opentherm')
+    
     def __init__(self, config_path: str = '/data/options.json'):
         """Initialize the thermostat application."""
         self.config_path = config_path
@@ -34,8 +45,17 @@ class MultiRoomThermostat:
         self.running = False
         
         # Initialize components
-        self.room_manager = RoomManager(self.config.get('rooms', []))
-        self.ha_api = HomeAssistantAPI()
+        # Valve positions are calculated with a fixed PID time step, so rooms
+        # skipped by incremental recalculation get the same positions
+        self.room_manager = RoomManager(
+            self.config.get('rooms', []),
+            pid_interval=max(self.config.get('valve_interval', 0), self.config.get('update_interval', 5))
+        )
+        self.ha_api = HomeAssistantAPI(self.config)
+        
+        # Vectorized valve calculation for large buildings
+        if self.config.get('vector_engine', False) and not self.room_manager.enable_vector_engine():
+            logger.warning("vector_engine is enabled but NumPy is not installed, using the default engine")
         
         # Central thermostat entity (optional)
         self.central_thermostat_entity = self.config.get('central_thermostat_entity', '')
@@ -44,7 +64,65 @@ class MultiRoomThermostat:
         self.boiler_target_sensor = self.config.get('boiler_target_sensor', 'sensor.multistat_boiler_target_temp')
         self.boiler_current_sensor = self.config.get('boiler_current_sensor', 'sensor.multistat_boiler_current_temp')
         
+        # Direct boiler output over OpenTherm (optional)
+        self.opentherm = None
+        opentherm_port = self.config.get('opentherm_port', '')
+        if opentherm_port:
+            poll_intervals = {
+                item['data_id']: item['interval']
+                for item in self.config.get('opentherm_data_ids', [])
+            }
+            self.opentherm = OpenThermController(
+                opentherm_port,
+                self.config.get('opentherm_baudrate', 9600),
+                poll_intervals=poll_intervals or None,
+                max_rate=self.config.get('opentherm_max_rate', 1.0),
+                heating_curve=HeatingCurve(
+                    slope=self.config.get('opentherm_curve_slope', 1.5),
+                    room_gain=self.config.get('opentherm_room_gain', 5.0),
+                    min_flow=self.config.get('opentherm_min_flow_temp', 20.0),
+                    max_flow=self.config.get('opentherm_max_flow_temp', 70.0)
+                )
+            )
+        self.opentherm_sensor = self.config.get('opentherm_sensor', 'sensor.multistat_opentherm')
+        
         self.update_interval = self.config.get('update_interval', 5)
+        # Requests still running this long after a cycle started are cancelled
+        self.cycle_deadline = self.config.get('cycle_deadline', 0) or self.update_interval
+        
+        # Cycles run on a fixed grid; overruns are published to this sensor
+        self.loop_scheduler = FixedRateScheduler(
+            self.update_interval,
+            overrun_policy=self.config.get('overrun_policy', FixedRateScheduler.SKIP)
+        )
+        self.control_loop_sensor = self.config.get('control_loop_sensor', 'sensor.multistat_control_loop')
+        self._publish_loop_stats_pending = False
+        
+        # Only recalculate rooms whose temperature changed, plus a periodic
+        # tick over all rooms to settle their PID derivative terms
+        self.incremental_recompute = self.config.get('incremental_recompute', False)
+        
+        # Sensor reads, valve, boiler and HRV mode writes each run at their own rate
+        task_intervals = {
+            'sensor': self.config.get('sensor_interval', 0),
+            'valve': self.config.get('valve_interval', 0),
+            'boiler': self.config.get('boiler_interval', 15),
+            'hrv_mode': self.config.get('hrv_mode_interval', 60)
+        }
+        if self.incremental_recompute:
+            task_intervals['pid_tick'] = self.config.get('pid_tick_interval', 60)
+        if self.opentherm:
+            task_intervals['opentherm'] = self.config.get('opentherm_interval', 0)
+            task_intervals['opentherm_telemetry'] = self.config.get('opentherm_telemetry_interval', 30)
+        self.task_scheduler = MultiRateScheduler(task_intervals, self.update_interval)
+        
+        # Push-based temperature updates over the WebSocket API
+        self.use_websocket = self.config.get('use_websocket', True)
+        self._wake_event = asyncio.Event()
+        
+        # Overlap each cycle's writes with the next cycle's reads
+        self.pipelined_loop = self.config.get('pipelined_loop', False)
+        self._pending_writes = None
         
         # Setup signal handlers
         signal.signal(signal.SIGTERM, self._signal_handler)
@@ -69,20 +147,70 @@ class MultiRoomThermostat:
         logger.info(f"Received signal {signum}, shutting down...")
         self.running = False
     
+    def _on_temperature_change(self):
+        """Wake the control loop after a pushed temperature change."""
+        self._wake_event.set()
+    
+    async def _wait_for_next_cycle(self) -> bool:
+        """
+        Sleep until the next scheduled cycle or until a temperature changes.
+        
+        Returns:
+            True if the cycle was started by a pushed temperature change
+        """
+        woken = await self.loop_scheduler.wait(self._wake_event)
+        if woken:
+            # Coalesce bursts of changes into a single cycle
+            await asyncio.sleep(self.WEBSOCKET_DEBOUNCE)
+        self._wake_event.clear()
+        return woken
+    
+    async def _publish_loop_stats(self):
+        """Publish the overrun count and cycle timing of the control loop."""
+        stats = self.loop_scheduler.stats
+        await self.ha_api.set_sensor_state(
+            self.control_loop_sensor,
+            stats['overruns'],
+            friendly_name='MultiStat Control Loop Overruns',
+            attributes={
+                'interval': self.update_interval,
+                'overrun_policy': self.loop_scheduler.overrun_policy,
+                'cycles': stats['cycles'],
+                'skipped_cycles': stats['skipped'],
+                'last_duration': round(stats['last_duration'], 3),
+                'max_duration': round(stats['max_duration'], 3),
+                'max_lateness': round(stats['max_lateness'], 3),
+                'tasks': {
+                    name: {
+                        'interval': self.task_scheduler.tasks[name].interval,
+                        'runs': task_stats['runs'],
+                        'errors': task_stats['errors'],
+                        'last_duration': round(task_stats['last_duration'], 3),
+                        'max_duration': round(task_stats['max_duration'], 3)
+                    }
+                    for name, task_stats in self.task_scheduler.stats.items()
+                }
+            }
+        )
+    
     async def _update_temperatures(self):
         """Update room temperatures from Home Assistant."""
         await self.ha_api.update_room_temperatures(self.room_manager)
     
     async def _update_boiler_temperatures(self):
         """Output boiler control temperatures based on room with highest difference."""
-        temps = self.room_manager.get_control_temperatures()
-        if temps:
-            target_temp, current_temp = temps
-            room = self.room_manager.get_room_with_highest_difference()
+        room = self.room_manager.get_room_with_highest_difference()
+        if room:
+            target_temp, current_temp = room.target_temp, room.current_temp
             logger.info(
                 f"Boiler control for room '{room.name}': "
                 f"Target={target_temp}°C, Current={current_temp}°C"
             )
+            if logger.isEnabledFor(logging.DEBUG):
+                top_rooms = self.room_manager.get_top_demand_rooms(3)
+                logger.debug("Highest demand: " + ", ".join(
+                    f"{r.name} ({r.get_temperature_difference():.1f}°C)" for r in top_rooms
+                ))
             
             # Publish temperatures as Home Assistant sensors
             await self.ha_api.set_sensor_state(
@@ -90,14 +218,16 @@ class MultiRoomThermostat:
                 target_temp,
                 unit_of_measurement='°C',
                 friendly_name='Boiler Target Temperature',
-                device_class='temperature'
+                device_class='temperature',
+                priority=PRIORITY_HIGH
             )
             await self.ha_api.set_sensor_state(
                 self.boiler_current_sensor,
                 current_temp,
                 unit_of_measurement='°C',
                 friendly_name='Boiler Current Temperature',
-                device_class='temperature'
+                device_class='temperature',
+                priority=PRIORITY_HIGH
             )
             
             # Control via central thermostat entity if configured
@@ -114,54 +244,212 @@ class MultiRoomThermostat:
                 None,
                 unit_of_measurement='°C',
                 friendly_name='Boiler Target Temperature',
-                device_class='temperature'
+                device_class='temperature',
+                priority=PRIORITY_HIGH
             )
             await self.ha_api.set_sensor_state(
                 self.boiler_current_sensor,
                 None,
                 unit_of_measurement='°C',
                 friendly_name='Boiler Current Temperature',
-                device_class='temperature'
+                device_class='temperature',
+                priority=PRIORITY_HIGH
             )
     
-    async def _update_hrv_valves(self):
-        """Update HRV valve positions using PID control."""
-        for room in self.room_manager.rooms:
-            if room.current_temp is not None:
-                # Calculate valve positions for this room
-                self.room_manager.calculate_hrv_positions(room)
+    async def _update_opentherm_boiler(self, woken: bool = False):
+        """Send the control room and its flow temperature to the boiler over OpenTherm."""
+        if not self.opentherm.connected:
+            return
+        
+        temperatures = self.room_manager.get_control_temperatures()
+        if temperatures:
+            target_temp, current_temp = temperatures
+            await self.opentherm.set_heating_demand(True)
+            await self.opentherm.set_control_temperature(target_temp, current_temp, pushed=woken)
+        else:
+            await self.opentherm.set_heating_demand(False)
+    
+    async def _publish_opentherm_telemetry(self):
+        """Mirror the cached OpenTherm telemetry and bus stats into Home Assistant."""
+        if not self.opentherm.connected:
+            return
+        
+        telemetry = self.opentherm.get_telemetry()
+        attributes = {}
+        for name, value in telemetry.items():
+            if isinstance(value, dict):
+                attributes.update(value)
+            elif isinstance(value, tuple):
+                attributes[name] = list(value)
+            else:
+                attributes[name] = value
+        attributes['flow_setpoint'] = self.opentherm.flow_setpoint
+        
+        bus_stats = self.opentherm.get_bus_stats()
+        attributes['bus'] = {
+            'queue_depth': bus_stats['queue_depth'],
+            'transactions': bus_stats['completed'],
+            'timeouts': bus_stats['timeouts'],
+            'avg_latency': round(bus_stats['avg_latency'], 3),
+            'max_latency': round(bus_stats['max_latency'], 3)
+        }
+        
+        await self.ha_api.set_sensor_state(
+            self.opentherm_sensor,
+            telemetry.get('boiler_temperature'),
+            unit_of_measurement='°C',
+            friendly_name='OpenTherm Boiler',
+            device_class='temperature',
+            attributes=attributes,
+            priority=PRIORITY_LOW
+        )
+    
+    def _due_tasks(self, woken: bool) -> Set[str]:
+        """Get the tasks to run this cycle."""
+        due = self.task_scheduler.due_tasks(self.PUSH_TASKS if woken else ())
+        if 'pid_tick' in due:
+            # The tick recalculates all rooms, whose positions are then written
+            due.add('valve')
+        return due
+    
+    def _calculate_valve_positions(self, due: Set[str]) -> List[Room]:
+        """
+        Calculate HRV valve positions using PID control.
+        
+        Returns:
+            Rooms whose valve positions were calculated
+        """
+        dirty_rooms = self.room_manager.pop_dirty_rooms()
+        if self.incremental_recompute and 'pid_tick' not in due:
+            rooms = dirty_rooms
+        else:
+            rooms = self.room_manager.rooms
         
-        # Update valve positions in Home Assistant
-        await self.ha_api.update_valve_positions(self.room_manager)
+        start = time.monotonic()
+        self.room_manager.calculate_rooms_hrv_positions(rooms)
+        if 'pid_tick' in due:
+            self.task_scheduler.tasks['pid_tick'].record(time.monotonic() - start)
+        return rooms
+    
+    async def _update_hrv_valves(self, rooms: List[Room]):
+        """Update HRV valve positions in Home Assistant."""
+        await self.ha_api.update_valve_positions(self.room_manager, rooms)
     
     async def _update_hrv_devices(self):
         """Update HRV device states based on room requirements."""
         await self.ha_api.update_hrv_devices(self.room_manager)
     
+    async def _write_outputs(self, due: Set[str], valve_rooms: List[Room], woken: bool = False):
+        """Write the due boiler temperatures, valve positions and HRV modes concurrently."""
+        writes = []
+        if 'opentherm' in due:
+            writes.append(self.task_scheduler.run('opentherm', self._update_opentherm_boiler(woken)))
+        if 'boiler' in due:
+            writes.append(self.task_scheduler.run('boiler', self._update_boiler_temperatures()))
+        if 'valve' in due:
+            writes.append(self.task_scheduler.run('valve', self._update_hrv_valves(valve_rooms)))
+        if 'hrv_mode' in due:
+            writes.append(self.task_scheduler.run('hrv_mode', self._update_hrv_devices()))
+        if 'opentherm_telemetry' in due:
+            writes.append(self.task_scheduler.run('opentherm_telemetry', self._publish_opentherm_telemetry()))
+        if self._publish_loop_stats_pending:
+            self._publish_loop_stats_pending = False
+            writes.append(self._publish_loop_stats())
+        
+        results = await asyncio.gather(*writes, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error writing outputs: {result}", exc_info=result)
+    
+    async def _run_cycle(self, woken: bool = False):
+        """
+        Run a single control cycle.
+        
+        Args:
+            woken: True if the cycle was started by a pushed temperature change
+        """
+        cycle = self.ha_api.begin_cycle(self.cycle_deadline)
+        try:
+            due = self._due_tasks(woken)
+            
+            # Update room temperatures from Home Assistant
+            if 'sensor' in due:
+                await self.task_scheduler.run('sensor', self._update_temperatures())
+            
+            # Calculate HRV valve positions using PID
+            valve_rooms = self._calculate_valve_positions(due) if 'valve' in due else []
+            
+            # Output boiler temperatures, valve positions and HRV device states
+            await self._write_outputs(due, valve_rooms, woken)
+        finally:
+            self.ha_api.end_cycle(cycle)
+    
+    async def _run_pipelined_cycle(self, woken: bool = False):
+        """
+        Run a control cycle without waiting for its writes.
+        
+        The writes run in the background while the loop waits for the next
+        cycle, so that cycle's reads overlap with them. A cycle only starts
+        writing once the previous cycle's writes have finished, which keeps
+        writes to the same entity in order.
+        """
+        cycle = self.ha_api.begin_cycle(self.cycle_deadline)
+        try:
+            due = self._due_tasks(woken)
+            
+            if 'sensor' in due:
+                await self.task_scheduler.run('sensor', self._update_temperatures())
+            valve_rooms = self._calculate_valve_positions(due) if 'valve' in due else []
+            
+            await self._wait_for_pending_writes()
+        except BaseException:
+            self.ha_api.end_cycle(cycle)
+            raise
+        self._pending_writes = asyncio.create_task(
+            self._write_pipelined_outputs(due, valve_rooms, cycle, woken)
+        )
+    
+    async def _write_pipelined_outputs(self, due: Set[str], valve_rooms: List[Room], cycle: int,
+                                       woken: bool = False):
+        """Write the outputs of a pipelined cycle and end the cycle."""
+        try:
+            await self._write_outputs(due, valve_rooms, woken)
+        finally:
+            # Keeps the deadline if the next cycle has already begun
+            self.ha_api.end_cycle(cycle)
+    
+    async def _wait_for_pending_writes(self):
+        """Wait for the writes of the previous pipelined cycle."""
+        if self._pending_writes is not None:
+            await self._pending_writes
+            self._pending_writes = None
+    
     async def _main_loop(self):
         """Main control loop."""
         logger.info("Starting main control loop")
         
+        self.loop_scheduler.start()
+        self.task_scheduler.start()
         while self.running:
+            # Wait for next update cycle
+            woken = await self._wait_for_next_cycle()
+            if not self.running:
+                break
+            
             try:
-                # Update room temperatures from Home Assistant
-                await self._update_temperatures()
-                
-                # Output boiler temperatures (room with highest difference)
-                await self._update_boiler_temperatures()
-                
-                # Update HRV valve positions using PID
-                await self._update_hrv_valves()
-                
-                # Update HRV device states based on room requirements
-                await self._update_hrv_devices()
-                
-                # Wait for next update cycle
-                await asyncio.sleep(self.update_interval)
-                
+                if self.pipelined_loop:
+                    await self._run_pipelined_cycle(woken)
+                else:
+                    await self._run_cycle(woken)
             except Exception as e:
                 logger.error(f"Error in main loop: {e}", exc_info=True)
-                await asyncio.sleep(self.update_interval)
+            
+            if self.loop_scheduler.end_cycle():
+                # The cycle deadline has passed, publish with the next cycle
+                self._publish_loop_stats_pending = True
+        
+        # Let the last pipelined writes finish before shutting down
+        await self._wait_for_pending_writes()
     
     async def start(self):
         """Start the thermostat application."""
@@ -184,6 +472,31 @@ class MultiRoomThermostat:
                 device_class='temperature',
                 unit_of_measurement='°C'
             )
+            await self.ha_api.create_sensor(
+                self.control_loop_sensor,
+                friendly_name='MultiStat Control Loop Overruns',
+                initial_value=0
+            )
+            
+            # Connect to the boiler, the Home Assistant sensors remain the fallback
+            if self.opentherm:
+                await self.opentherm.start()
+                if self.opentherm.connected:
+                    await self.ha_api.create_sensor(
+                        self.opentherm_sensor,
+                        friendly_name='OpenTherm Boiler',
+                        device_class='temperature',
+                        unit_of_measurement='°C'
+                    )
+                else:
+                    logger.warning("OpenTherm not available, boiler output only via Home Assistant")
+            
+            # Subscribe to temperature sensors, REST polling remains the fallback
+            if self.use_websocket:
+                await self.ha_api.subscribe_room_temperatures(
+                    self.room_manager,
+                    on_change=self._on_temperature_change
+                )
             
             if self.central_thermostat_entity:
                 logger.info(f"Using central thermostat: {self.central_thermostat_entity}")
@@ -207,6 +520,9 @@ class MultiRoomThermostat:
         
         self.running = False
         
+        if self.opentherm:
+            await self.opentherm.stop()
+        
         # Stop Home Assistant API
         await self.ha_api.stop()
         
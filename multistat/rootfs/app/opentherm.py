@@ -1,11 +1,17 @@
 """
 OpenTherm communication module for boiler control.
 """
-import serial
-import struct
 import time
+import asyncio
 import logging
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Union
+
+import opentherm_codec as codec
+from opentherm_transport import OpenThermTransport
+from opentherm_queue import (
+    OpenThermTransactionQueue, PRIORITY_WRITE, PRIORITY_STATUS
+)
+from opentherm_poller import OpenThermPoller, PolledValue, DEFAULT_POLL_INTERVALS, resolve_data_id
 
 logger = logging.getLogger(__name__)
 
@@ -14,194 +20,389 @@ class OpenThermProtocol:
     """OpenTherm protocol implementation."""
     
     # Message types
-    READ_DATA = 0
-    WRITE_DATA = 1
-    INVALID_DATA = 2
-    RESERVED = 3
+    READ_DATA = codec.READ_DATA
+    WRITE_DATA = codec.WRITE_DATA
+    INVALID_DATA = codec.INVALID_DATA
+    RESERVED = codec.RESERVED
     
     # Data IDs
     STATUS = 0
-    TSET = 1  # Control setpoint (target temperature)
+    TSET = 1  # Control setpoint (flow temperature)
+    TRSET = 16  # Room setpoint
+    TR = 24  # Room temperature
     TBOILER = 25  # Boiler water temperature
+    TOUTSIDE = 27  # Outside temperature
+    
+    # Master status flags sent in the high byte of a status read
+    MASTER_CH_ENABLE = 0x01
+    MASTER_DHW_ENABLE = 0x02
+    
+    # Seconds to wait for the response to a request
+    RESPONSE_TIMEOUT = 1.0
     
     def __init__(self, serial_port: str, baudrate: int = 9600):
         """Initialize OpenTherm connection."""
         self.serial_port = serial_port
         self.baudrate = baudrate
-        self.serial: Optional[serial.Serial] = None
+        self.transport = OpenThermTransport(
+            serial_port, baudrate, frame_size=codec.FRAME_SIZE,
+            is_valid_frame=codec.is_valid_frame
+        )
+        self.queue = OpenThermTransactionQueue(
+            self.transport, codec.frame_data_id, timeout=self.RESPONSE_TIMEOUT
+        )
+        # Master status sent with every status read
+        self.ch_enabled = True
+        self.dhw_enabled = True
         
-    def connect(self):
+    async def connect(self):
         """Connect to OpenTherm interface."""
         try:
-            self.serial = serial.Serial(
-                port=self.serial_port,
-                baudrate=self.baudrate,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                timeout=1
-            )
-            logger.info(f"Connected to OpenTherm on {self.serial_port}")
+            await self.transport.connect()
+            self.queue.start()
         except Exception as e:
             logger.error(f"Failed to connect to OpenTherm: {e}")
             raise
     
-    def disconnect(self):
+    async def disconnect(self):
         """Disconnect from OpenTherm interface."""
-        if self.serial and self.serial.is_open:
-            self.serial.close()
-            logger.info("Disconnected from OpenTherm")
-    
-    def _calculate_checksum(self, data: bytes) -> int:
-        """Calculate checksum for OpenTherm message."""
-        return sum(data) & 0xFF
-    
-    def _create_message(self, msg_type: int, data_id: int, data_value: int) -> bytes:
-        """Create an OpenTherm message."""
-        # OpenTherm message format: [Start byte, MSB, LSB, Checksum]
-        msb = (msg_type << 6) | ((data_id >> 8) & 0x3F)
-        lsb = data_id & 0xFF
-        data_bytes = struct.pack('>H', data_value)
-        msb_data = (msb << 8) | data_bytes[0]
-        lsb_data = (lsb << 8) | data_bytes[1]
-        
-        msg = bytes([0x00, msb_data, lsb_data, 0x00])
-        checksum = self._calculate_checksum(msg[1:3])
-        msg = bytes([0x00, msb_data, lsb_data, checksum])
-        return msg
-    
-    def _parse_message(self, msg: bytes) -> Optional[Tuple[int, int, int]]:
-        """Parse an OpenTherm message."""
-        if len(msg) != 4:
-            return None
+        await self.queue.stop()
+        await self.transport.close()
+    
+    async def _transact(self, msg_type: int, data_id: int, value: Any = None,
+                        priority: int = PRIORITY_STATUS) -> Optional[codec.Frame]:
+        """Queue a message and decode the acknowledged response."""
+        if not self.transport.connected:
+            raise ConnectionError("OpenTherm not connected")
         
-        checksum = self._calculate_checksum(msg[1:3])
-        if checksum != msg[3]:
-            logger.warning("Invalid checksum in OpenTherm message")
+        msg = codec.encode(msg_type, data_id, value)
+        response = await self.queue.submit(
+            msg, data_id, priority, read=msg_type == self.READ_DATA
+        )
+        if not response:
             return None
         
-        msb = msg[1]
-        lsb = msg[2]
+        frame = codec.decode(response)
+        if frame.msg_type not in (codec.READ_ACK, codec.WRITE_ACK):
+            logger.warning(
+                f"OpenTherm data-id {data_id} answered with "
+                f"{codec.MSG_TYPE_NAMES[frame.msg_type]}"
+            )
+            return None
+        return frame
+    
+    async def read(self, data_id: int, priority: int = PRIORITY_STATUS) -> Any:
+        """
+        Read a data-id from the boiler.
         
-        msg_type = (msb >> 6) & 0x03
-        data_id = ((msb & 0x3F) << 8) | lsb
-        data_value = ((msb & 0x0F) << 12) | ((lsb & 0xFF) << 4)
+        Args:
+            data_id: Data-id to read
+            priority: Transaction priority class
+            
+        Returns:
+            Decoded value, or None if the boiler did not acknowledge the read
+        """
+        frame = await self._transact(self.READ_DATA, data_id, priority=priority)
+        return frame.value if frame else None
+    
+    async def write(self, data_id: int, value: Any, priority: int = PRIORITY_WRITE) -> bool:
+        """
+        Write a data-id to the boiler.
         
-        return (msg_type, data_id, data_value)
+        Args:
+            data_id: Data-id to write
+            value: Value in the type of the data-id
+            priority: Transaction priority class
+            
+        Returns:
+            True if the boiler acknowledged the write
+        """
+        frame = await self._transact(self.WRITE_DATA, data_id, value, priority)
+        return frame is not None
     
-    def set_target_temperature(self, temperature: float):
+    async def set_target_temperature(self, temperature: float):
         """Set target temperature for boiler (TSET)."""
-        if not self.serial or not self.serial.is_open:
-            raise ConnectionError("OpenTherm not connected")
-        
-        # Convert temperature to OpenTherm format (signed fixed point, 0.1°C resolution)
-        temp_value = int(temperature * 10) & 0xFFFF
-        
-        msg = self._create_message(self.WRITE_DATA, self.TSET, temp_value)
-        self.serial.write(msg)
-        time.sleep(0.1)
-        
-        # Read response
-        response = self.serial.read(4)
-        if response:
-            parsed = self._parse_message(response)
-            if parsed:
-                logger.info(f"Set target temperature to {temperature}°C")
-                return True
+        if await self.write(self.TSET, temperature):
+            logger.info(f"Set target temperature to {temperature}°C")
+            return True
         
         logger.warning("Failed to set target temperature")
         return False
     
-    def get_boiler_temperature(self) -> Optional[float]:
+    async def set_room_setpoint(self, temperature: float) -> bool:
+        """Send the room setpoint to the boiler (TrSet)."""
+        return await self.write(self.TRSET, temperature)
+    
+    async def set_room_temperature(self, temperature: float) -> bool:
+        """Send the room temperature to the boiler (Tr)."""
+        return await self.write(self.TR, temperature)
+    
+    async def get_boiler_temperature(self) -> Optional[float]:
         """Get current boiler water temperature."""
-        if not self.serial or not self.serial.is_open:
-            raise ConnectionError("OpenTherm not connected")
-        
-        msg = self._create_message(self.READ_DATA, self.TBOILER, 0)
-        self.serial.write(msg)
-        time.sleep(0.1)
-        
-        response = self.serial.read(4)
-        if response:
-            parsed = self._parse_message(response)
-            if parsed:
-                msg_type, data_id, data_value = parsed
-                if data_id == self.TBOILER:
-                    # Convert from OpenTherm format (signed fixed point, 0.1°C resolution)
-                    temp = (data_value >> 4) / 10.0
-                    return temp
-        
-        return None
+        return await self.read(self.TBOILER)
     
-    def get_status(self) -> Optional[dict]:
+    async def get_status(self) -> Optional[dict]:
         """Get boiler status."""
-        if not self.serial or not self.serial.is_open:
-            raise ConnectionError("OpenTherm not connected")
+        master_status = (
+            (self.MASTER_CH_ENABLE if self.ch_enabled else 0)
+            | (self.MASTER_DHW_ENABLE if self.dhw_enabled else 0)
+        )
+        frame = await self._transact(self.READ_DATA, self.STATUS, (master_status, 0))
+        if not frame:
+            return None
         
-        msg = self._create_message(self.READ_DATA, self.STATUS, 0)
-        self.serial.write(msg)
-        time.sleep(0.1)
-        
-        response = self.serial.read(4)
-        if response:
-            parsed = self._parse_message(response)
-            if parsed:
-                msg_type, data_id, data_value = parsed
-                if data_id == self.STATUS:
-                    return {
-                        'ch_enabled': bool(data_value & 0x01),
-                        'dhw_enabled': bool(data_value & 0x02),
-                        'cooling_enabled': bool(data_value & 0x04),
-                        'otc_active': bool(data_value & 0x08),
-                        'ch2_enabled': bool(data_value & 0x10),
-                        'fault': bool(data_value & 0x80)
-                    }
-        
-        return None
+        master, slave = frame.value
+        return {
+            'ch_enabled': bool(master & 0x01),
+            'dhw_enabled': bool(master & 0x02),
+            'cooling_enabled': bool(master & 0x04),
+            'otc_active': bool(master & 0x08),
+            'ch2_enabled': bool(master & 0x10),
+            'fault': bool(slave & 0x01),
+            'ch_active': bool(slave & 0x02),
+            'dhw_active': bool(slave & 0x04),
+            'flame': bool(slave & 0x08),
+            'cooling_active': bool(slave & 0x10),
+            'ch2_active': bool(slave & 0x20),
+            'diagnostic': bool(slave & 0x40)
+        }
+
+
+class HeatingCurve:
+    """
+    Flow temperature for the boiler from the room and outside temperatures.
+    
+    The flow temperature starts at the room setpoint and rises by the slope
+    for every degree the outside temperature is below the room setpoint.
+    The room error is added with the room gain, so a room lagging behind
+    the curve gets warmer water. Without an outside temperature only the
+    room error is used.
+    """
+    
+    def __init__(self, slope: float = 1.5, room_gain: float = 5.0,
+                 min_flow: float = 20.0, max_flow: float = 70.0):
+        """
+        Initialize heating curve.
+        
+        Args:
+            slope: Flow temperature rise per degree of outside temperature
+                below the room setpoint
+            room_gain: Flow temperature rise per degree the room is below
+                its setpoint
+            min_flow: Lowest flow temperature in Celsius
+            max_flow: Highest flow temperature in Celsius
+        """
+        self.slope = slope
+        self.room_gain = room_gain
+        self.min_flow = min_flow
+        self.max_flow = max_flow
+    
+    def flow_temperature(self, room_setpoint: float, room_temperature: float,
+                         outside_temperature: Optional[float] = None) -> float:
+        """Get the flow temperature in Celsius, rounded to 0.1 °C."""
+        flow = room_setpoint + self.room_gain * (room_setpoint - room_temperature)
+        if outside_temperature is not None:
+            flow += self.slope * max(0.0, room_setpoint - outside_temperature)
+        return round(max(self.min_flow, min(self.max_flow, flow)), 1)
 
 
 class OpenThermController:
     """High-level OpenTherm controller."""
     
-    def __init__(self, serial_port: str, baudrate: int = 9600):
-        """Initialize OpenTherm controller."""
+    # Outside temperatures older than this many seconds are not used
+    OUTSIDE_MAX_AGE = 3600
+    
+    # Seconds between reconnect attempts after an I/O error, doubling up to the maximum
+    RECONNECT_DELAY = 5.0
+    RECONNECT_MAX_DELAY = 300.0
+    
+    # Seconds after which an unchanged room setpoint and room temperature are sent again
+    ROOM_REFRESH_INTERVAL = 60.0
+    
+    def __init__(self, serial_port: str, baudrate: int = 9600,
+                 poll_intervals: Optional[Dict[Union[int, str], float]] = None,
+                 max_rate: float = 1.0, heating_curve: Optional[HeatingCurve] = None):
+        """
+        Initialize OpenTherm controller.
+        
+        Args:
+            serial_port: Serial device of the OpenTherm interface
+            baudrate: Serial baud rate
+            poll_intervals: Dict mapping data-id number or name to its poll
+                interval in seconds (default: DEFAULT_POLL_INTERVALS)
+            max_rate: Most OpenTherm messages per second
+            heating_curve: Curve for the flow temperature sent as control
+                setpoint (default: HeatingCurve())
+        """
         self.protocol = OpenThermProtocol(serial_port, baudrate)
+        self.heating_curve = heating_curve or HeatingCurve()
+        # Flow temperature last acknowledged by the boiler
+        self.flow_setpoint: Optional[float] = None
+        # Room setpoint and temperature last acknowledged, by data-id
+        self._room_writes: Dict[int, PolledValue] = {}
+        poll_intervals = dict(poll_intervals or DEFAULT_POLL_INTERVALS)
+        if not any(resolve_data_id(key) == OpenThermProtocol.STATUS for key in poll_intervals):
+            # The status read carries the CH enable flag to the boiler
+            poll_intervals['status'] = DEFAULT_POLL_INTERVALS['status']
+        self.poller = OpenThermPoller(self.protocol, poll_intervals, max_rate)
+        self.protocol.queue.on_error = self._connection_lost
+        self._reconnect_task: Optional[asyncio.Task] = None
         self.connected = False
         
-    def start(self):
+    async def start(self):
         """Start OpenTherm connection."""
         try:
-            self.protocol.connect()
+            await self.protocol.connect()
             self.connected = True
+            self.poller.start()
             logger.info("OpenTherm controller started")
         except Exception as e:
             logger.error(f"Failed to start OpenTherm controller: {e}")
             self.connected = False
     
-    def stop(self):
+    async def stop(self):
         """Stop OpenTherm connection."""
+        reconnect, self._reconnect_task = self._reconnect_task, None
+        if reconnect is not None:
+            reconnect.cancel()
+            await asyncio.wait({reconnect})
+            await self.poller.stop()
+            await self.protocol.disconnect()
         if self.connected:
-            self.protocol.disconnect()
+            await self.poller.stop()
+            await self.protocol.disconnect()
             self.connected = False
             logger.info("OpenTherm controller stopped")
     
-    def set_control_temperature(self, target_temp: float, current_temp: float):
-        """Set control temperature based on room with highest difference."""
+    def _connection_lost(self, error: Exception):
+        """Fall back to Home Assistant output and reconnect in the background."""
+        if not self.connected:
+            return
+        self.connected = False
+        logger.error(f"OpenTherm connection lost ({error}), boiler output only via Home Assistant")
+        self._reconnect_task = asyncio.create_task(self._reconnect())
+    
+    async def _reconnect(self):
+        """Reopen the OpenTherm interface with exponential backoff."""
+        await self.poller.stop()
+        await self.protocol.disconnect()
+        if self._reconnect_task is not asyncio.current_task():
+            # stop() ran while the disconnect swallowed the cancellation
+            return
+        delay = self.RECONNECT_DELAY
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self.protocol.connect()
+                break
+            except Exception:
+                delay = min(delay * 2, self.RECONNECT_MAX_DELAY)
+                logger.warning(f"OpenTherm reconnect failed, retrying in {delay:.0f}s")
+        self.connected = True
+        # The boiler may have restarted, so send everything again
+        self._room_writes.clear()
+        self.poller.start()
+        self._reconnect_task = None
+        logger.info("OpenTherm reconnected")
+    
+    async def set_control_temperature(self, target_temp: float, current_temp: float,
+                                      pushed: bool = False):
+        """
+        Send the room with the highest difference to the boiler.
+        
+        The control setpoint is the flow temperature from the heating curve;
+        the room setpoint and temperature are sent along for boilers that
+        use them for modulation or display, but only when they change or
+        every ROOM_REFRESH_INTERVAL seconds.
+        
+        Args:
+            target_temp: Room setpoint
+            current_temp: Room temperature
+            pushed: True for a pushed temperature change between scheduled
+                writes; the control setpoint is then only sent if it changed,
+                and nothing is sent above the message budget of the bus
+        
+        Returns:
+            True if the boiler has acknowledged the control setpoint
+        """
         if not self.connected:
             logger.warning("OpenTherm not connected, cannot set temperature")
             return False
         
-        # Use the target temperature (room with highest difference)
-        return self.protocol.set_target_temperature(target_temp)
+        if pushed and not self._within_message_budget():
+            # The next scheduled write sends the change
+            return False
+        
+        outside = self.poller.get(OpenThermProtocol.TOUTSIDE)
+        if outside is not None and outside.age > self.OUTSIDE_MAX_AGE:
+            outside = None
+        flow_temp = self.heating_curve.flow_temperature(
+            target_temp, current_temp, outside.value if outside else None
+        )
+        
+        if pushed and flow_temp == self.flow_setpoint:
+            ok = True
+        else:
+            ok = await self.protocol.set_target_temperature(flow_temp)
+            if ok:
+                self.flow_setpoint = flow_temp
+        await self._write_room_value(OpenThermProtocol.TRSET, target_temp)
+        await self._write_room_value(OpenThermProtocol.TR, current_temp)
+        return ok
+    
+    async def _write_room_value(self, data_id: int, value: float):
+        """Write the room setpoint or temperature if it changed or is due for a refresh."""
+        last = self._room_writes.get(data_id)
+        if last is not None and last.value == value and last.age < self.ROOM_REFRESH_INTERVAL:
+            return
+        if await self.protocol.write(data_id, value):
+            self._room_writes[data_id] = PolledValue(value, time.monotonic())
+    
+    def _within_message_budget(self) -> bool:
+        """Check if the last message on the bus leaves room for another one."""
+        last_sent = self.protocol.queue.last_sent_at
+        return last_sent is None or time.monotonic() - last_sent >= 1.0 / self.poller.max_rate
+    
+    async def set_heating_demand(self, enabled: bool):
+        """Enable or disable central heating, sending the change right away."""
+        if not self.connected or self.protocol.ch_enabled == enabled:
+            return
+        
+        self.protocol.ch_enabled = enabled
+        logger.info(f"OpenTherm central heating {'enabled' if enabled else 'disabled'}")
+        await self.poller.refresh(OpenThermProtocol.STATUS)
     
     def get_boiler_status(self) -> Optional[dict]:
-        """Get boiler status."""
+        """Get boiler status from the poll cache, without using the bus."""
         if not self.connected:
             return None
         
-        temp = self.protocol.get_boiler_temperature()
-        status = self.protocol.get_status()
+        status = self.poller.get(OpenThermProtocol.STATUS)
+        if status is None:
+            return None
+        
+        temp = self.poller.get(OpenThermProtocol.TBOILER)
+        result = dict(status.value)
+        result['temperature'] = temp.value if temp else None
+        return result
+    
+    def get_telemetry(self, max_age: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Get all polled boiler values from the cache, without using the bus.
         
-        if status:
-            status['temperature'] = temp
-        return status
\ No newline at end of file
+        Args:
+            max_age: Leave out values older than this many seconds
+            
+        Returns:
+            Dict mapping data-id name to value
+        """
+        return self.poller.get_values(max_age)
+    
+    def get_bus_stats(self) -> dict:
+        """Get queue depth and transaction latency of the OpenTherm bus."""
+        queue = self.protocol.queue
+        stats = dict(queue.stats)
+        stats['queue_depth'] = queue.queue_depth
+        completed = stats['completed']
+        stats['avg_latency'] = stats['total_latency'] / completed if completed else 0.0
+        return stats
@@ -0,0 +1,318 @@
+"""
+Table-driven codec for the 32-bit OpenTherm frame.
+
+Frame layout (bit 31 is sent first):
+
+    bit 31      parity (even parity over the whole frame)
+    bits 30-28  message type
+    bits 27-24  spare (0)
+    bits 23-16  data-id
+    bits 15-0   data value (high byte in bits 15-8)
+
+How the data value is interpreted depends on the data-id; DATA_IDS maps
+each known data-id to its value type. Frames travel over the serial
+interface as 4 bytes, most significant byte first.
+"""
+import struct
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Message types from master to slave
+READ_DATA = 0
+WRITE_DATA = 1
+INVALID_DATA = 2
+RESERVED = 3
+# Message types from slave to master
+READ_ACK = 4
+WRITE_ACK = 5
+DATA_INVALID = 6
+UNKNOWN_DATA_ID = 7
+
+MSG_TYPE_NAMES = (
+    'READ_DATA', 'WRITE_DATA', 'INVALID_DATA', 'RESERVED',
+    'READ_ACK', 'WRITE_ACK', 'DATA_INVALID', 'UNKNOWN_DATA_ID'
+)
+
+# Value types
+F8_8 = 'f8.8'     # Signed fixed point, 1/256 resolution
+U16 = 'u16'       # Unsigned 16-bit integer
+S16 = 's16'       # Signed 16-bit integer
+FLAG8 = 'flag8'   # Two bytes of flags (high byte, low byte)
+U8 = 'u8'         # Two unsigned bytes (high byte, low byte)
+S8 = 's8'         # Two signed bytes (high byte, low byte)
+
+FRAME_SIZE = 4
+
+
+@dataclass(frozen=True, slots=True)
+class DataId:
+    """Definition of an OpenTherm data-id."""
+    id: int
+    name: str
+    value_type: str
+
+
+# Data-ids of the OpenTherm 2.2 specification used by MultiStat
+DATA_IDS: Dict[int, DataId] = {
+    definition.id: definition for definition in (
+        DataId(0, 'status', FLAG8),
+        DataId(1, 'control_setpoint', F8_8),
+        DataId(2, 'master_config', U8),
+        DataId(3, 'slave_config', U8),
+        DataId(5, 'fault_flags', U8),
+        DataId(6, 'remote_parameter_flags', FLAG8),
+        DataId(7, 'cooling_control', F8_8),
+        DataId(8, 'control_setpoint_ch2', F8_8),
+        DataId(9, 'remote_override_setpoint', F8_8),
+        DataId(14, 'max_modulation_setting', F8_8),
+        DataId(15, 'max_capacity_min_modulation', U8),
+        DataId(16, 'room_setpoint', F8_8),
+        DataId(17, 'modulation_level', F8_8),
+        DataId(18, 'ch_pressure', F8_8),
+        DataId(19, 'dhw_flow_rate', F8_8),
+        DataId(24, 'room_temperature', F8_8),
+        DataId(25, 'boiler_temperature', F8_8),
+        DataId(26, 'dhw_temperature', F8_8),
+        DataId(27, 'outside_temperature', F8_8),
+        DataId(28, 'return_temperature', F8_8),
+        DataId(29, 'storage_temperature', F8_8),
+        DataId(30, 'collector_temperature', S16),
+        DataId(31, 'flow_temperature_ch2', F8_8),
+        DataId(32, 'dhw2_temperature', F8_8),
+        DataId(33, 'exhaust_temperature', S16),
+        DataId(48, 'dhw_setpoint_bounds', S8),
+        DataId(49, 'max_ch_setpoint_bounds', S8),
+        DataId(56, 'dhw_setpoint', F8_8),
+        DataId(57, 'max_ch_setpoint', F8_8),
+        DataId(115, 'oem_diagnostic_code', U16),
+        DataId(116, 'burner_starts', U16),
+        DataId(117, 'ch_pump_starts', U16),
+        DataId(118, 'dhw_pump_starts', U16),
+        DataId(119, 'dhw_burner_starts', U16),
+        DataId(120, 'burner_hours', U16),
+        DataId(121, 'ch_pump_hours', U16),
+        DataId(122, 'dhw_pump_hours', U16),
+        DataId(123, 'dhw_burner_hours', U16),
+        DataId(124, 'master_opentherm_version', F8_8),
+        DataId(125, 'slave_opentherm_version', F8_8),
+        DataId(126, 'master_product_version', U8),
+        DataId(127, 'slave_product_version', U8),
+    )
+}
+
+DATA_IDS_BY_NAME: Dict[str, DataId] = {definition.name: definition for definition in DATA_IDS.values()}
+
+
+class Frame(NamedTuple):
+    """A decoded OpenTherm frame."""
+    msg_type: int
+    data_id: int
+    raw: int
+    value: Any
+    valid: bool
+
+
+def _parity(frame: int) -> int:
+    """Get the parity (1 for an odd number of set bits) of a 32-bit value."""
+    frame ^= frame >> 16
+    frame ^= frame >> 8
+    frame ^= frame >> 4
+    frame ^= frame >> 2
+    frame ^= frame >> 1
+    return frame & 1
+
+
+def encode_value(value_type: str, value: Any) -> int:
+    """
+    Encode a value as the 16-bit data value.
+
+    Args:
+        value_type: Value type of the data-id
+        value: Number, or a (high byte, low byte) tuple for the
+            flag8, u8 and s8 types
+
+    Returns:
+        16-bit data value
+    """
+    if value_type == F8_8:
+        raw = int(round(value * 256))
+        if not -0x8000 <= raw <= 0x7FFF:
+            raise ValueError(f"Value out of f8.8 range: {value}")
+        return raw & 0xFFFF
+    if value_type == U16:
+        if not 0 <= value <= 0xFFFF:
+            raise ValueError(f"Value out of u16 range: {value}")
+        return int(value)
+    if value_type == S16:
+        if not -0x8000 <= value <= 0x7FFF:
+            raise ValueError(f"Value out of s16 range: {value}")
+        return int(value) & 0xFFFF
+    if value_type in (FLAG8, U8, S8):
+        high, low = value
+        return ((int(high) & 0xFF) << 8) | (int(low) & 0xFF)
+    raise ValueError(f"Unknown value type: {value_type}")
+
+
+def decode_value(value_type: str, raw: int) -> Any:
+    """
+    Decode a 16-bit data value.
+
+    Args:
+        value_type: Value type of the data-id
+        raw: 16-bit data value
+
+    Returns:
+        Number, or a (high byte, low byte) tuple for the flag8, u8 and s8 types
+    """
+    if value_type == F8_8:
+        return (raw - 0x10000 if raw & 0x8000 else raw) / 256
+    if value_type == U16:
+        return raw
+    if value_type == S16:
+        return raw - 0x10000 if raw & 0x8000 else raw
+    if value_type in (FLAG8, U8):
+        return (raw >> 8, raw & 0xFF)
+    if value_type == S8:
+        high, low = raw >> 8, raw & 0xFF
+        return (high - 0x100 if high & 0x80 else high, low - 0x100 if low & 0x80 else low)
+    raise ValueError(f"Unknown value type: {value_type}")
+
+
+def encode_frame(msg_type: int, data_id: int, raw: int = 0) -> int:
+    """Build a 32-bit frame with its parity bit from a raw data value."""
+    frame = ((msg_type & 0x7) << 28) | ((data_id & 0xFF) << 16) | (raw & 0xFFFF)
+    return frame | (_parity(frame) << 31)
+
+
+def encode(msg_type: int, data_id: int, value: Any = None) -> bytes:
+    """
+    Encode a message as the 4 bytes of a frame.
+
+    Args:
+        msg_type: Message type
+        data_id: Data-id (must be in DATA_IDS when value is given)
+        value: Data value; None sends 0 (as in most read requests)
+
+    Returns:
+        Frame bytes, most significant byte first
+    """
+    raw = 0
+    if value is not None:
+        definition = DATA_IDS.get(data_id)
+        if definition is None:
+            raise ValueError(f"Unknown OpenTherm data-id: {data_id}")
+        raw = encode_value(definition.value_type, value)
+    return struct.pack('>I', encode_frame(msg_type, data_id, raw))
+
+
+def decode_frame(frame: int) -> Frame:
+    """Decode a 32-bit frame; values of unknown data-ids are left as raw u16."""
+    msg_type = (frame >> 28) & 0x7
+    data_id = (frame >> 16) & 0xFF
+    raw = frame & 0xFFFF
+    definition = DATA_IDS.get(data_id)
+    value = decode_value(definition.value_type, raw) if definition else raw
+    valid = not _parity(frame) and not frame & 0x0F000000
+    return Frame(msg_type, data_id, raw, value, valid)
+
+
+def decode(data: bytes) -> Frame:
+    """Decode the 4 bytes of a frame."""
+    if len(data) != FRAME_SIZE:
+        raise ValueError(f"OpenTherm frame must be {FRAME_SIZE} bytes, got {len(data)}")
+    return decode_frame(int.from_bytes(data, 'big'))
+
+
+def is_valid_frame(data: bytes) -> bool:
+    """Check the parity and spare bits of the 4 bytes of a frame."""
+    frame = int.from_bytes(data, 'big')
+    return not _parity(frame) and not frame & 0x0F000000
+
+
+def frame_data_id(data: bytes) -> Optional[int]:
+    """Get the data-id of the 4 bytes of a frame (None if the frame is invalid)."""
+    if len(data) != FRAME_SIZE or not is_valid_frame(data):
+        return None
+    return data[1]
+
+
+def iter_frames(data: bytes) -> Iterator[Tuple[int, Frame]]:
+    """
+    Decode a captured byte stream frame by frame.
+
+    Bytes that do not start a valid frame are skipped one at a time until
+    the stream is back on a frame boundary.
+
+    Yields:
+        Tuples of the byte offset and the decoded frame
+    """
+    view = memoryview(data)
+    offset = 0
+    end = len(data) - FRAME_SIZE
+    while offset <= end:
+        frame = int.from_bytes(view[offset:offset + FRAME_SIZE], 'big')
+        if _parity(frame) or frame & 0x0F000000:
+            offset += 1
+            continue
+        yield offset, decode_frame(frame)
+        offset += FRAME_SIZE
+
+
+def decode_stream(data: bytes) -> List[Frame]:
+    """Decode all valid frames of a captured byte stream."""
+    return [frame for _, frame in iter_frames(data)]
+
+
+# Lookup tables for decode_array, indexed by data-id
+_F8_8_IDS = [i for i, d in DATA_IDS.items() if d.value_type == F8_8]
+_S16_IDS = [i for i, d in DATA_IDS.items() if d.value_type == S16]
+
+
+def decode_array(data: bytes) -> Dict[str, 'np.ndarray']:
+    """
+    Decode a frame-aligned byte stream with NumPy.
+
+    Scalar values are decoded to float64 (f8.8, u16 and s16); flag8, u8 and
+    s8 values and unknown data-ids keep the raw data value. Frames that
+    fail the parity check are kept and marked in 'valid'.
+
+    Args:
+        data: Captured frames; the length must be a multiple of 4
+
+    Returns:
+        Dict with the 'msg_type', 'data_id', 'raw', 'value' and 'valid' arrays
+    """
+    if np is None:
+        raise RuntimeError("NumPy is not installed")
+    if len(data) % FRAME_SIZE:
+        raise ValueError(f"Stream length must be a multiple of {FRAME_SIZE}")
+
+    frames = np.frombuffer(data, dtype='>u4').astype(np.uint32)
+    msg_type = ((frames >> 28) & 0x7).astype(np.uint8)
+    data_id = ((frames >> 16) & 0xFF).astype(np.uint8)
+    raw = (frames & 0xFFFF).astype(np.uint16)
+
+    parity = frames.copy()
+    for shift in (16, 8, 4, 2, 1):
+        parity ^= parity >> shift
+    valid = ((parity & 1) == 0) & ((frames & 0x0F000000) == 0)
+
+    signed = raw.view(np.int16).astype(np.float64)
+    value = raw.astype(np.float64)
+    f8_8 = np.isin(data_id, _F8_8_IDS)
+    value[f8_8] = signed[f8_8] / 256
+    s16 = np.isin(data_id, _S16_IDS)
+    value[s16] = signed[s16]
+
+    return {
+        'msg_type': msg_type,
+        'data_id': data_id,
+        'raw': raw,
+        'value': value,
+        'valid': valid
+    }
@@ -0,0 +1,213 @@
+"""
+Polling scheduler and read cache for OpenTherm telemetry.
+"""
+import time
+import heapq
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import opentherm_codec as codec
+from opentherm_queue import PRIORITY_DIAGNOSTICS
+
+logger = logging.getLogger(__name__)
+
+# Default poll intervals in seconds per data-id name (about 0.4 messages per second)
+DEFAULT_POLL_INTERVALS: Dict[str, float] = {
+    'status': 10.0,
+    'boiler_temperature': 10.0,
+    'modulation_level': 10.0,
+    'return_temperature': 30.0,
+    'dhw_temperature': 60.0,
+    'ch_pressure': 60.0,
+    'fault_flags': 60.0,
+    'outside_temperature': 120.0
+}
+
+# Consecutive failed reads after which a data-id is treated as unsupported
+UNSUPPORTED_AFTER = 3
+# Interval multiplier for unsupported data-ids
+UNSUPPORTED_BACKOFF = 10
+
+
+@dataclass(slots=True)
+class PolledValue:
+    """Last value read for a data-id."""
+    value: Any
+    timestamp: float  # time.monotonic() of the read
+
+    @property
+    def age(self) -> float:
+        """Seconds since the value was read."""
+        return time.monotonic() - self.timestamp
+
+
+def resolve_data_id(key: Union[int, str]) -> int:
+    """Get the data-id for a data-id number or name."""
+    if isinstance(key, int):
+        return key
+    if isinstance(key, str) and key.isdigit():
+        return int(key)
+    definition = codec.DATA_IDS_BY_NAME.get(key)
+    if definition is None:
+        raise ValueError(f"Unknown OpenTherm data-id: {key}")
+    return definition.id
+
+
+class OpenThermPoller:
+    """
+    Polls OpenTherm data-ids at their own rates into a timestamped cache.
+
+    Each data-id is kept on its own fixed grid of the monotonic clock. The
+    poller sends at most one read per 1 / max_rate seconds, counting every
+    transaction on the bus (including setpoint writes), so the bus stays
+    within its message budget; when more reads are due than the budget
+    allows, the most overdue data-id goes first and the others wait.
+    Setpoint writes are never held back by the poller.
+    """
+
+    def __init__(self, protocol, intervals: Optional[Dict[Union[int, str], float]] = None,
+                 max_rate: float = 1.0):
+        """
+        Initialize OpenTherm poller.
+
+        Args:
+            protocol: OpenThermProtocol to read with
+            intervals: Dict mapping data-id number or name to its poll
+                interval in seconds (default: DEFAULT_POLL_INTERVALS)
+            max_rate: Most OpenTherm messages per second
+        """
+        self.protocol = protocol
+        self.max_rate = max_rate
+        self.intervals: Dict[int, float] = {
+            resolve_data_id(key): float(interval)
+            for key, interval in (intervals or DEFAULT_POLL_INTERVALS).items()
+            if interval and interval > 0
+        }
+        self.cache: Dict[int, PolledValue] = {}
+
+        self._schedule: List[Tuple[float, int]] = []
+        self._failures: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.stats: Dict[str, Any] = {
+            'reads': 0,
+            'failed_reads': 0,
+            'max_lateness': 0.0
+        }
+
+        load = sum(1 / interval for interval in self.intervals.values())
+        if load > max_rate:
+            logger.warning(
+                f"OpenTherm poll intervals need {load:.2f} messages/s, more than the "
+                f"budget of {max_rate}; reads will be spaced out"
+            )
+
+    def start(self):
+        """Start polling; all data-ids are due immediately."""
+        if self._task is not None:
+            return
+        now = time.monotonic()
+        self._schedule = [(now, data_id) for data_id in self.intervals]
+        heapq.heapify(self._schedule)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop polling."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get(self, key: Union[int, str]) -> Optional[PolledValue]:
+        """Get the cached value of a data-id number or name."""
+        return self.cache.get(resolve_data_id(key))
+
+    def get_values(self, max_age: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Get the cached values by data-id name.
+
+        Args:
+            max_age: Leave out values older than this many seconds
+
+        Returns:
+            Dict mapping data-id name to value
+        """
+        values = {}
+        for data_id, polled in self.cache.items():
+            if max_age is not None and polled.age > max_age:
+                continue
+            definition = codec.DATA_IDS.get(data_id)
+            values[definition.name if definition else str(data_id)] = polled.value
+        return values
+
+    async def refresh(self, key: Union[int, str]) -> bool:
+        """
+        Read a data-id into the cache right away.
+
+        Args:
+            key: Data-id number or name
+
+        Returns:
+            True if the read succeeded
+        """
+        return await self._poll(resolve_data_id(key))
+
+    async def _run(self):
+        """Read due data-ids within the message budget."""
+        min_spacing = 1.0 / self.max_rate
+        while self._schedule:
+            due, data_id = self._schedule[0]
+            now = time.monotonic()
+            delay = due - now
+            last_sent = self.protocol.queue.last_sent_at
+            if last_sent is not None:
+                delay = max(delay, last_sent + min_spacing - now)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            heapq.heappop(self._schedule)
+            self.stats['max_lateness'] = max(self.stats['max_lateness'], now - due)
+
+            ok = await self._poll(data_id)
+            interval = self.intervals[data_id]
+            if self._failures.get(data_id, 0) >= UNSUPPORTED_AFTER:
+                interval *= UNSUPPORTED_BACKOFF
+
+            # Keep the grid; skip ticks missed while waiting for the budget
+            next_due = due + interval
+            now = time.monotonic()
+            if next_due < now:
+                next_due += ((now - next_due) // interval + 1) * interval
+            heapq.heappush(self._schedule, (next_due, data_id))
+
+            if not ok and self._failures.get(data_id) == UNSUPPORTED_AFTER:
+                logger.warning(f"OpenTherm data-id {data_id} not supported by the boiler, polling less often")
+
+    async def _poll(self, data_id: int) -> bool:
+        """Read a data-id into the cache."""
+        try:
+            if data_id == self.protocol.STATUS:
+                # A status read carries the master status, so it goes through get_status
+                value = await self.protocol.get_status()
+            else:
+                value = await self.protocol.read(data_id, PRIORITY_DIAGNOSTICS)
+        except ConnectionError as e:
+            logger.error(f"Error polling OpenTherm data-id {data_id}: {e}")
+            value = None
+
+        self.stats['reads'] += 1
+        if value is None:
+            self.stats['failed_reads'] += 1
+            self._failures[data_id] = self._failures.get(data_id, 0) + 1
+            return False
+
+        self._failures[data_id] = 0
+        self.cache[data_id] = PolledValue(value, time.monotonic())
+        return True
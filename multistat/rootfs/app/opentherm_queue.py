@@ -0,0 +1,237 @@
+"""
+Single-owner transaction queue for the OpenTherm bus.
+"""
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from typing import Optional, Dict, Any, Callable, List
+
+from opentherm_transport import OpenThermTransport
+
+logger = logging.getLogger(__name__)
+
+# Transaction priority classes (lower runs first)
+PRIORITY_WRITE = 0        # Setpoint writes
+PRIORITY_STATUS = 1       # Status and control reads
+PRIORITY_DIAGNOSTICS = 2  # Telemetry and diagnostics reads
+
+# Bit of the first frame byte set in slave-to-master message types
+# (READ_ACK and up); master frames echoed by the interface have it clear
+SLAVE_MESSAGE_BIT = 0x40
+
+
+class Transaction:
+    """One request frame waiting for its response."""
+
+    __slots__ = ('frame', 'data_id', 'priority', 'timeout', 'future',
+                 'queued_at', 'sent_at')
+
+    def __init__(self, frame: bytes, data_id: int, priority: int, timeout: float,
+                 future: asyncio.Future):
+        self.frame = frame
+        self.data_id = data_id
+        self.priority = priority
+        self.timeout = timeout
+        self.future = future
+        self.queued_at = time.monotonic()
+        self.sent_at: Optional[float] = None
+
+
+class OpenThermTransactionQueue:
+    """
+    Serializes all access to the OpenTherm transport.
+
+    The bus carries one request at a time, so a single worker sends the
+    queued requests in priority order and sends the next one as soon as the
+    response to the previous one arrives. A response is matched to the
+    request by data-id and must be a slave message; frames for other
+    data-ids (late responses to timed out requests) and echoed master
+    frames are dropped. Reads of a data-id that is already queued with
+    the same frame share the queued transaction; a read carrying other
+    data (a status read with new master flags) is sent on its own.
+    """
+
+    def __init__(self, transport: OpenThermTransport,
+                 frame_data_id: Callable[[bytes], Optional[int]],
+                 timeout: float = 1.0):
+        """
+        Initialize transaction queue.
+
+        Args:
+            transport: Transport to send the requests on
+            frame_data_id: Get the data-id of a response frame
+                (None for a frame that cannot be parsed)
+            timeout: Default seconds to wait for a response
+        """
+        self.transport = transport
+        self.frame_data_id = frame_data_id
+        self.timeout = timeout
+
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+        self._pending_reads: Dict[int, Transaction] = {}
+        self._current: Optional[Transaction] = None
+        self._response: Optional[asyncio.Future] = None
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        # Monotonic time the last request was sent on the bus
+        self.last_sent_at: Optional[float] = None
+        # Called after a transport error has failed all transactions
+        self.on_error: Optional[Callable[[Exception], None]] = None
+
+        self.stats: Dict[str, Any] = {
+            'completed': 0,
+            'timeouts': 0,
+            'coalesced': 0,
+            'unmatched_frames': 0,
+            'max_queue_depth': 0,
+            'last_latency': 0.0,
+            'max_latency': 0.0,
+            'total_latency': 0.0,
+            'last_bus_time': 0.0
+        }
+
+        transport.on_frame = self._frame_received
+        transport.on_error = self._transport_failed
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of transactions waiting to be sent."""
+        return len(self._queue)
+
+    def start(self):
+        """Start the worker sending queued transactions."""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker and fail all queued transactions."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._fail_all(ConnectionError("OpenTherm transaction queue stopped"))
+
+    async def submit(self, frame: bytes, data_id: int, priority: int = PRIORITY_STATUS,
+                     timeout: Optional[float] = None, read: bool = False) -> Optional[bytes]:
+        """
+        Queue a request and wait for its response.
+
+        Args:
+            frame: Request frame
+            data_id: Data-id the response has to carry
+            priority: Priority class (lower runs first)
+            timeout: Seconds to wait for the response once sent
+            read: Whether the request is a read that may share a queued read
+                of the same data-id and frame
+
+        Returns:
+            Response frame, or None if no response arrived in time
+        """
+        if read:
+            queued = self._pending_reads.get(data_id)
+            if queued is not None and queued.sent_at is None and queued.frame == frame:
+                self.stats['coalesced'] += 1
+                return await asyncio.shield(queued.future)
+
+        future = asyncio.get_running_loop().create_future()
+        transaction = Transaction(
+            frame, data_id, priority, self.timeout if timeout is None else timeout, future
+        )
+        if read:
+            self._pending_reads[data_id] = transaction
+        heapq.heappush(self._queue, (priority, next(self._sequence), transaction))
+        self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], len(self._queue))
+        self._wakeup.set()
+        return await asyncio.shield(future)
+
+    async def _run(self):
+        """Send queued transactions one at a time."""
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            _, _, transaction = heapq.heappop(self._queue)
+            await self._execute(transaction)
+
+    async def _execute(self, transaction: Transaction):
+        """Send one transaction and wait for the matching response."""
+        response = None
+        self._current = transaction
+        self._response = asyncio.get_running_loop().create_future()
+        try:
+            transaction.sent_at = self.last_sent_at = time.monotonic()
+            self.transport.send(transaction.frame)
+            response = await asyncio.wait_for(self._response, transaction.timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            logger.warning(f"No OpenTherm response for data-id {transaction.data_id}")
+        except ConnectionError as e:
+            self._finish(transaction, error=e)
+            return
+        except asyncio.CancelledError:
+            self._finish(transaction, error=ConnectionError("OpenTherm transaction queue stopped"))
+            raise
+        finally:
+            self._current = None
+            self._response = None
+
+        self._finish(transaction, response)
+
+    def _finish(self, transaction: Transaction, response: Optional[bytes] = None,
+                error: Optional[Exception] = None):
+        """Complete a transaction and record its latency."""
+        if self._pending_reads.get(transaction.data_id) is transaction:
+            del self._pending_reads[transaction.data_id]
+
+        now = time.monotonic()
+        latency = now - transaction.queued_at
+        self.stats['completed'] += 1
+        self.stats['last_latency'] = latency
+        self.stats['max_latency'] = max(self.stats['max_latency'], latency)
+        self.stats['total_latency'] += latency
+        if transaction.sent_at is not None:
+            self.stats['last_bus_time'] = now - transaction.sent_at
+
+        if transaction.future.done():
+            return
+        if error is not None:
+            transaction.future.set_exception(error)
+        else:
+            transaction.future.set_result(response)
+
+    def _frame_received(self, frame: bytes):
+        """Match a received frame to the transaction on the bus."""
+        current = self._current
+        if (current is not None and self._response is not None
+                and not self._response.done()
+                and frame[0] & SLAVE_MESSAGE_BIT
+                and self.frame_data_id(frame) == current.data_id):
+            self._response.set_result(frame)
+            return
+
+        self.stats['unmatched_frames'] += 1
+        logger.debug(f"Dropped unmatched OpenTherm frame: {frame.hex()}")
+
+    def _transport_failed(self, error: Exception):
+        """Fail all transactions after a transport error."""
+        self._fail_all(ConnectionError(f"OpenTherm I/O error: {error}"))
+        if self.on_error is not None:
+            self.on_error(error)
+
+    def _fail_all(self, error: Exception):
+        """Fail the transaction on the bus and all queued transactions."""
+        if self._response is not None and not self._response.done():
+            self._response.set_exception(error)
+        while self._queue:
+            _, _, transaction = heapq.heappop(self._queue)
+            if not transaction.future.done():
+                transaction.future.set_exception(error)
+        self._pending_reads.clear()
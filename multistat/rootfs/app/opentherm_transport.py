@@ -0,0 +1,170 @@
+"""
+Asyncio serial transport for the OpenTherm interface.
+
+A dedicated I/O thread owns the serial port: it writes queued frames and
+reads incoming bytes, and hands complete frames to the event loop as they
+arrive, so OpenTherm exchanges never block the control loop.
+"""
+import queue
+import asyncio
+import logging
+import threading
+from typing import Callable, Optional
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+logger = logging.getLogger(__name__)
+
+
+class OpenThermTransport:
+    """Frame-based serial transport with a dedicated I/O thread."""
+
+    def __init__(self, serial_port: str, baudrate: int = 9600, frame_size: int = 4,
+                 is_valid_frame: Optional[Callable[[bytes], bool]] = None,
+                 read_timeout: float = 1.0):
+        """
+        Initialize OpenTherm transport.
+
+        Args:
+            serial_port: Serial device of the OpenTherm interface
+            baudrate: Serial baud rate
+            frame_size: Length of one frame in bytes
+            is_valid_frame: Check for received frames; on a failed check the
+                first byte is dropped to resynchronize with the frame boundary
+            read_timeout: Seconds the I/O thread blocks in a read while idle
+        """
+        self.serial_port = serial_port
+        self.baudrate = baudrate
+        self.frame_size = frame_size
+        self.is_valid_frame = is_valid_frame
+        self.read_timeout = read_timeout
+
+        self.serial = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._writes: queue.Queue = queue.Queue()
+        self._buffer = bytearray()
+
+        # Called in the event loop with each received frame
+        self.on_frame: Optional[Callable[[bytes], None]] = None
+        # Called in the event loop when the I/O thread stops on an error
+        self.on_error: Optional[Callable[[Exception], None]] = None
+
+        self.stats = {
+            'frames_sent': 0,
+            'frames_received': 0,
+            'resyncs': 0
+        }
+
+    @property
+    def connected(self) -> bool:
+        """Check if the port is open and the I/O thread is running."""
+        return self._running and self.serial is not None and self.serial.is_open
+
+    async def connect(self):
+        """Open the serial port and start the I/O thread."""
+        if serial is None:
+            raise RuntimeError("pyserial is not installed")
+
+        self._loop = asyncio.get_running_loop()
+        # Drop what was left over from a previous connection
+        self._buffer.clear()
+        self._writes = queue.Queue()
+        self.serial = await asyncio.to_thread(
+            serial.Serial,
+            port=self.serial_port,
+            baudrate=self.baudrate,
+            bytesize=serial.EIGHTBITS,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            timeout=self.read_timeout
+        )
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._io_loop, name='opentherm-io', daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Connected to OpenTherm on {self.serial_port}")
+
+    async def close(self):
+        """Stop the I/O thread and close the serial port."""
+        if self._thread is None:
+            return
+        # The I/O thread may already have stopped on an error
+        self._running = False
+        self._wake_io_thread()
+        if self._thread:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+        if self.serial and self.serial.is_open:
+            self.serial.close()
+        logger.info("Disconnected from OpenTherm")
+
+    def send(self, frame: bytes):
+        """Queue a frame for writing by the I/O thread."""
+        if not self.connected:
+            raise ConnectionError("OpenTherm not connected")
+        self._writes.put(bytes(frame))
+        self._wake_io_thread()
+
+    def _wake_io_thread(self):
+        """Interrupt a blocking read so the I/O thread picks up new writes."""
+        cancel_read = getattr(self.serial, 'cancel_read', None)
+        if cancel_read is not None:
+            try:
+                cancel_read()
+            except Exception:
+                pass
+
+    def _io_loop(self):
+        """Write queued frames and read incoming bytes (runs in the I/O thread)."""
+        while self._running:
+            try:
+                while True:
+                    try:
+                        frame = self._writes.get_nowait()
+                    except queue.Empty:
+                        break
+                    self.serial.write(frame)
+                    self.stats['frames_sent'] += 1
+
+                # Returns as soon as bytes arrive, or after read_timeout
+                data = self.serial.read(max(1, self.serial.in_waiting))
+            except Exception as e:
+                if self._running:
+                    logger.error(f"OpenTherm I/O error: {e}")
+                    self._loop.call_soon_threadsafe(self._io_failed, e)
+                    self._running = False
+                break
+
+            if data:
+                self._buffer.extend(data)
+                self._extract_frames()
+
+    def _extract_frames(self):
+        """Split the receive buffer into frames (runs in the I/O thread)."""
+        buffer = self._buffer
+        size = self.frame_size
+        while len(buffer) >= size:
+            frame = bytes(buffer[:size])
+            if self.is_valid_frame is not None and not self.is_valid_frame(frame):
+                del buffer[0]
+                self.stats['resyncs'] += 1
+                continue
+            del buffer[:size]
+            self._loop.call_soon_threadsafe(self._frame_received, frame)
+
+    def _frame_received(self, frame: bytes):
+        """Deliver a received frame to the owner of the transport."""
+        self.stats['frames_received'] += 1
+        if self.on_frame is not None:
+            self.on_frame(frame)
+
+    def _io_failed(self, error: Exception):
+        """Report an I/O error to the owner of the transport."""
+        if self.on_error is not None:
+            self.on_error(error)
@@ -1,16 +1,24 @@
 """
-PID controller for HRV valve position control.
+PID controllers for HRV valve position control.
 """
 import time
 import logging
 from typing import Optional
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 logger = logging.getLogger(__name__)
 
 
 class PIDController:
     """PID controller for HRV valve position."""
     
+    __slots__ = ('kp', 'ki', 'kd', 'setpoint', 'out_min', 'out_max',
+                 '_last_time', '_last_error', '_integral')
+    
     def __init__(self, kp: float = 1.0, ki: float = 0.1, kd: float = 0.05, 
                  setpoint: float = 0.0, output_limits: tuple = (0.0, 100.0)):
         """
@@ -27,29 +35,42 @@ class PIDController:
         self.ki = ki
         self.kd = kd
         self.setpoint = setpoint
-        self.output_limits = output_limits
+        self.out_min = float(output_limits[0])
+        self.out_max = float(output_limits[1])
         
         self._last_time: Optional[float] = None
         self._last_error: Optional[float] = None
         self._integral = 0.0
         
+    @property
+    def output_limits(self) -> tuple:
+        """Tuple of (min, max) output values."""
+        return (self.out_min, self.out_max)
+    
+    @output_limits.setter
+    def output_limits(self, output_limits: tuple):
+        self.out_min = float(output_limits[0])
+        self.out_max = float(output_limits[1])
+    
     def set_setpoint(self, setpoint: float):
         """Set the target setpoint."""
         self.setpoint = setpoint
         # Reset integral when setpoint changes
         self._integral = 0.0
     
-    def update(self, current_value: float) -> float:
+    def update(self, current_value: float, dt: Optional[float] = None) -> float:
         """
         Calculate PID output based on current value.
         
         Args:
             current_value: Current measured value
+            dt: Time step in seconds for the integral and derivative terms
+                (default: the time since the previous update)
             
         Returns:
             PID output value (clamped to output_limits)
         """
-        current_time = time.time()
+        current_time = time.monotonic()
         error = self.setpoint - current_value
         
         # Initialize on first call
@@ -59,7 +80,8 @@ class PIDController:
             return self._clamp_output(self.kp * error)
         
         # Calculate time delta
-        dt = current_time - self._last_time
+        if dt is None:
+            dt = current_time - self._last_time
         if dt <= 0:
             return self._clamp_output(self.kp * error)
         
@@ -85,7 +107,7 @@ class PIDController:
     
     def _clamp_output(self, output: float) -> float:
         """Clamp output to specified limits."""
-        return max(self.output_limits[0], min(self.output_limits[1], output))
+        return max(self.out_min, min(self.out_max, output))
     
     def reset(self):
         """Reset PID controller state."""
@@ -99,4 +121,191 @@ class PIDController:
         self.kp = kp
         self.ki = ki
         self.kd = kd
-        logger.info(f"PID tunings updated: Kp={kp}, Ki={ki}, Kd={kd}")
\ No newline at end of file
+        logger.info(f"PID tunings updated: Kp={kp}, Ki={ki}, Kd={kd}")
+
+
+class PIDBank:
+    """
+    Bank of PID controllers stepped together with NumPy.
+    
+    Each controller behaves like PIDController, with one timestamp shared by
+    all controllers of an update. In addition the integral is clamped so
+    the unclamped output never leaves the output limits (anti-windup). The
+    clamped output is the same as PIDController's; only the stored integral
+    stops growing while the output is saturated.
+    """
+    
+    def __init__(self, capacity: int = 16):
+        """
+        Initialize PID bank.
+        
+        Args:
+            capacity: Initial number of controllers to allocate
+        """
+        if np is None:
+            raise RuntimeError("NumPy is not installed")
+        
+        self._size = 0
+        capacity = max(1, capacity)
+        self.kp = np.zeros(capacity)
+        self.ki = np.zeros(capacity)
+        self.kd = np.zeros(capacity)
+        self.setpoint = np.zeros(capacity)
+        self.out_min = np.zeros(capacity)
+        self.out_max = np.zeros(capacity)
+        self.integral = np.zeros(capacity)
+        self.last_error = np.zeros(capacity)
+        self.last_time = np.zeros(capacity)
+        self.initialized = np.zeros(capacity, dtype=bool)
+    
+    def __len__(self) -> int:
+        """Number of controllers in the bank."""
+        return self._size
+    
+    def _grow(self, capacity: int):
+        """Reallocate the arrays with room for capacity controllers."""
+        for name in ('kp', 'ki', 'kd', 'setpoint', 'out_min', 'out_max',
+                     'integral', 'last_error', 'last_time', 'initialized'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+    
+    def add(self, kp: float = 1.0, ki: float = 0.1, kd: float = 0.05,
+            setpoint: float = 0.0, output_limits: tuple = (0.0, 100.0)) -> int:
+        """
+        Add a controller to the bank.
+        
+        Returns:
+            Index of the controller
+        """
+        if self._size == len(self.kp):
+            self._grow(2 * len(self.kp))
+        
+        index = self._size
+        self._size += 1
+        self.kp[index] = kp
+        self.ki[index] = ki
+        self.kd[index] = kd
+        self.setpoint[index] = setpoint
+        self.out_min[index] = output_limits[0]
+        self.out_max[index] = output_limits[1]
+        self.reset(index)
+        return index
+    
+    def controller(self, index: int) -> 'BankedPIDController':
+        """Get a PIDController-like handle for one controller of the bank."""
+        return BankedPIDController(self, index)
+    
+    def set_setpoints(self, indexes, setpoints):
+        """Set the setpoints of controllers, resetting their integrals."""
+        self.setpoint[indexes] = setpoints
+        self.integral[indexes] = 0.0
+    
+    def reset(self, indexes=None):
+        """Reset the state of controllers (default: all)."""
+        if indexes is None:
+            indexes = slice(0, self._size)
+        self.integral[indexes] = 0.0
+        self.last_error[indexes] = 0.0
+        self.last_time[indexes] = 0.0
+        self.initialized[indexes] = False
+    
+    def update(self, indexes, measurements, now: Optional[float] = None,
+               dt: Optional[float] = None):
+        """
+        Step controllers with new measurements.
+        
+        Args:
+            indexes: Integer array of the controllers to step
+            measurements: Measured values, one per controller
+            now: Monotonic timestamp shared by all controllers (default: now)
+            dt: Time step in seconds shared by all controllers (default: the
+                time since each controller's previous update)
+            
+        Returns:
+            Array of outputs clamped to the output limits
+        """
+        if now is None:
+            now = time.monotonic()
+        indexes = np.asarray(indexes, dtype=np.intp)
+        
+        error = self.setpoint[indexes] - np.asarray(measurements, dtype=np.float64)
+        output = self.kp[indexes] * error
+        out_min = self.out_min[indexes]
+        out_max = self.out_max[indexes]
+        
+        # The first update only records the state, as does PIDController
+        first = ~self.initialized[indexes]
+        if dt is None:
+            dt = now - self.last_time[indexes]
+        else:
+            dt = np.full(len(indexes), float(dt))
+        step = ~first & (dt > 0)
+        
+        if step.any():
+            stepped = indexes[step]
+            step_dt = dt[step]
+            step_error = error[step]
+            p_term = output[step]
+            d_term = self.kd[stepped] * ((step_error - self.last_error[stepped]) / step_dt)
+            
+            ki = self.ki[stepped]
+            integral = self.integral[stepped] + step_error * step_dt
+            i_term = ki * integral
+            
+            # Anti-windup: limit the integral term to what keeps the output
+            # within the limits, never pushing it past zero
+            p_d = p_term + d_term
+            low = np.minimum(0.0, out_min[step] - p_d)
+            high = np.maximum(0.0, out_max[step] - p_d)
+            clamped = np.clip(i_term, low, high)
+            windup = (clamped != i_term) & (ki != 0)
+            integral[windup] = clamped[windup] / ki[windup]
+            
+            self.integral[stepped] = integral
+            output[step] = p_term + i_term + d_term
+        
+        # Controllers that stepped or were initialized record their state
+        record = first | step
+        recorded = indexes[record]
+        self.last_time[recorded] = now
+        self.last_error[recorded] = error[record]
+        self.initialized[recorded] = True
+        
+        return np.minimum(out_max, np.maximum(out_min, output))
+
+
+class BankedPIDController:
+    """PIDController interface to one controller of a PIDBank."""
+    
+    __slots__ = ('bank', 'index')
+    
+    def __init__(self, bank: PIDBank, index: int):
+        """Initialize handle for controller index of bank."""
+        self.bank = bank
+        self.index = index
+    
+    @property
+    def output_limits(self) -> tuple:
+        """Output limits of the controller."""
+        return (float(self.bank.out_min[self.index]), float(self.bank.out_max[self.index]))
+    
+    def set_setpoint(self, setpoint: float):
+        """Set the target setpoint, resetting the integral."""
+        self.bank.set_setpoints(self.index, setpoint)
+    
+    def update(self, current_value: float, dt: Optional[float] = None) -> float:
+        """Calculate the output of this controller."""
+        return float(self.bank.update([self.index], [current_value], dt=dt)[0])
+    
+    def reset(self):
+        """Reset the controller state."""
+        self.bank.reset(self.index)
+    
+    def set_tunings(self, kp: float, ki: float, kd: float):
+        """Update PID tuning parameters."""
+        self.bank.kp[self.index] = kp
+        self.bank.ki[self.index] = ki
+        self.bank.kd[self.index] = kd
+        logger.info(f"PID tunings updated: Kp={kp}, Ki={ki}, Kd={kd}")
@@ -0,0 +1,147 @@
+"""
+Bounded-concurrency request scheduler with priorities and a per-cycle deadline.
+"""
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from typing import Optional, Dict, Any, Awaitable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Request priority classes (lower runs first)
+PRIORITY_HIGH = 0     # Sensor reads and boiler outputs
+PRIORITY_NORMAL = 1   # Valve and HRV writes
+PRIORITY_LOW = 2      # Cosmetic sensor updates
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request does not finish before the cycle deadline."""
+
+
+class RequestScheduler:
+    """Limits in-flight requests and cancels requests that overrun the cycle."""
+
+    def __init__(self, max_in_flight: int = 8):
+        """
+        Initialize request scheduler.
+
+        Args:
+            max_in_flight: Maximum number of requests running at once
+        """
+        self.max_in_flight = max(1, max_in_flight)
+        self._in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._deadline: Optional[float] = None
+        self._cycle = 0
+
+        self.stats: Dict[str, Any] = {
+            'completed': 0,
+            'cancelled': 0,
+            'max_queue_depth': 0
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting for a slot."""
+        return sum(1 for _, _, waiter in self._waiters if not waiter.done())
+
+    def begin_cycle(self, duration: Optional[float]) -> int:
+        """
+        Start a new cycle with a deadline.
+
+        Args:
+            duration: Seconds from now until requests are cancelled
+                (None or 0 disables the deadline)
+
+        Returns:
+            Number of the cycle, to pass to end_cycle
+        """
+        if self.stats['cancelled']:
+            logger.warning(f"{self.stats['cancelled']} requests missed the cycle deadline")
+        self.stats['cancelled'] = 0
+        self._deadline = time.monotonic() + duration if duration else None
+        self._cycle += 1
+        return self._cycle
+
+    def end_cycle(self, cycle: Optional[int] = None):
+        """
+        End a cycle, so requests made between cycles have no deadline.
+
+        Args:
+            cycle: Number returned by begin_cycle; the deadline is kept if
+                a newer cycle has begun since (default: the current cycle)
+        """
+        if cycle is None or cycle == self._cycle:
+            self._deadline = None
+
+    async def run(self, request: Awaitable, priority: int = PRIORITY_NORMAL) -> Any:
+        """
+        Run a request once a slot is free, in priority order.
+
+        Args:
+            request: Coroutine performing the request
+            priority: Priority class (lower runs first)
+
+        Returns:
+            Result of the request
+
+        Raises:
+            DeadlineExceeded: If the cycle deadline passes first
+        """
+        if self._deadline is None:
+            return await self._run(request, priority)
+
+        remaining = self._deadline - time.monotonic()
+        if remaining <= 0:
+            request.close()
+            self.stats['cancelled'] += 1
+            raise DeadlineExceeded("Cycle deadline passed before request started")
+
+        try:
+            return await asyncio.wait_for(self._run(request, priority), timeout=remaining)
+        except asyncio.TimeoutError:
+            self.stats['cancelled'] += 1
+            raise DeadlineExceeded("Request cancelled at cycle deadline") from None
+
+    async def _run(self, request: Awaitable, priority: int) -> Any:
+        """Acquire a slot, run the request and release the slot."""
+        try:
+            await self._acquire(priority)
+        except BaseException:
+            request.close()
+            raise
+
+        try:
+            return await request
+        finally:
+            self.stats['completed'] += 1
+            self._release()
+
+    async def _acquire(self, priority: int):
+        """Wait for a free slot."""
+        if self._in_flight < self.max_in_flight and not self.queue_depth:
+            self._in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self.queue_depth)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before cancellation
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        """Hand the slot to the next waiter or free it."""
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
@@ -0,0 +1,108 @@
+"""
+Retry and circuit breaker helpers for the Home Assistant client.
+"""
+import time
+import random
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a request is rejected by an open circuit breaker."""
+
+
+class RetryPolicy:
+    """Bounded retries with exponential backoff and full jitter."""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 5.0):
+        """
+        Initialize retry policy.
+
+        Args:
+            max_attempts: Total number of attempts including the first one
+            base_delay: Backoff before the first retry in seconds
+            max_delay: Upper bound for the backoff in seconds
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def get_delay(self, attempt: int) -> float:
+        """Get the backoff before retry number attempt (starting at 1)."""
+        backoff = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, backoff)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker that fails fast while an endpoint is down.
+
+    After failure_threshold consecutive failures the circuit opens and all
+    requests are rejected. Once recovery_timeout has passed a single probe
+    request is let through; its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        """
+        Initialize circuit breaker.
+
+        Args:
+            name: Name used in log messages
+            failure_threshold: Consecutive failures before the circuit opens
+            recovery_timeout: Seconds to wait before probing again
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Check if a request may be sent, claiming the probe if half-open."""
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.recovery_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            logger.info(f"Circuit for {self.name} half-open, sending probe request")
+
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self):
+        """Record a successful request."""
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit for {self.name} closed")
+        self.state = self.CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        """Record a failed request."""
+        self._failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(
+                    f"Circuit for {self.name} opened after {self._failures} failures, "
+                    f"retrying in {self.recovery_timeout}s"
+                )
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def release(self):
+        """Release a claimed probe without recording an outcome."""
+        self._probe_in_flight = False
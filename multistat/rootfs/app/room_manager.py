@@ -1,24 +1,34 @@
 """
 Multi-room thermostat manager.
 """
+import heapq
+import itertools
 import logging
 import asyncio
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Set
 from dataclasses import dataclass, field
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
-class HRVValve:
-    """HRV valve configuration and state."""
+@dataclass(frozen=True, slots=True)
+class ValveConfig:
+    """HRV valve configuration."""
     name: str
     valve_entity: str
     kp: float
     ki: float
     kd: float
+
+
+@dataclass(slots=True)
+class HRVValve:
+    """HRV valve configuration and state."""
+    config: ValveConfig
     current_position: float = 0.0
     pid_controller: Optional[object] = field(default=None, init=False)
+    # Index of the controller when registered in a PIDBank
+    pid_index: Optional[int] = field(default=None, init=False)
     
     def __post_init__(self):
         """Initialize PID controller after object creation."""
@@ -26,95 +36,351 @@ class HRVValve:
         # Using absolute import since main.py adds app directory to path
         from pid_controller import PIDController
         self.pid_controller = PIDController(
-            kp=self.kp,
-            ki=self.ki,
-            kd=self.kd,
+            kp=self.config.kp,
+            ki=self.config.ki,
+            kd=self.config.kd,
             setpoint=0.0,
             output_limits=(0.0, 100.0)
         )
+    
+    @property
+    def name(self) -> str:
+        """Name of the valve."""
+        return self.config.name
+    
+    @property
+    def valve_entity(self) -> str:
+        """Entity ID of the valve."""
+        return self.config.valve_entity
+    
+    @property
+    def kp(self) -> float:
+        """Proportional gain."""
+        return self.config.kp
+    
+    @property
+    def ki(self) -> float:
+        """Integral gain."""
+        return self.config.ki
+    
+    @property
+    def kd(self) -> float:
+        """Derivative gain."""
+        return self.config.kd
+    
+    def register_in_bank(self, bank):
+        """Replace the private PID controller with a controller in a PIDBank."""
+        self.pid_index = bank.add(
+            kp=self.config.kp,
+            ki=self.config.ki,
+            kd=self.config.kd,
+            setpoint=0.0,
+            output_limits=self.pid_controller.output_limits
+        )
+        self.pid_controller = bank.controller(self.pid_index)
 
 
-@dataclass
-class Room:
-    """Room configuration and state."""
+@dataclass(frozen=True, slots=True)
+class RoomConfig:
+    """Room configuration."""
     name: str
     target_temp: float
     current_temp_sensor: str
     hrv_entity: str
+
+
+@dataclass(slots=True)
+class Room:
+    """Room configuration and state."""
+    config: RoomConfig
     hrv_valves: List[HRVValve]
-    current_temp: Optional[float] = None
+    # Only set by RoomManager, which keeps the dirty list, demand index and engine in step
+    _current_temp: Optional[float] = field(default=None, init=False)
+    # Set when the temperature changed since valve positions were last calculated
+    dirty: bool = field(default=False, init=False)
+    
+    @property
+    def name(self) -> str:
+        """Name of the room."""
+        return self.config.name
+    
+    @property
+    def current_temp(self) -> Optional[float]:
+        """Current temperature in Celsius (None until known); set it with RoomManager.update_room_temperature."""
+        return self._current_temp
+    
+    @property
+    def target_temp(self) -> float:
+        """Target temperature in Celsius."""
+        return self.config.target_temp
+    
+    @property
+    def current_temp_sensor(self) -> str:
+        """Entity ID of the temperature sensor."""
+        return self.config.current_temp_sensor
+    
+    @property
+    def hrv_entity(self) -> str:
+        """Entity ID of the HRV device."""
+        return self.config.hrv_entity
     
     def get_temperature_difference(self) -> float:
         """Calculate temperature difference from target."""
         if self.current_temp is None:
             return 0.0
-        return abs(self.target_temp - self.current_temp)
+        return abs(self.config.target_temp - self.current_temp)
     
     def needs_heating(self) -> bool:
         """Check if room needs heating."""
         if self.current_temp is None:
             return False
-        return self.current_temp < self.target_temp
+        return self.current_temp < self.config.target_temp
+
+
+class DemandIndex:
+    """
+    Heap of the rooms needing heat, ordered by temperature deficit.
+    
+    Updating a room pushes a new entry and marks the old one as removed;
+    removed entries are dropped when they reach the top of the heap, and
+    the heap is rebuilt when they make up more than half of it.
+    """
+    
+    def __init__(self, rooms: List[Room]):
+        """Initialize the index with the current demand of rooms."""
+        # Entries are [-deficit, config order, sequence, room]; room is None once removed
+        self._heap: List[list] = []
+        self._sequence = itertools.count()
+        self._entries: Dict[int, list] = {}
+        # Ties go to the room configured first
+        self._order = {id(room): index for index, room in enumerate(rooms)}
+        for room in rooms:
+            self.update(room)
+    
+    def __len__(self) -> int:
+        """Number of rooms needing heat."""
+        return len(self._entries)
+    
+    def update(self, room: Room):
+        """Update the demand of a room after its temperature changed."""
+        key = id(room)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            old[3] = None
+        
+        if room.needs_heating():
+            entry = [-room.get_temperature_difference(), self._order[key], next(self._sequence), room]
+            self._entries[key] = entry
+            heapq.heappush(self._heap, entry)
+        
+        if len(self._heap) > 2 * len(self._entries) + 16:
+            self._heap = list(self._entries.values())
+            heapq.heapify(self._heap)
+    
+    def leader(self) -> Optional[Room]:
+        """Get the room with the highest temperature deficit."""
+        heap = self._heap
+        while heap and heap[0][3] is None:
+            heapq.heappop(heap)
+        return heap[0][3] if heap else None
+    
+    def top_k(self, k: int) -> List[Room]:
+        """Get up to k rooms with the highest temperature deficit, highest first."""
+        heap = self._heap
+        top = []
+        while heap and len(top) < k:
+            entry = heapq.heappop(heap)
+            if entry[3] is not None:
+                top.append(entry)
+        for entry in top:
+            heapq.heappush(heap, entry)
+        return [entry[3] for entry in top]
 
 
 class RoomManager:
     """Manages multiple rooms and their HRV valves."""
     
-    def __init__(self, rooms_config: List[Dict]):
-        """Initialize room manager with configuration."""
+    def __init__(self, rooms_config: List[Dict], pid_interval: Optional[float] = None):
+        """
+        Initialize room manager with configuration.
+        
+        Args:
+            rooms_config: Room configurations
+            pid_interval: Time step in seconds of the valve PID controllers;
+                a fixed step keeps the positions independent of how long
+                ago a room was last calculated (default: measured per room)
+        """
+        self.pid_interval = pid_interval
         self.rooms: List[Room] = []
+        # Lookup indexes, rebuilt by _load_rooms
+        self._rooms_by_name: Dict[str, Room] = {}
+        self._rooms_by_sensor: Dict[str, List[Room]] = {}
+        self._valves_by_entity: Dict[str, HRVValve] = {}
+        # Rooms whose temperature changed since the last calculation
+        self._dirty_rooms: List[Room] = []
+        # Rooms needing heat, ordered by temperature deficit
+        self._demand = DemandIndex([])
+        # Optional NumPy engine for valve position calculation
+        self.engine = None
         self._load_rooms(rooms_config)
         
     def _load_rooms(self, rooms_config: List[Dict]):
         """Load rooms from configuration."""
         self.rooms = []
+        self._dirty_rooms = []
         for room_config in rooms_config:
             hrv_valves = []
             for valve_config in room_config.get('hrv_valves', []):
-                valve = HRVValve(
+                valve = HRVValve(ValveConfig(
                     name=valve_config['name'],
                     valve_entity=valve_config['valve_entity'],
                     kp=valve_config.get('kp', 1.0),
                     ki=valve_config.get('ki', 0.1),
                     kd=valve_config.get('kd', 0.05)
-                )
+                ))
                 hrv_valves.append(valve)
             
             room = Room(
-                name=room_config['name'],
-                target_temp=room_config['target_temp'],
-                current_temp_sensor=room_config['current_temp_sensor'],
-                hrv_entity=room_config.get('hrv_entity', ''),
+                config=RoomConfig(
+                    name=room_config['name'],
+                    target_temp=room_config['target_temp'],
+                    current_temp_sensor=room_config['current_temp_sensor'],
+                    hrv_entity=room_config.get('hrv_entity', '')
+                ),
                 hrv_valves=hrv_valves
             )
             self.rooms.append(room)
             logger.info(f"Loaded room: {room.name} with {len(hrv_valves)} HRV valves")
+        
+        self._build_indexes()
+        self._demand = DemandIndex(self.rooms)
+        if self.engine is not None:
+            self.enable_vector_engine()
+    
+    def _build_indexes(self):
+        """Build the lookup indexes from room name, sensor and valve entity."""
+        self._rooms_by_name = {}
+        self._rooms_by_sensor = {}
+        self._valves_by_entity = {}
+        for room in self.rooms:
+            # The first room wins on duplicate names, as with a linear scan
+            self._rooms_by_name.setdefault(room.name, room)
+            if room.current_temp_sensor:
+                self._rooms_by_sensor.setdefault(room.current_temp_sensor, []).append(room)
+            for valve in room.hrv_valves:
+                if valve.valve_entity:
+                    self._valves_by_entity.setdefault(valve.valve_entity, valve)
+    
+    def enable_vector_engine(self) -> bool:
+        """
+        Calculate valve positions with the NumPy engine.
+        
+        Returns:
+            False if NumPy is not installed
+        """
+        import vector_engine
+        if not vector_engine.is_available():
+            return False
+        self.engine = vector_engine.VectorEngine(self.rooms)
+        return True
+    
+    def get_room(self, room_name: str) -> Optional[Room]:
+        """Get a room by name."""
+        return self._rooms_by_name.get(room_name)
+    
+    def get_rooms_for_sensor(self, entity_id: str) -> List[Room]:
+        """Get the rooms using a temperature sensor."""
+        return self._rooms_by_sensor.get(entity_id, [])
+    
+    def get_valve(self, entity_id: str) -> Optional[HRVValve]:
+        """Get an HRV valve by entity ID."""
+        return self._valves_by_entity.get(entity_id)
+    
+    def get_sensor_entity_ids(self) -> Set[str]:
+        """Get the temperature sensor entity IDs used by the rooms."""
+        return set(self._rooms_by_sensor)
+    
+    def get_entity_ids(self) -> Set[str]:
+        """Get all sensor, HRV and valve entity IDs used by the rooms."""
+        entity_ids = set()
+        for room in self.rooms:
+            if room.current_temp_sensor:
+                entity_ids.add(room.current_temp_sensor)
+            if room.hrv_entity:
+                entity_ids.add(room.hrv_entity)
+            for valve in room.hrv_valves:
+                if valve.valve_entity:
+                    entity_ids.add(valve.valve_entity)
+        return entity_ids
     
     def get_room_with_highest_difference(self) -> Optional[Room]:
-        """Get the room with the highest temperature difference."""
-        if not self.rooms:
-            return None
+        """Get the room needing heat with the highest temperature difference."""
+        return self._demand.leader()
+    
+    def get_top_demand_rooms(self, k: int) -> List[Room]:
+        """Get up to k rooms needing heat with the highest temperature difference."""
+        return self._demand.top_k(k)
+    
+    def update_room_temperature(self, room_name: str, temperature: float):
+        """Update current temperature for a room."""
+        room = self._rooms_by_name.get(room_name)
+        if room is None:
+            logger.warning(f"Room {room_name} not found")
+            return
+        self._set_room_temperature(room, temperature)
+        logger.debug(f"Updated {room_name} temperature to {temperature}°C")
+    
+    def apply_entity_state(self, entity_id: str, state: Any) -> bool:
+        """
+        Apply a Home Assistant entity state to the rooms using the entity.
         
-        # Filter rooms that need heating and have current temperature
-        rooms_needing_heat = [
-            room for room in self.rooms 
-            if room.needs_heating() and room.current_temp is not None
-        ]
+        Args:
+            entity_id: Entity whose state changed
+            state: Raw state value
+            
+        Returns:
+            True if a room temperature changed
+        """
+        rooms = self._rooms_by_sensor.get(entity_id)
+        if not rooms:
+            return False
         
-        if not rooms_needing_heat:
-            return None
+        try:
+            temperature = float(state)
+        except (ValueError, TypeError):
+            logger.warning(f"Could not parse temperature from {entity_id}: {state}")
+            return False
         
-        # Return room with highest temperature difference
-        return max(rooms_needing_heat, key=lambda r: r.get_temperature_difference())
+        changed = False
+        for room in rooms:
+            if room.current_temp != temperature:
+                self._set_room_temperature(room, temperature)
+                changed = True
+        if changed:
+            logger.debug(f"Updated temperature from {entity_id} to {temperature}°C")
+        return changed
     
-    def update_room_temperature(self, room_name: str, temperature: float):
-        """Update current temperature for a room."""
-        for room in self.rooms:
-            if room.name == room_name:
-                room.current_temp = temperature
-                logger.debug(f"Updated {room_name} temperature to {temperature}°C")
-                return
-        logger.warning(f"Room {room_name} not found")
+    def _set_room_temperature(self, room: Room, temperature: float):
+        """Set a room temperature, marking the room dirty and updating the demand index."""
+        if room.current_temp == temperature:
+            return
+        room._current_temp = temperature
+        if self.engine is not None:
+            self.engine.set_temperature(room, temperature)
+        
+        if not room.dirty:
+            room.dirty = True
+            self._dirty_rooms.append(room)
+        
+        self._demand.update(room)
+    
+    def pop_dirty_rooms(self) -> List[Room]:
+        """Get the rooms whose temperature changed since the last call and clear them."""
+        rooms = self._dirty_rooms
+        self._dirty_rooms = []
+        for room in rooms:
+            room.dirty = False
+        return rooms
     
     def calculate_hrv_positions(self, room: Room):
         """Calculate HRV valve positions for a room using PID control."""
@@ -122,7 +388,7 @@ class RoomManager:
             return
         
         # Calculate error (difference from target)
-        error = room.target_temp - room.current_temp
+        error = room.config.target_temp - room.current_temp
         
         for valve in room.hrv_valves:
             # Set PID setpoint to 0 (we want to minimize error)
@@ -130,7 +396,7 @@ class RoomManager:
             
             # Update PID with current error
             # Positive error means room is too cold, so open valve more
-            valve_position = valve.pid_controller.update(-error)
+            valve_position = valve.pid_controller.update(-error, self.pid_interval)
             
             # Ensure valve position is between 0 and 100
             valve_position = max(0.0, min(100.0, valve_position))
@@ -141,6 +407,16 @@ class RoomManager:
                 f"Error={error:.2f}°C, Position={valve_position:.1f}%"
             )
     
+    def calculate_rooms_hrv_positions(self, rooms: Optional[List[Room]] = None):
+        """Calculate HRV valve positions for rooms (default: all) with a known temperature."""
+        if self.engine is not None:
+            self.engine.calculate_hrv_positions(None if rooms is self.rooms else rooms, dt=self.pid_interval)
+            return
+        
+        for room in (self.rooms if rooms is None else rooms):
+            if room.current_temp is not None:
+                self.calculate_hrv_positions(room)
+    
     def get_control_temperatures(self) -> Optional[tuple]:
         """
         Get target and current temperatures for boiler control.
@@ -0,0 +1,119 @@
+"""
+Struct-of-arrays room state engine backed by NumPy.
+
+Keeps room temperatures in contiguous arrays and the PID controllers of
+all valves in a PIDBank, and calculates all valve positions with a few
+vectorized operations.
+NumPy is optional; without it the per-object path in RoomManager is used.
+"""
+import time
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from pid_controller import PIDBank, np
+
+logger = logging.getLogger(__name__)
+
+# Valve positions are clamped to this range, as in RoomManager
+POSITION_LIMITS = (0.0, 100.0)
+
+
+def is_available() -> bool:
+    """Check if NumPy is installed."""
+    return np is not None
+
+
+class VectorEngine:
+    """
+    Calculates valve positions for all rooms in vectorized form.
+
+    Produces the same positions as RoomManager.calculate_hrv_positions: on
+    every calculation the PID setpoint is set to 0, which resets the
+    integral, and the controller is stepped with the room error.
+    """
+
+    def __init__(self, rooms: List):
+        """
+        Initialize the engine from the rooms of a RoomManager.
+
+        Args:
+            rooms: Rooms with their HRV valves, in configuration order
+        """
+        if np is None:
+            raise RuntimeError("NumPy is not installed")
+
+        self.rooms = rooms
+        self._room_index: Dict[int, int] = {id(room): i for i, room in enumerate(rooms)}
+
+        self.valves = [valve for room in rooms for valve in room.hrv_valves]
+        valve_rooms = [i for i, room in enumerate(rooms) for _ in room.hrv_valves]
+
+        # Room state (NaN while a temperature is unknown)
+        self.target = np.array([room.target_temp for room in rooms], dtype=np.float64)
+        self.current = np.array(
+            [np.nan if room.current_temp is None else room.current_temp for room in rooms],
+            dtype=np.float64
+        )
+
+        # Valve PID controllers live in one bank
+        self.valve_room = np.array(valve_rooms, dtype=np.intp)
+        self.pid_bank = PIDBank(capacity=len(self.valves))
+        for valve in self.valves:
+            valve.register_in_bank(self.pid_bank)
+        self.pid_index = np.array([valve.pid_index for valve in self.valves], dtype=np.intp)
+        self.position = np.array([valve.current_position for valve in self.valves], dtype=np.float64)
+
+        logger.info(f"Vector engine enabled for {len(rooms)} rooms and {len(self.valves)} valves")
+
+    def set_temperature(self, room, temperature: Optional[float]):
+        """Update the current temperature of a room."""
+        self.current[self._room_index[id(room)]] = np.nan if temperature is None else temperature
+
+    def _room_mask(self, rooms: Optional[Iterable]) -> 'np.ndarray':
+        """Get a mask of the given rooms (all rooms if None)."""
+        if rooms is None:
+            return np.ones(len(self.rooms), dtype=bool)
+        mask = np.zeros(len(self.rooms), dtype=bool)
+        indexes = [self._room_index[id(room)] for room in rooms]
+        mask[indexes] = True
+        return mask
+
+    def calculate_hrv_positions(self, rooms: Optional[Iterable] = None,
+                                now: Optional[float] = None,
+                                dt: Optional[float] = None) -> 'np.ndarray':
+        """
+        Calculate the valve positions of rooms with a known temperature.
+
+        Args:
+            rooms: Rooms to calculate (default: all rooms)
+            now: Monotonic timestamp shared by all controllers (default: now)
+            dt: PID time step in seconds (default: measured per controller)
+
+        Returns:
+            Indexes of the valves that were calculated
+        """
+        if now is None:
+            now = time.monotonic()
+
+        room_mask = self._room_mask(rooms) & ~np.isnan(self.current)
+        selected = np.flatnonzero(room_mask[self.valve_room])
+        if selected.size == 0:
+            return selected
+
+        error = (self.target - self.current)[self.valve_room[selected]]
+        pid_index = self.pid_index[selected]
+
+        # The setpoint is reset to 0 before every update, clearing the integral
+        self.pid_bank.set_setpoints(pid_index, 0.0)
+        # Positive error means the room is too cold, so open the valve more
+        output = self.pid_bank.update(pid_index, -error, now, dt)
+
+        output = np.clip(output, *POSITION_LIMITS)
+        self.position[selected] = output
+
+        # The write path reads positions from the valve objects
+        valves = self.valves
+        for index, position in zip(selected.tolist(), output.tolist()):
+            valves[index].current_position = position
+
+        return selected
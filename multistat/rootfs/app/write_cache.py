@@ -0,0 +1,82 @@
+"""
+Last-written-value cache for suppressing redundant Home Assistant writes.
+"""
+import time
+import logging
+from typing import Optional, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class WriteCache:
+    """Tracks the last value written per entity attribute."""
+
+    def __init__(self, deadbands: Optional[Dict[str, float]] = None,
+                 refresh_interval: float = 300.0):
+        """
+        Initialize write cache.
+
+        Args:
+            deadbands: Minimum numeric change per value type before a write
+                is sent again (e.g. {'valve': 0.5, 'temperature': 0.1})
+            refresh_interval: Seconds after which a value is always written
+                again to correct drift (0 disables the forced refresh)
+        """
+        self.deadbands = deadbands or {}
+        self.refresh_interval = refresh_interval
+        self._last_written: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+        self.suppressed = 0
+
+    def should_write(self, entity_id: str, attribute: str, value: Any,
+                     value_type: Optional[str] = None) -> bool:
+        """
+        Check if a value differs enough from the last written value.
+
+        Args:
+            entity_id: Entity being written
+            attribute: Attribute or service field being written
+            value: New value
+            value_type: Deadband class of the value (exact match if unknown)
+
+        Returns:
+            True if the value should be written
+        """
+        entry = self._last_written.get((entity_id, attribute))
+        if entry is None:
+            return True
+
+        last_value, written_at = entry
+        if self.refresh_interval and time.monotonic() - written_at >= self.refresh_interval:
+            return True
+
+        if self._is_same(last_value, value, self.deadbands.get(value_type, 0.0)):
+            self.suppressed += 1
+            return False
+        return True
+
+    def record(self, entity_id: str, attribute: str, value: Any):
+        """Record a successful write."""
+        self._last_written[(entity_id, attribute)] = (value, time.monotonic())
+
+    def invalidate(self, entity_id: str, attribute: Optional[str] = None):
+        """Forget the last written value so the next write is always sent."""
+        if attribute is not None:
+            self._last_written.pop((entity_id, attribute), None)
+            return
+        for key in [key for key in self._last_written if key[0] == entity_id]:
+            del self._last_written[key]
+
+    def clear(self):
+        """Forget all written values."""
+        self._last_written.clear()
+
+    @staticmethod
+    def _is_same(last_value: Any, value: Any, deadband: float) -> bool:
+        """Compare two values, applying the deadband to numbers."""
+        if last_value == value:
+            return True
+        numeric = (int, float)
+        if (isinstance(last_value, numeric) and isinstance(value, numeric)
+                and not isinstance(last_value, bool) and not isinstance(value, bool)):
+            return abs(value - last_value) < deadband
+        return False
@@ -0,0 +1,31 @@
+"""
+Shared fixtures for the MultiStat tests.
+"""
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'rootfs', 'app'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'tools'))
+
+
+class FakeClock:
+    """Manually advanced replacement for the time module."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    """A manually advanced clock starting at t=1000."""
+    return FakeClock()
@@ -0,0 +1,106 @@
+"""
+Fake OpenTherm bus for the tests.
+"""
+import asyncio
+import threading
+
+import opentherm_codec as codec
+
+
+def ack(frame: bytes, value: int = 0) -> bytes:
+    """Build the boiler's acknowledgement of a request frame."""
+    request = codec.decode(frame)
+    msg_type = codec.WRITE_ACK if request.msg_type == codec.WRITE_DATA else codec.READ_ACK
+    return codec.encode_frame(msg_type, request.data_id, value or request.raw).to_bytes(4, 'big')
+
+
+class FakeTransport:
+    """Transport that answers every request after a delay."""
+
+    def __init__(self, delay: float = 0.005, reply=ack):
+        self.delay = delay
+        self.reply = reply
+        self.connected = True
+        self.sent = []
+        self.on_frame = None
+        self.on_error = None
+        self.connect_attempts = 0
+        # Number of connect() calls that fail before the port opens again
+        self.failing_connects = 0
+
+    async def connect(self):
+        self.connect_attempts += 1
+        if self.failing_connects:
+            self.failing_connects -= 1
+            raise OSError("No such device")
+        self.connected = True
+
+    async def close(self):
+        self.connected = False
+
+    def fail(self, error: Exception):
+        """Report an I/O error like the serial I/O thread does."""
+        self.connected = False
+        self.on_error(error)
+
+    def send(self, frame: bytes):
+        self.sent.append(frame)
+        if self.reply is not None:
+            asyncio.get_running_loop().call_later(self.delay, self.on_frame, self.reply(frame))
+
+
+class FakeSerial:
+    """Loopback serial port that answers written frames with reply(frame)."""
+
+    def __init__(self, reply=ack, timeout: float = 1.0):
+        self.reply = reply
+        self.timeout = timeout
+        self.is_open = True
+        self.written = []
+        self._incoming = bytearray()
+        self._cancelled = False
+        self._error = None
+        self._changed = threading.Condition()
+
+    @property
+    def in_waiting(self) -> int:
+        with self._changed:
+            return len(self._incoming)
+
+    def feed(self, data: bytes):
+        """Receive bytes from the bus."""
+        with self._changed:
+            self._incoming.extend(data)
+            self._changed.notify_all()
+
+    def fail(self, error: Exception):
+        """Make the next read raise error."""
+        with self._changed:
+            self._error = error
+            self._changed.notify_all()
+
+    def write(self, data: bytes) -> int:
+        self.written.append(bytes(data))
+        if self.reply is not None:
+            self.feed(self.reply(data))
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        with self._changed:
+            self._changed.wait_for(
+                lambda: self._incoming or self._cancelled or self._error, self.timeout
+            )
+            self._cancelled = False
+            if self._error is not None:
+                raise self._error
+            data = bytes(self._incoming[:size])
+            del self._incoming[:size]
+            return data
+
+    def cancel_read(self):
+        with self._changed:
+            self._cancelled = True
+            self._changed.notify_all()
+
+    def close(self):
+        self.is_open = False
@@ -0,0 +1,157 @@
+"""
+Tests for the fixed-rate and multi-rate control loop schedulers.
+"""
+import asyncio
+
+import pytest
+
+import cycle_scheduler
+from cycle_scheduler import FixedRateScheduler, MultiRateScheduler
+
+
+@pytest.fixture
+def scheduler_clock(monkeypatch, clock):
+    monkeypatch.setattr(cycle_scheduler, 'time', clock)
+    return clock
+
+
+def run_overrun(scheduler, clock, overrun: float) -> bool:
+    """Run one cycle that takes overrun seconds."""
+    asyncio.run(scheduler.wait())
+    clock.advance(overrun)
+    return scheduler.end_cycle()
+
+
+def test_cycles_stay_on_the_grid(scheduler_clock):
+    scheduler = FixedRateScheduler(1.0)
+    scheduler.start()
+    asyncio.run(scheduler.wait())
+    scheduler_clock.advance(0.3)
+    assert not scheduler.end_cycle()
+
+    # Work time does not shift the next tick
+    scheduler_clock.advance(0.7)
+    asyncio.run(scheduler.wait())
+    assert scheduler._next_tick == 1002.0
+    assert scheduler.stats['last_lateness'] == 0.0
+
+
+def test_skip_policy_drops_missed_ticks(scheduler_clock):
+    scheduler = FixedRateScheduler(1.0, FixedRateScheduler.SKIP)
+    scheduler.start()
+    assert run_overrun(scheduler, scheduler_clock, 2.5)
+
+    asyncio.run(scheduler.wait())
+    assert scheduler.stats['skipped'] == 1
+    assert scheduler.stats['overruns'] == 1
+    # Realigned with the grid: the next tick is the first one after now
+    assert scheduler._next_tick == 1003.0
+
+
+def test_catch_up_policy_runs_missed_ticks_back_to_back(scheduler_clock):
+    scheduler = FixedRateScheduler(1.0, FixedRateScheduler.CATCH_UP)
+    scheduler.start()
+    assert run_overrun(scheduler, scheduler_clock, 3.5)
+
+    # The missed ticks at 1001, 1002 and 1003 are all due now
+    for _ in range(3):
+        asyncio.run(scheduler.wait())
+        assert not scheduler.end_cycle()
+    assert scheduler.stats['cycles'] == 4
+    assert scheduler.stats['skipped'] == 0
+    assert scheduler._next_tick == 1004.0
+
+
+def test_catch_up_beyond_limit_skips(scheduler_clock):
+    scheduler = FixedRateScheduler(1.0, FixedRateScheduler.CATCH_UP, max_catch_up=1)
+    scheduler.start()
+    run_overrun(scheduler, scheduler_clock, 3.5)
+
+    asyncio.run(scheduler.wait())
+    assert scheduler.stats['skipped'] == 2
+    assert scheduler._next_tick == 1004.0
+
+
+def test_wake_event_runs_extra_cycle_without_moving_schedule(scheduler_clock):
+    async def scenario():
+        scheduler = FixedRateScheduler(10.0)
+        scheduler.start()
+        await scheduler.wait()
+        scheduler.end_cycle()
+
+        wake = asyncio.Event()
+        wake.set()
+        woken = await scheduler.wait(wake)
+        return scheduler, woken
+
+    scheduler, woken = asyncio.run(scenario())
+    assert woken
+    assert scheduler.stats['woken'] == 1
+    assert scheduler._next_tick == 1010.0
+
+
+def test_unknown_overrun_policy_is_rejected():
+    with pytest.raises(ValueError):
+        FixedRateScheduler(1.0, 'later')
+
+
+def test_tasks_run_at_their_own_rates(scheduler_clock):
+    scheduler = MultiRateScheduler({'valve': 0, 'boiler': 15}, base_interval=5)
+    scheduler.start()
+
+    due = []
+    for _ in range(7):
+        due.append(scheduler.due_tasks())
+        scheduler_clock.advance(5)
+    assert [sorted(tasks) for tasks in due] == [
+        ['boiler', 'valve'], ['valve'], ['valve'],
+        ['boiler', 'valve'], ['valve'], ['valve'],
+        ['boiler', 'valve'],
+    ]
+
+
+def test_task_due_within_half_a_tick(scheduler_clock):
+    scheduler = MultiRateScheduler({'boiler': 15}, base_interval=5)
+    scheduler.start()
+    scheduler.due_tasks()
+
+    # A loop tick that comes slightly early still runs the task
+    scheduler_clock.advance(14.9)
+    assert scheduler.due_tasks() == {'boiler'}
+    assert scheduler.tasks['boiler'].next_due == 1030.0
+
+
+def test_included_task_keeps_its_schedule(scheduler_clock):
+    scheduler = MultiRateScheduler({'boiler': 15}, base_interval=5)
+    scheduler.start()
+    scheduler.due_tasks()
+
+    scheduler_clock.advance(5)
+    assert scheduler.due_tasks(include=('boiler',)) == {'boiler'}
+    assert scheduler.tasks['boiler'].next_due == 1015.0
+
+
+def test_missed_task_runs_once_and_realigns(scheduler_clock):
+    scheduler = MultiRateScheduler({'boiler': 15}, base_interval=5)
+    scheduler.start()
+    scheduler.due_tasks()
+
+    scheduler_clock.advance(100)
+    assert scheduler.due_tasks() == {'boiler'}
+    assert scheduler.tasks['boiler'].next_due == 1105.0
+    assert scheduler.due_tasks() == set()
+
+
+def test_run_records_task_timing(scheduler_clock):
+    scheduler = MultiRateScheduler({'valve': 0}, base_interval=5)
+
+    async def failing():
+        scheduler_clock.advance(0.25)
+        raise RuntimeError('write failed')
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scheduler.run('valve', failing()))
+    stats = scheduler.stats['valve']
+    assert stats['runs'] == 1
+    assert stats['errors'] == 1
+    assert stats['last_duration'] == 0.25
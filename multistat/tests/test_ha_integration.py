@@ -0,0 +1,282 @@
+"""
+Tests for the Home Assistant client against the fake Home Assistant server.
+"""
+import asyncio
+
+from fake_ha import FakeHomeAssistant
+from ha_integration import HomeAssistantAPI
+from resilience import CircuitBreaker
+from room_manager import RoomManager
+
+STATES_ROUTE = 'GET /core/api/states'
+STATE_ROUTE = 'GET /core/api/states/{entity_id}'
+SERVICE_ROUTE = 'POST /core/api/services/{domain}/{service}'
+SENSOR_ROUTE = 'POST /core/api/states/{entity_id}'
+
+
+def run_with_api(scenario, config=None, **fake_options):
+    """Run scenario(ha, api) against a fresh fake server."""
+    async def main():
+        async with FakeHomeAssistant(**fake_options) as ha:
+            api = HomeAssistantAPI({'retry_base_delay': 0.001, **(config or {})})
+            api.base_url = ha.url
+            await api.start()
+            try:
+                return await scenario(ha, api)
+            finally:
+                await api.stop()
+
+    return asyncio.run(main())
+
+
+def test_equal_values_are_written_in_one_call():
+    async def scenario(ha, api):
+        await api.write_entities('valve', {
+            'number.valve_0': 40.0,
+            'number.valve_1': 40.0,
+            'number.valve_2': 40.0,
+            'number.valve_3': 10.0,
+        })
+        return ha
+
+    ha = run_with_api(scenario)
+    assert ha.request_counts[SERVICE_ROUTE] == 2
+    batched = [data for _, _, data in ha.service_calls if isinstance(data['entity_id'], list)]
+    assert batched == [{'entity_id': ['number.valve_0', 'number.valve_1', 'number.valve_2'], 'value': 40.0}]
+    assert ha.states['number.valve_3']['state'] == '10.0'
+
+
+def test_unchanged_values_are_not_written_again():
+    async def scenario(ha, api):
+        await api.write_entities('valve', {'number.valve_0': 40.0, 'number.valve_1': 20.0})
+        ha.reset_counters()
+        await api.write_entities('valve', {'number.valve_0': 40.2, 'number.valve_1': 25.0})
+        return ha
+
+    ha = run_with_api(scenario)
+    assert ha.service_calls == [('number', 'set_value', {'entity_id': 'number.valve_1', 'value': 25.0})]
+
+
+def test_sensor_attribute_changes_are_written_with_an_unchanged_state():
+    async def scenario(ha, api):
+        for modulation in (40, 40, 55):
+            await api.set_sensor_state(
+                'sensor.boiler', 45.0, device_class='temperature',
+                attributes={'modulation': modulation}
+            )
+        return ha
+
+    ha = run_with_api(scenario)
+    assert ha.request_counts[SENSOR_ROUTE] == 2
+    assert ha.states['sensor.boiler']['attributes']['modulation'] == 55
+
+
+def test_write_cache_is_checked_once_per_value():
+    async def scenario(ha, api):
+        checked = []
+        should_write = api.write_cache.should_write
+
+        def counting_should_write(entity_id, *args):
+            checked.append(entity_id)
+            return should_write(entity_id, *args)
+
+        api.write_cache.should_write = counting_should_write
+        ha.add_entity('fan.hrv', 'on')
+        await api.write_entities('valve', {'number.valve_0': 40.0, 'number.valve_1': 20.0})
+        await api.write_entities('hrv_mode', {'fan.hrv': 'auto'})
+        return ha, checked
+
+    ha, checked = run_with_api(scenario)
+    assert sorted(checked) == ['fan.hrv', 'number.valve_0', 'number.valve_1']
+    assert len(ha.service_calls) == 3
+
+
+def test_failed_batch_falls_back_to_single_writes():
+    async def scenario(ha, api):
+        ha.fail_next(1)
+        await api.write_entities('valve', {'number.valve_0': 40.0, 'number.valve_1': 40.0})
+        return ha, api
+
+    ha, api = run_with_api(scenario, {'retry_attempts': 1})
+    assert ha.request_counts[SERVICE_ROUTE] == 3
+    assert [data['entity_id'] for _, _, data in ha.service_calls] == ['number.valve_0', 'number.valve_1']
+    assert not api.write_cache.should_write('number.valve_0', 'position', 40.0, 'valve')
+
+
+def test_service_is_chosen_by_entity_domain():
+    async def scenario(ha, api):
+        ha.add_entity('cover.valve', 0)
+        await api.write_entities('valve', {'cover.valve': 30.4})
+        return ha, api
+
+    ha, api = run_with_api(scenario)
+    assert ha.service_calls == [('cover', 'set_cover_position', {'entity_id': 'cover.valve', 'position': 30})]
+    assert api._service_cache[('cover.valve', 'valve')].domain == 'cover'
+
+
+def test_service_matching_domain_is_preferred_over_probing_order():
+    async def scenario(ha, api):
+        ha.add_entity('climate.hrv', 'auto')
+        await api.write_entities('hrv_mode', {'climate.hrv': 'heat'})
+        return ha
+
+    ha = run_with_api(scenario)
+    assert ha.service_calls == [('climate', 'set_hvac_mode', {'entity_id': 'climate.hrv', 'hvac_mode': 'heat'})]
+    assert ha.states['climate.hrv']['state'] == 'heat'
+
+
+def test_room_temperatures_come_from_one_bulk_read():
+    async def scenario(ha, api):
+        manager = RoomManager(ha.add_rooms(5))
+        await api.update_room_temperatures(manager)
+        return ha, manager
+
+    ha, manager = run_with_api(scenario)
+    assert dict(ha.request_counts) == {STATES_ROUTE: 1}
+    assert [room.current_temp for room in manager.rooms] == [19.0, 19.3, 19.6, 19.9, 20.2]
+
+
+def test_failed_bulk_read_falls_back_to_entity_reads():
+    async def scenario(ha, api):
+        manager = RoomManager(ha.add_rooms(3))
+        ha.fail_next(1)
+        await api.update_room_temperatures(manager)
+        return ha, manager
+
+    ha, manager = run_with_api(scenario, {'retry_attempts': 1})
+    assert ha.request_counts[STATES_ROUTE] == 1
+    assert ha.request_counts[STATE_ROUTE] == 3
+    assert [room.current_temp for room in manager.rooms] == [19.0, 19.3, 19.6]
+
+
+def test_server_errors_are_retried():
+    async def scenario(ha, api):
+        ha.add_entity('sensor.temperature', 20.5)
+        ha.fail_next(2)
+        return ha, await api.get_temperature('sensor.temperature')
+
+    ha, temperature = run_with_api(scenario, {'retry_attempts': 3})
+    assert temperature == 20.5
+    assert ha.request_counts[STATE_ROUTE] == 3
+
+
+def test_open_host_circuit_fails_fast():
+    async def scenario(ha, api):
+        ha.fail_next(2)
+        for _ in range(3):
+            assert await api.get_states() is None
+        return ha, api
+
+    ha, api = run_with_api(scenario, {'retry_attempts': 1, 'circuit_failure_threshold': 2})
+    assert api.host_breaker.state == CircuitBreaker.OPEN
+    assert ha.request_counts[STATES_ROUTE] == 2
+
+
+def test_server_errors_for_an_entity_only_trip_the_entity_circuit():
+    async def scenario(ha, api):
+        ha.add_entity('sensor.temperature', 20.5)
+        ha.fail_next(2)
+        for _ in range(3):
+            assert await api.get_temperature('sensor.temperature') is None
+        return ha, api, await api.get_states()
+
+    ha, api, states = run_with_api(scenario, {'retry_attempts': 1, 'circuit_failure_threshold': 2})
+    assert api.host_breaker.state == CircuitBreaker.CLOSED
+    assert api.entity_breakers['sensor.temperature'].state == CircuitBreaker.OPEN
+    assert ha.request_counts[STATE_ROUTE] == 2
+    assert states['sensor.temperature'].state == '20.5'
+
+
+def test_client_errors_only_trip_the_entity_circuit():
+    async def scenario(ha, api):
+        for _ in range(3):
+            assert await api.get_temperature('sensor.missing') is None
+        ha.add_entity('sensor.temperature', 20.5)
+        return ha, api, await api.get_temperature('sensor.temperature')
+
+    ha, api, temperature = run_with_api(scenario, {'circuit_failure_threshold': 2})
+    assert temperature == 20.5
+    assert api.host_breaker.state == CircuitBreaker.CLOSED
+    assert api.entity_breakers['sensor.missing'].state == CircuitBreaker.OPEN
+    assert ha.request_counts[STATE_ROUTE] == 3
+
+
+async def wait_until(predicate, timeout: float = 2.0):
+    """Wait until predicate() holds."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        assert loop.time() < deadline, 'timed out'
+        await asyncio.sleep(0.01)
+
+
+def test_websocket_snapshot_sets_connected():
+    async def scenario(ha, api):
+        manager = RoomManager(ha.add_rooms(3))
+        await api.subscribe_room_temperatures(manager)
+        await wait_until(lambda: api.websocket.connected)
+        # Temperatures are pushed, so a control cycle reads nothing
+        await api.update_room_temperatures(manager)
+        return ha, manager
+
+    ha, manager = run_with_api(scenario)
+    assert ha.request_counts['WS /core/websocket'] == 1
+    assert ha.request_counts[STATES_ROUTE] == 0
+    assert [room.current_temp for room in manager.rooms] == [19.0, 19.3, 19.6]
+
+
+def test_pushed_temperature_reaches_room_manager():
+    async def scenario(ha, api):
+        manager = RoomManager(ha.add_rooms(2))
+        changes = []
+        await api.subscribe_room_temperatures(manager, lambda: changes.append(True))
+        await wait_until(lambda: api.websocket.connected)
+        changes.clear()
+
+        await ha.set_state('sensor.room_1_temperature', 17.5)
+        await wait_until(lambda: manager.rooms[1].current_temp == 17.5)
+        # An unchanged state is not a change
+        await ha.set_state('sensor.room_1_temperature', 17.5)
+        await asyncio.sleep(0.05)
+        return manager, changes
+
+    manager, changes = run_with_api(scenario)
+    assert changes == [True]
+    assert manager.rooms[1].current_temp == 17.5
+    assert manager.get_room_with_highest_difference().name == 'Room 1'
+
+
+def test_room_temperatures_fall_back_to_rest_after_disconnect():
+    async def scenario(ha, api):
+        manager = RoomManager(ha.add_rooms(2))
+        await api.subscribe_room_temperatures(manager)
+        await wait_until(lambda: api.websocket.connected)
+        api.websocket.reconnect_delay = 10
+
+        await ha.close_websockets()
+        await wait_until(lambda: not api.websocket.connected)
+        ha.states['sensor.room_0_temperature']['state'] = '22.0'
+        await api.update_room_temperatures(manager)
+        return ha, manager
+
+    ha, manager = run_with_api(scenario)
+    assert ha.request_counts[STATES_ROUTE] == 1
+    assert manager.rooms[0].current_temp == 22.0
+
+
+def test_climate_entity_temperature_comes_from_its_attribute():
+    async def scenario(ha, api):
+        config = ha.add_rooms(2)
+        config[1]['current_temp_sensor'] = 'climate.room_1'
+        ha.add_entity('climate.room_1', 'heat', {'current_temperature': 18.5})
+        manager = RoomManager(config)
+        await api.update_room_temperatures(manager)
+        bulk = [room.current_temp for room in manager.rooms]
+
+        await api.subscribe_room_temperatures(manager)
+        await wait_until(lambda: api.websocket.connected)
+        await ha.set_state('climate.room_1', 'heat', {'current_temperature': 19.0})
+        await wait_until(lambda: manager.rooms[1].current_temp == 19.0)
+        return bulk
+
+    assert run_with_api(scenario) == [19.0, 18.5]
@@ -0,0 +1,62 @@
+"""
+Tests for the JSON codec, run on every installed backend.
+"""
+import json
+
+import pytest
+
+import json_codec
+
+BACKENDS = [
+    'json',
+    pytest.param('orjson', marks=pytest.mark.skipif(json_codec.orjson is None, reason='orjson is not installed')),
+    pytest.param('msgspec', marks=pytest.mark.skipif(json_codec.msgspec is None, reason='msgspec is not installed')),
+]
+
+STATES = [
+    {
+        'entity_id': 'sensor.living_room',
+        'state': '20.5',
+        'attributes': {'unit_of_measurement': '°C', 'device_class': 'temperature'},
+        'last_changed': '2024-01-01T00:00:00+00:00',
+        'context': {'id': '01', 'parent_id': None, 'user_id': None}
+    },
+    {
+        'entity_id': 'climate.bedroom',
+        'state': 'heat',
+        'attributes': {'current_temperature': 18.5, 'temperature': 20.0, 'hvac_modes': ['heat', 'off']}
+    },
+    {'entity_id': 'number.valve', 'state': '40.0'},
+]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    monkeypatch.setattr(json_codec, 'BACKEND', request.param)
+    if request.param != 'msgspec':
+        # State snapshots go through loads() instead of the msgspec decoder
+        monkeypatch.setattr(json_codec, '_states_decoder', None)
+    return request.param
+
+
+def test_round_trip(backend):
+    document = {'entity_id': ['number.valve_0', 'number.valve_1'], 'value': 40.5, 'name': 'Wohnzimmer °C'}
+    data = json_codec.dumps(document)
+
+    assert isinstance(data, bytes)
+    assert json.loads(data) == document
+    assert json_codec.loads(data) == document
+    assert json_codec.loads(json_codec.dumps_str(document)) == document
+
+
+def test_states_keep_only_used_fields(backend):
+    states = json_codec.decode_states(json.dumps(STATES).encode())
+
+    assert all(isinstance(state, json_codec.EntityState) for state in states)
+    assert [(state.entity_id, state.state) for state in states] == [
+        ('sensor.living_room', '20.5'),
+        ('climate.bedroom', 'heat'),
+        ('number.valve', '40.0'),
+    ]
+    assert [state.attributes.current_temperature for state in states] == [None, 18.5, None]
+    assert not hasattr(states[0], '__dict__')
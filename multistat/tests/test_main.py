@@ -0,0 +1,139 @@
+"""
+Tests for the task scheduling and the pipelined mode of the control loop.
+"""
+import json
+import asyncio
+import signal
+
+import pytest
+
+from main import MultiRoomThermostat
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    # Keep the test runner's signal handlers
+    monkeypatch.setattr(signal, 'signal', lambda signum, handler: None)
+
+    def make(**options):
+        rooms = [
+            {
+                'name': f'Room {i}',
+                'target_temp': 21.0,
+                'current_temp_sensor': f'sensor.room_{i}',
+                'hrv_valves': [{'name': f'Valve {i}', 'valve_entity': f'number.valve_{i}'}]
+            }
+            for i in range(3)
+        ]
+        path = tmp_path / 'options.json'
+        path.write_text(json.dumps({'rooms': rooms, **options}))
+        return MultiRoomThermostat(str(path))
+
+    return make
+
+
+def test_incremental_cycle_only_calculates_dirty_rooms(make_app):
+    app = make_app(incremental_recompute=True, pid_tick_interval=60)
+    app.task_scheduler.start()
+    app._due_tasks(False)
+
+    app.room_manager.update_room_temperature('Room 1', 19.0)
+    due = app._due_tasks(woken=True)
+    assert 'pid_tick' not in due
+    assert [room.name for room in app._calculate_valve_positions(due)] == ['Room 1']
+
+
+def test_pid_tick_recalculates_and_writes_all_rooms(make_app):
+    app = make_app(incremental_recompute=True, pid_tick_interval=5, valve_interval=60)
+    app.task_scheduler.start()
+    app._due_tasks(False)
+    app.room_manager.update_room_temperature('Room 1', 19.0)
+
+    # Only the PID tick is due
+    app.task_scheduler.tasks['pid_tick'].next_due = 0.0
+    due = app._due_tasks(False)
+    assert {'pid_tick', 'valve'} <= due
+
+    rooms = app._calculate_valve_positions(due)
+    assert rooms == app.room_manager.rooms
+    assert app.task_scheduler.tasks['pid_tick'].stats['runs'] == 1
+    assert app.room_manager.pop_dirty_rooms() == []
+
+
+def trace_pipelined_cycles(app, events, read_time=0.01, write_time=0.05):
+    """Replace the reads and writes of app with timed stand-ins that log to events."""
+    async def update_temperatures():
+        cycle = sum(1 for event in events if event[0] == 'read start') + 1
+        events.append(('read start', cycle))
+        await asyncio.sleep(read_time)
+        events.append(('read end', cycle, app.ha_api.scheduler._deadline is not None))
+
+    async def write_outputs(due, valve_rooms, woken=False):
+        cycle = sum(1 for event in events if event[0] == 'write start') + 1
+        events.append(('write start', cycle))
+        await asyncio.sleep(write_time)
+        events.append(('write end', cycle))
+
+    app._update_temperatures = update_temperatures
+    app._write_outputs = write_outputs
+
+
+def run_pipelined_cycles(app, count):
+    async def main():
+        app.task_scheduler.start()
+        for _ in range(count):
+            # Every task is due, as on a cycle after a long idle period
+            for task in app.task_scheduler.tasks.values():
+                task.next_due = None
+            await app._run_pipelined_cycle()
+        await app._wait_for_pending_writes()
+
+    asyncio.run(main())
+
+
+def test_pipelined_writes_overlap_next_reads(make_app):
+    app = make_app(pipelined_loop=True)
+    events = []
+    trace_pipelined_cycles(app, events)
+    run_pipelined_cycles(app, 2)
+
+    assert events.index(('read start', 2)) < events.index(('write end', 1))
+    assert events.index(('read end', 2, True)) < events.index(('write end', 1))
+
+
+def test_pipelined_cycle_waits_for_pending_writes(make_app):
+    app = make_app(pipelined_loop=True)
+    events = []
+    trace_pipelined_cycles(app, events, write_time=0.05)
+    run_pipelined_cycles(app, 3)
+
+    writes = [event for event in events if event[0].startswith('write')]
+    assert writes == [
+        ('write start', 1), ('write end', 1),
+        ('write start', 2), ('write end', 2),
+        ('write start', 3), ('write end', 3),
+    ]
+
+
+def test_superseded_cycle_keeps_current_deadline(make_app):
+    app = make_app(pipelined_loop=True)
+    events = []
+    # The first cycle's writes end while the second cycle is still reading
+    trace_pipelined_cycles(app, events, read_time=0.1, write_time=0.02)
+    run_pipelined_cycles(app, 2)
+
+    assert events.index(('write end', 1)) < events.index(('read end', 2, True))
+    # The last cycle's writes ended it
+    assert app.ha_api.scheduler._deadline is None
+
+
+def test_failed_pipelined_cycle_ends_its_cycle(make_app):
+    app = make_app(pipelined_loop=True)
+
+    async def failing_read():
+        raise RuntimeError('read failed')
+
+    app._update_temperatures = failing_read
+    with pytest.raises(RuntimeError):
+        run_pipelined_cycles(app, 1)
+    assert app.ha_api.scheduler._deadline is None
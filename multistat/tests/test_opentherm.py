@@ -0,0 +1,200 @@
+"""
+Tests for the OpenTherm controller and its heating curve.
+"""
+import time
+import asyncio
+
+import opentherm_codec as codec
+from opentherm import OpenThermController, OpenThermProtocol, HeatingCurve
+from opentherm_queue import OpenThermTransactionQueue
+from opentherm_poller import PolledValue
+
+from fake_opentherm import FakeTransport
+
+
+def run_controller(scenario, **options):
+    """Run scenario(controller, transport) with the controller on a fake bus."""
+    async def main():
+        controller = OpenThermController('/dev/null', **options)
+        bus = FakeTransport()
+        protocol = controller.protocol
+        protocol.transport = bus
+        protocol.queue = OpenThermTransactionQueue(bus, codec.frame_data_id, timeout=0.2)
+        protocol.queue.on_error = controller._connection_lost
+        protocol.queue.start()
+        controller.connected = True
+        try:
+            return await scenario(controller, bus)
+        finally:
+            await controller.stop()
+
+    return asyncio.run(main())
+
+
+def sent_messages(transport):
+    """Get (msg_type, data_id, value) of every frame sent on the bus."""
+    return [
+        (frame.msg_type, frame.data_id, frame.value)
+        for frame in map(codec.decode, transport.sent)
+    ]
+
+
+def test_heating_curve_rises_with_outside_and_room_error():
+    curve = HeatingCurve(slope=1.5, room_gain=5.0, min_flow=20.0, max_flow=70.0)
+
+    assert curve.flow_temperature(21.0, 21.0, 21.0) == 21.0
+    assert curve.flow_temperature(21.0, 20.0, 5.0) == 50.0
+    assert curve.flow_temperature(21.0, 20.0) == 26.0
+    assert curve.flow_temperature(21.0, 22.0, 25.0) == 20.0
+    assert curve.flow_temperature(21.0, 15.0, -20.0) == 70.0
+
+
+def test_control_temperature_sends_flow_room_setpoint_and_room_temperature():
+    async def scenario(controller, bus):
+        controller.poller.cache[OpenThermProtocol.TOUTSIDE] = PolledValue(5.0, time.monotonic())
+        ok = await controller.set_control_temperature(21.0, 20.0)
+        return ok, controller.flow_setpoint
+
+    ok, flow_setpoint = run_controller(scenario)
+    assert ok
+    assert flow_setpoint == 50.0
+
+
+def test_control_temperature_data_ids_on_the_bus():
+    async def scenario(controller, bus):
+        controller.poller.cache[OpenThermProtocol.TOUTSIDE] = PolledValue(5.0, time.monotonic())
+        await controller.set_control_temperature(21.0, 20.0)
+        return sent_messages(bus)
+
+    assert run_controller(scenario) == [
+        (codec.WRITE_DATA, OpenThermProtocol.TSET, 50.0),
+        (codec.WRITE_DATA, OpenThermProtocol.TRSET, 21.0),
+        (codec.WRITE_DATA, OpenThermProtocol.TR, 20.0),
+    ]
+
+
+def test_unchanged_room_values_are_only_sent_on_refresh():
+    async def scenario(controller, bus):
+        await controller.set_control_temperature(21.0, 20.0)
+        bus.sent.clear()
+        await controller.set_control_temperature(21.0, 20.0)
+        unchanged = sent_messages(bus)
+
+        bus.sent.clear()
+        await controller.set_control_temperature(21.0, 20.5)
+        changed = sent_messages(bus)
+
+        bus.sent.clear()
+        for written in controller._room_writes.values():
+            written.timestamp -= OpenThermController.ROOM_REFRESH_INTERVAL
+        await controller.set_control_temperature(21.0, 20.5)
+        return unchanged, changed, [data_id for _, data_id, _ in sent_messages(bus)]
+
+    unchanged, changed, refreshed = run_controller(scenario)
+    assert unchanged == [(codec.WRITE_DATA, OpenThermProtocol.TSET, 26.0)]
+    assert changed == [
+        (codec.WRITE_DATA, OpenThermProtocol.TSET, 23.5),
+        (codec.WRITE_DATA, OpenThermProtocol.TR, 20.5),
+    ]
+    assert refreshed == [OpenThermProtocol.TSET, OpenThermProtocol.TRSET, OpenThermProtocol.TR]
+
+
+def test_pushed_change_skips_unchanged_setpoint_and_keeps_the_message_budget():
+    async def scenario(controller, bus):
+        await controller.set_control_temperature(21.0, 20.0)
+        bus.sent.clear()
+        # Right after the last message the bus has no budget left
+        over_budget = await controller.set_control_temperature(21.0, 19.0, pushed=True)
+        sent_over_budget = sent_messages(bus)
+
+        controller.protocol.queue.last_sent_at -= 1.0
+        await controller.set_control_temperature(21.0, 20.0, pushed=True)
+        unchanged = sent_messages(bus)
+        await controller.set_control_temperature(21.0, 19.0, pushed=True)
+        return over_budget, sent_over_budget, unchanged, sent_messages(bus)
+
+    over_budget, sent_over_budget, unchanged, changed = run_controller(scenario)
+    assert not over_budget
+    assert sent_over_budget == []
+    assert unchanged == []
+    assert changed == [
+        (codec.WRITE_DATA, OpenThermProtocol.TSET, 31.0),
+        (codec.WRITE_DATA, OpenThermProtocol.TR, 19.0),
+    ]
+
+
+def test_stale_outside_temperature_is_not_used():
+    async def scenario(controller, bus):
+        read_at = time.monotonic() - OpenThermController.OUTSIDE_MAX_AGE - 1
+        controller.poller.cache[OpenThermProtocol.TOUTSIDE] = PolledValue(5.0, read_at)
+        await controller.set_control_temperature(21.0, 20.0)
+        return sent_messages(bus)[0]
+
+    assert run_controller(scenario) == (codec.WRITE_DATA, OpenThermProtocol.TSET, 26.0)
+
+
+def test_flow_setpoint_follows_the_configured_curve():
+    async def scenario(controller, bus):
+        await controller.set_control_temperature(20.0, 18.0)
+        return sent_messages(bus)[0]
+
+    curve = HeatingCurve(room_gain=10.0, max_flow=35.0)
+    assert run_controller(scenario, heating_curve=curve) == (
+        codec.WRITE_DATA, OpenThermProtocol.TSET, 35.0
+    )
+
+
+def test_heating_demand_change_is_not_merged_into_a_queued_status_read():
+    async def scenario(controller, bus):
+        # Keep the bus busy so the poller's status read waits in the queue
+        busy = asyncio.ensure_future(controller.protocol.read(OpenThermProtocol.TBOILER))
+        await asyncio.sleep(0.001)
+        queued = asyncio.ensure_future(controller.poller.refresh(OpenThermProtocol.STATUS))
+        await asyncio.sleep(0)
+        await controller.set_heating_demand(False)
+        await asyncio.gather(busy, queued)
+        return sent_messages(bus)
+
+    status_frames = [
+        value for _, data_id, value in run_controller(scenario)
+        if data_id == OpenThermProtocol.STATUS
+    ]
+    assert status_frames[-1][0] & OpenThermProtocol.MASTER_CH_ENABLE == 0
+
+
+def test_io_error_falls_back_and_reconnects_with_backoff(monkeypatch):
+    monkeypatch.setattr(OpenThermController, 'RECONNECT_DELAY', 0.01)
+
+    async def scenario(controller, bus):
+        controller.poller.start()
+        polling = controller.poller._task
+        pending = asyncio.ensure_future(controller.protocol.read(OpenThermProtocol.TBOILER))
+        await asyncio.sleep(0)
+        bus.failing_connects = 2
+        bus.fail(OSError("Input/output error"))
+        lost = (controller.connected, await controller.set_control_temperature(21.0, 20.0))
+        try:
+            await pending
+        except ConnectionError:
+            pass
+
+        while not controller.connected:
+            await asyncio.sleep(0.01)
+        return lost, bus.connect_attempts, polling.cancelled(), controller.poller._task not in (None, polling)
+
+    lost, attempts, poller_stopped, poller_restarted = run_controller(scenario)
+    assert lost == (False, False)
+    assert attempts == 3
+    assert poller_stopped
+    assert poller_restarted
+
+
+def test_stop_cancels_reconnect():
+    async def scenario(controller, bus):
+        bus.fail(OSError("Input/output error"))
+        await asyncio.sleep(0)
+        await controller.stop()
+        await asyncio.sleep(0.01)
+        return controller.connected, bus.connect_attempts, controller._reconnect_task
+
+    assert run_controller(scenario) == (False, 0, None)
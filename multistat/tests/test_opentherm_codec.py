@@ -0,0 +1,112 @@
+"""
+Golden-vector tests for the OpenTherm frame codec.
+
+The frames are worked out by hand from the OpenTherm 2.2 frame layout.
+"""
+import pytest
+
+import opentherm_codec as codec
+
+# (description, message type, data-id, value, frame)
+GOLDEN_VECTORS = [
+    ('read status, CH enabled', codec.READ_DATA, 0, (0x01, 0x00), 0x80000100),
+    ('status ack, CH and flame on', codec.READ_ACK, 0, (0x01, 0x0A), 0x4000010A),
+    ('write TSet 30.0', codec.WRITE_DATA, 1, 30.0, 0x10011E00),
+    ('TSet 30.0 ack', codec.WRITE_ACK, 1, 30.0, 0xD0011E00),
+    ('boiler temperature 45.5', codec.READ_ACK, 25, 45.5, 0xC0192D80),
+    ('outside temperature -5.5', codec.READ_ACK, 27, -5.5, 0x401BFA80),
+    ('modulation level 0.5', codec.READ_ACK, 17, 0.5, 0x40110080),
+    ('exhaust temperature -40', codec.READ_ACK, 33, -40, 0xC021FFD8),
+    ('burner starts 12345', codec.READ_ACK, 116, 12345, 0xC0743039),
+    ('max CH setpoint bounds 80/20', codec.READ_ACK, 49, (80, 20), 0x40315014),
+    ('unknown data-id 99', codec.UNKNOWN_DATA_ID, 99, None, 0xF0630000),
+]
+
+IDS = [vector[0] for vector in GOLDEN_VECTORS]
+
+
+def frame_bytes(frame: int) -> bytes:
+    return frame.to_bytes(4, 'big')
+
+
+@pytest.mark.parametrize('description, msg_type, data_id, value, frame', GOLDEN_VECTORS, ids=IDS)
+def test_encode(description, msg_type, data_id, value, frame):
+    assert codec.encode(msg_type, data_id, value) == frame_bytes(frame)
+
+
+@pytest.mark.parametrize('description, msg_type, data_id, value, frame', GOLDEN_VECTORS, ids=IDS)
+def test_decode(description, msg_type, data_id, value, frame):
+    decoded = codec.decode(frame_bytes(frame))
+    assert decoded.valid
+    assert decoded.msg_type == msg_type
+    assert decoded.data_id == data_id
+    assert decoded.value == (value if value is not None else 0)
+
+
+@pytest.mark.parametrize('bit', [0, 8, 16, 28, 31])
+def test_single_bit_error_fails_parity(bit):
+    corrupted = frame_bytes(0x10011E00 ^ (1 << bit))
+    assert not codec.decode(corrupted).valid
+    assert not codec.is_valid_frame(corrupted)
+    assert codec.frame_data_id(corrupted) is None
+
+
+def test_spare_bits_make_frame_invalid():
+    # Parity is even, but a spare bit is set
+    frame = codec.encode_frame(codec.READ_ACK, 25, 0) | 0x03000000
+    assert not codec.is_valid_frame(frame_bytes(frame))
+
+
+@pytest.mark.parametrize('msg_type', range(8))
+def test_message_type_round_trips(msg_type):
+    decoded = codec.decode(codec.encode(msg_type, 25, 45.5))
+    assert decoded.valid
+    assert decoded.msg_type == msg_type
+    assert codec.MSG_TYPE_NAMES[msg_type]
+
+
+@pytest.mark.parametrize('value, raw', [
+    (-0.00390625, 0xFFFF),
+    (-1.0, 0xFF00),
+    (-40.25, 0xD7C0),
+    (-128.0, 0x8000),
+    (127.99609375, 0x7FFF),
+])
+def test_f8_8_signed_values(value, raw):
+    assert codec.encode_value(codec.F8_8, value) == raw
+    assert codec.decode_value(codec.F8_8, raw) == value
+
+
+@pytest.mark.parametrize('value_type, value', [
+    (codec.F8_8, 128.0),
+    (codec.F8_8, -128.01),
+    (codec.U16, -1),
+    (codec.S16, 0x8000),
+])
+def test_out_of_range_values_are_rejected(value_type, value):
+    with pytest.raises(ValueError):
+        codec.encode_value(value_type, value)
+
+
+def test_stream_resyncs_after_garbage():
+    frames = [frame_bytes(vector[4]) for vector in GOLDEN_VECTORS]
+    stream = b'\x01\x02\x03' + frames[4] + b'\xff' + frames[5] + frames[6][:2]
+
+    offsets = [offset for offset, _ in codec.iter_frames(stream)]
+    decoded = codec.decode_stream(stream)
+    assert offsets == [3, 8]
+    assert [(frame.data_id, frame.value) for frame in decoded] == [(25, 45.5), (27, -5.5)]
+
+
+def test_decode_array_matches_frame_decoding():
+    pytest.importorskip('numpy')
+    stream = b''.join(frame_bytes(vector[4]) for vector in GOLDEN_VECTORS)
+    stream += frame_bytes(0xC0192D80 ^ 0x00000100)
+    arrays = codec.decode_array(stream)
+
+    assert arrays['valid'].tolist() == [True] * len(GOLDEN_VECTORS) + [False]
+    assert arrays['msg_type'][:-1].tolist() == [vector[1] for vector in GOLDEN_VECTORS]
+    assert arrays['data_id'][:-1].tolist() == [vector[2] for vector in GOLDEN_VECTORS]
+    scalar = [i for i, vector in enumerate(GOLDEN_VECTORS)
+              if isinstance(vector[3], (int, float)) and vector[2] in codec.DATA_IDS]
+    assert arrays['value'][scalar].tolist() == [GOLDEN_VECTORS[i][3] for i in scalar]
@@ -0,0 +1,133 @@
+"""
+Tests for the OpenTherm poll scheduler and read cache.
+"""
+import time
+import asyncio
+
+import pytest
+
+import opentherm_poller
+from opentherm_poller import OpenThermPoller, UNSUPPORTED_AFTER, resolve_data_id
+
+
+class FakeQueue:
+    last_sent_at = None
+
+
+class FakeProtocol:
+    """Protocol that answers reads right away and records when they were sent."""
+
+    STATUS = 0
+
+    def __init__(self, unsupported=()):
+        self.queue = FakeQueue()
+        self.unsupported = set(unsupported)
+        self.reads = []
+
+    async def read(self, data_id, priority=None):
+        return self._read(data_id)
+
+    async def get_status(self):
+        return self._read(self.STATUS)
+
+    def _read(self, data_id):
+        self.queue.last_sent_at = time.monotonic()
+        self.reads.append((self.queue.last_sent_at, data_id))
+        if data_id in self.unsupported:
+            return None
+        return float(data_id)
+
+
+def run_poller(poller, seconds: float):
+    async def main():
+        poller.start()
+        await asyncio.sleep(seconds)
+        await poller.stop()
+
+    asyncio.run(main())
+
+
+def read_ids(protocol):
+    return [data_id for _, data_id in protocol.reads]
+
+
+def test_data_ids_are_polled_at_their_own_rates():
+    protocol = FakeProtocol()
+    poller = OpenThermPoller(protocol, {'boiler_temperature': 0.05, 'outside_temperature': 0.2},
+                             max_rate=1000)
+    run_poller(poller, 0.43)
+
+    ids = read_ids(protocol)
+    assert 8 <= ids.count(25) <= 10
+    assert ids.count(27) == 3
+    assert poller.get('outside_temperature').value == 27.0
+
+
+def test_reads_stay_within_the_message_budget():
+    protocol = FakeProtocol()
+    poller = OpenThermPoller(protocol, {16: 0.01, 17: 0.01, 18: 0.01, 19: 0.01}, max_rate=50)
+    run_poller(poller, 0.3)
+
+    times = [sent_at for sent_at, _ in protocol.reads]
+    assert len(times) >= 10
+    assert min(b - a for a, b in zip(times, times[1:])) >= 0.02 - 0.002
+    # The most overdue data-id goes first, so no data-id is starved
+    assert set(read_ids(protocol)) == {16, 17, 18, 19}
+    assert poller.stats['max_lateness'] > 0
+
+
+def test_other_bus_traffic_counts_against_the_budget():
+    async def main():
+        protocol = FakeProtocol()
+        poller = OpenThermPoller(protocol, {25: 0.01}, max_rate=10)
+        protocol.queue.last_sent_at = time.monotonic()
+        poller.start()
+        await asyncio.sleep(0.05)
+        await poller.stop()
+        return protocol
+
+    assert asyncio.run(main()).reads == []
+
+
+def test_unsupported_data_id_is_polled_less_often():
+    protocol = FakeProtocol(unsupported={26})
+    poller = OpenThermPoller(protocol, {25: 0.02, 26: 0.02}, max_rate=1000)
+    # After the third failure data-id 26 is next due in 10 * 0.02 seconds
+    run_poller(poller, 0.15)
+
+    ids = read_ids(protocol)
+    assert ids.count(26) == UNSUPPORTED_AFTER
+    assert ids.count(25) >= 6
+    assert poller.get(26) is None
+    assert poller.stats['failed_reads'] == UNSUPPORTED_AFTER
+
+
+def test_refresh_reads_right_away():
+    async def main():
+        protocol = FakeProtocol()
+        poller = OpenThermPoller(protocol, {'status': 60})
+        assert await poller.refresh('status')
+        return poller
+
+    poller = asyncio.run(main())
+    assert poller.get(0).value == 0.0
+    assert poller.get_values() == {'status': 0.0}
+
+
+def test_values_older_than_max_age_are_left_out(monkeypatch, clock):
+    monkeypatch.setattr(opentherm_poller, 'time', clock)
+    poller = OpenThermPoller(FakeProtocol(), {})
+    poller.cache[25] = opentherm_poller.PolledValue(45.0, clock.now)
+    clock.advance(10)
+    poller.cache[27] = opentherm_poller.PolledValue(5.0, clock.now)
+
+    assert poller.get_values(max_age=5) == {'outside_temperature': 5.0}
+    assert poller.get(25).age == 10
+
+
+def test_data_ids_resolve_by_number_or_name():
+    assert resolve_data_id(25) == 25
+    assert resolve_data_id('25') == 25
+    assert resolve_data_id('boiler_temperature') == 25
+    with pytest.raises(ValueError):
+        resolve_data_id('flux_capacitor')
@@ -0,0 +1,166 @@
+"""
+Tests for the OpenTherm transaction queue.
+"""
+import asyncio
+
+import pytest
+
+import opentherm_codec as codec
+from opentherm_queue import (
+    OpenThermTransactionQueue, PRIORITY_WRITE, PRIORITY_STATUS, PRIORITY_DIAGNOSTICS
+)
+
+from fake_opentherm import FakeTransport, ack
+
+
+def read_frame(data_id: int) -> bytes:
+    return codec.encode(codec.READ_DATA, data_id)
+
+
+def run_queue(scenario, transport=None, timeout: float = 0.2):
+    """Run scenario(queue, transport) with a started queue."""
+    async def main():
+        bus = transport or FakeTransport()
+        queue = OpenThermTransactionQueue(bus, codec.frame_data_id, timeout=timeout)
+        queue.start()
+        try:
+            return await scenario(queue, bus)
+        finally:
+            await queue.stop()
+
+    return asyncio.run(main())
+
+
+def sent_ids(transport):
+    return [codec.decode(frame).data_id for frame in transport.sent]
+
+
+def test_queued_requests_are_sent_by_priority():
+    async def scenario(queue, bus):
+        requests = [
+            queue.submit(read_frame(25), 25, PRIORITY_STATUS),
+            queue.submit(read_frame(116), 116, PRIORITY_DIAGNOSTICS),
+            queue.submit(read_frame(27), 27, PRIORITY_STATUS),
+            queue.submit(codec.encode(codec.WRITE_DATA, 1, 40.0), 1, PRIORITY_WRITE),
+        ]
+        return await asyncio.gather(*requests)
+
+    transport = FakeTransport()
+    responses = run_queue(scenario, transport)
+    assert sent_ids(transport) == [1, 25, 27, 116]
+    assert [codec.decode(frame).data_id for frame in responses] == [25, 116, 27, 1]
+
+
+def test_one_request_on_the_bus_at_a_time():
+    async def scenario(queue, bus):
+        in_flight = []
+
+        def send(frame):
+            in_flight.append(queue._current is not None and queue.stats['completed'])
+            FakeTransport.send(bus, frame)
+
+        bus.send = send
+        await asyncio.gather(*[queue.submit(read_frame(i), i) for i in (17, 18, 19)])
+        return in_flight
+
+    # Each request is sent after the previous one completed
+    assert run_queue(scenario) == [0, 1, 2]
+
+
+def test_reads_of_a_queued_data_id_are_coalesced():
+    async def scenario(queue, bus):
+        results = await asyncio.gather(
+            queue.submit(read_frame(25), 25, read=True),
+            queue.submit(read_frame(17), 17, read=True),
+            queue.submit(read_frame(25), 25, read=True),
+        )
+        # A read already on the bus is not shared by new reads
+        on_bus = asyncio.ensure_future(queue.submit(read_frame(25), 25, read=True))
+        await asyncio.sleep(0.001)
+        results.append(await queue.submit(read_frame(25), 25, read=True))
+        await on_bus
+        return queue, results
+
+    transport = FakeTransport()
+    queue, results = run_queue(scenario, transport)
+    assert sent_ids(transport) == [25, 17, 25, 25]
+    assert results[0] == results[2]
+    assert queue.stats['coalesced'] == 1
+
+
+def test_reads_with_other_data_are_not_coalesced():
+    async def scenario(queue, bus):
+        await asyncio.gather(
+            queue.submit(read_frame(17), 17, read=True),
+            queue.submit(codec.encode(codec.READ_DATA, 0, (0x03, 0)), 0, read=True),
+            queue.submit(codec.encode(codec.READ_DATA, 0, (0x02, 0)), 0, read=True),
+        )
+        return queue
+
+    transport = FakeTransport()
+    queue = run_queue(scenario, transport)
+    assert [codec.decode(frame).value for frame in transport.sent[1:]] == [(0x03, 0), (0x02, 0)]
+    assert queue.stats['coalesced'] == 0
+
+
+def test_writes_are_never_coalesced():
+    async def scenario(queue, bus):
+        frame = codec.encode(codec.WRITE_DATA, 1, 40.0)
+        await asyncio.gather(*[queue.submit(frame, 1, PRIORITY_WRITE) for _ in range(3)])
+
+    transport = FakeTransport()
+    run_queue(scenario, transport)
+    assert sent_ids(transport) == [1, 1, 1]
+
+
+def test_timeout_returns_none_and_drops_late_response():
+    async def scenario(queue, bus):
+        bus.delay = 0.05
+        assert await queue.submit(read_frame(25), 25, timeout=0.01) is None
+        bus.delay = 0.001
+        response = await queue.submit(read_frame(17), 17)
+        await asyncio.sleep(0.06)
+        return queue, response
+
+    queue, response = run_queue(scenario)
+    assert codec.decode(response).data_id == 17
+    assert queue.stats['timeouts'] == 1
+    assert queue.stats['unmatched_frames'] == 1
+
+
+def test_echoed_request_is_not_taken_as_response():
+    async def scenario(queue, bus):
+        def send(frame):
+            bus.sent.append(frame)
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.001, bus.on_frame, frame)
+            loop.call_later(0.005, bus.on_frame, ack(frame, 0x2D80))
+        bus.send = send
+        return queue, await queue.submit(read_frame(25), 25)
+
+    queue, response = run_queue(scenario)
+    assert codec.decode(response).msg_type == codec.READ_ACK
+    assert codec.decode(response).value == 45.5
+    assert queue.stats['unmatched_frames'] == 1
+
+
+def test_transport_error_fails_queued_requests():
+    async def scenario(queue, bus):
+        pending = [asyncio.ensure_future(queue.submit(read_frame(i), i)) for i in (17, 18)]
+        await asyncio.sleep(0)
+        bus.on_error(OSError('device removed'))
+        return await asyncio.gather(*pending, return_exceptions=True)
+
+    results = run_queue(scenario, FakeTransport(reply=None))
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+def test_latency_stats_are_recorded():
+    async def scenario(queue, bus):
+        await queue.submit(read_frame(25), 25)
+        return queue
+
+    queue = run_queue(scenario, FakeTransport(delay=0.02))
+    assert queue.stats['completed'] == 1
+    assert queue.stats['last_bus_time'] == pytest.approx(0.02, abs=0.015)
+    assert queue.last_sent_at is not None
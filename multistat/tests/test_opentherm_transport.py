@@ -0,0 +1,101 @@
+"""
+Tests for the OpenTherm serial transport against a loopback serial port.
+"""
+import asyncio
+
+import serial
+
+import opentherm_codec as codec
+from opentherm_transport import OpenThermTransport
+
+from fake_opentherm import FakeSerial
+
+
+def read_frame(data_id: int) -> bytes:
+    return codec.encode(codec.READ_DATA, data_id)
+
+
+def run_transport(scenario, port, monkeypatch, read_timeout: float = 5.0):
+    """Run scenario(transport, port, frames, errors) with a connected transport."""
+    monkeypatch.setattr(serial, 'Serial', lambda **options: port)
+
+    async def main():
+        transport = OpenThermTransport(
+            '/dev/null', frame_size=codec.FRAME_SIZE,
+            is_valid_frame=codec.is_valid_frame, read_timeout=read_timeout
+        )
+        frames = []
+        errors = []
+        transport.on_frame = frames.append
+        transport.on_error = errors.append
+        await transport.connect()
+        try:
+            return await scenario(transport, port, frames, errors)
+        finally:
+            await transport.close()
+
+    return asyncio.run(main())
+
+
+async def wait_until(predicate, timeout: float = 2.0):
+    """Wait until predicate() holds."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        assert loop.time() < deadline, 'timed out'
+        await asyncio.sleep(0.005)
+
+
+def test_frames_are_split_from_the_byte_stream(monkeypatch):
+    first, second = read_frame(0), read_frame(25)
+
+    async def scenario(transport, port, frames, errors):
+        port.feed(first[:2])
+        await asyncio.sleep(0.02)
+        port.feed(first[2:] + second)
+        await wait_until(lambda: len(frames) == 2)
+        return frames, transport.stats
+
+    frames, stats = run_transport(scenario, FakeSerial(reply=None), monkeypatch)
+    assert frames == [first, second]
+    assert stats == {'frames_sent': 0, 'frames_received': 2, 'resyncs': 0}
+
+
+def test_invalid_bytes_are_dropped_to_resynchronize(monkeypatch):
+    frame = read_frame(25)
+
+    async def scenario(transport, port, frames, errors):
+        port.feed(b'\x01' + frame)
+        await wait_until(lambda: frames)
+        return frames, transport.stats['resyncs']
+
+    assert run_transport(scenario, FakeSerial(reply=None), monkeypatch) == ([frame], 1)
+
+
+def test_sent_frame_wakes_a_blocking_read(monkeypatch):
+    frame = read_frame(25)
+
+    async def scenario(transport, port, frames, errors):
+        await asyncio.sleep(0.02)
+        transport.send(frame)
+        # The I/O thread sits in a 5 s read until the send interrupts it
+        await wait_until(lambda: frames, timeout=1.0)
+        return port.written, frames, transport.stats
+
+    written, frames, stats = run_transport(scenario, FakeSerial(), monkeypatch)
+    assert written == [frame]
+    assert [codec.decode(received).msg_type for received in frames] == [codec.READ_ACK]
+    assert stats == {'frames_sent': 1, 'frames_received': 1, 'resyncs': 0}
+
+
+def test_io_error_is_reported_and_the_port_closed(monkeypatch):
+    error = OSError("Input/output error")
+
+    async def scenario(transport, port, frames, errors):
+        port.fail(error)
+        await wait_until(lambda: errors)
+        connected = transport.connected
+        await transport.close()
+        return errors, connected, port.is_open
+
+    assert run_transport(scenario, FakeSerial(), monkeypatch) == ([error], False, False)
@@ -0,0 +1,121 @@
+"""
+Tests for the PID controller and the NumPy PID bank.
+"""
+import pytest
+
+import pid_controller
+from pid_controller import PIDController
+
+np = pytest.importorskip('numpy')
+from pid_controller import PIDBank  # noqa: E402
+
+
+@pytest.fixture
+def pid_clock(monkeypatch, clock):
+    monkeypatch.setattr(pid_controller, 'time', clock)
+    return clock
+
+
+GAINS = [
+    (1.0, 0.1, 0.05),
+    (2.0, 0.0, 0.0),
+    (0.5, 0.3, 0.2),
+    (0.0, 1.0, 0.0),
+]
+
+
+def test_bank_matches_scalar_controllers(pid_clock):
+    scalars = [PIDController(kp, ki, kd, setpoint=0.5, output_limits=(-50.0, 50.0))
+               for kp, ki, kd in GAINS]
+    bank = PIDBank(capacity=1)
+    indexes = [bank.add(kp, ki, kd, setpoint=0.5, output_limits=(-50.0, 50.0))
+               for kp, ki, kd in GAINS]
+    assert len(bank) == len(GAINS)
+
+    measurements = [0.0, 0.4, 1.5, -2.0, 0.5, 3.0, 1.0, 0.2]
+    for step, measurement in enumerate(measurements):
+        values = [measurement + i / 10 for i in range(len(GAINS))]
+        expected = [pid.update(value) for pid, value in zip(scalars, values)]
+        outputs = bank.update(indexes, values, pid_clock.now)
+        assert outputs.tolist() == pytest.approx(expected)
+        pid_clock.advance(0.5 + step / 10)
+
+
+def test_handles_behave_like_scalar_controllers(pid_clock):
+    scalar = PIDController(1.0, 0.5, 0.1)
+    bank = PIDBank()
+    handle = bank.controller(bank.add(1.0, 0.5, 0.1))
+
+    for setpoint, measurement in [(0.0, -3.0), (0.0, -2.0), (1.0, -1.0), (1.0, 0.5)]:
+        scalar.set_setpoint(setpoint)
+        handle.set_setpoint(setpoint)
+        assert handle.update(measurement) == pytest.approx(scalar.update(measurement))
+        pid_clock.advance(1.0)
+
+    assert handle.output_limits == scalar.output_limits
+    scalar.reset()
+    handle.reset()
+    assert handle.update(-4.0) == scalar.update(-4.0) == 5.0
+
+
+def test_saturated_output_stops_integral_growth(pid_clock):
+    scalar = PIDController(kp=1.0, ki=0.5, kd=0.0, output_limits=(0.0, 100.0))
+    bank = PIDBank()
+    index = bank.add(kp=1.0, ki=0.5, kd=0.0, output_limits=(0.0, 100.0))
+
+    # Far below the setpoint: both outputs saturate at the upper limit
+    for _ in range(10):
+        assert bank.update([index], [-150.0], pid_clock.now)[0] == scalar.update(-150.0) == 100.0
+        pid_clock.advance(1.0)
+    assert scalar._integral == 1350.0
+    assert bank.integral[index] == 0.0
+
+    # Past the setpoint: the wound-up scalar controller stays saturated
+    # while the bank follows the error right away
+    assert scalar.update(50.0) == 100.0
+    assert bank.update([index], [50.0], pid_clock.now)[0] == 0.0
+
+
+def test_integral_within_limits_matches_scalar(pid_clock):
+    scalar = PIDController(kp=1.0, ki=0.5, kd=0.0, output_limits=(0.0, 100.0))
+    bank = PIDBank()
+    index = bank.add(kp=1.0, ki=0.5, kd=0.0, output_limits=(0.0, 100.0))
+
+    for _ in range(10):
+        assert bank.update([index], [-5.0], pid_clock.now)[0] == pytest.approx(scalar.update(-5.0))
+        pid_clock.advance(1.0)
+    assert bank.integral[index] == pytest.approx(scalar._integral) == 45.0
+
+
+def test_zero_time_step_uses_proportional_term_only(pid_clock):
+    bank = PIDBank()
+    index = bank.add(2.0, 1.0, 1.0)
+    bank.update([index], [-1.0], pid_clock.now)
+    pid_clock.advance(1.0)
+    bank.update([index], [-2.0], pid_clock.now)
+    integral = bank.integral[index]
+
+    assert bank.update([index], [-3.0], pid_clock.now)[0] == 6.0
+    assert bank.integral[index] == integral
+
+
+def test_bank_grows_and_keeps_controllers():
+    bank = PIDBank(capacity=1)
+    for i in range(5):
+        bank.add(kp=float(i), setpoint=float(i))
+    assert len(bank) == 5
+    assert bank.kp[:5].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert bank.setpoint[:5].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_fixed_time_step_ignores_elapsed_time(pid_clock):
+    scalar = PIDController(kp=1.0, ki=0.5, kd=2.0)
+    bank = PIDBank()
+    index = bank.add(kp=1.0, ki=0.5, kd=2.0)
+    scalar.update(-1.0, dt=5.0)
+    bank.update([index], [-1.0], pid_clock.now, dt=5.0)
+
+    pid_clock.advance(60.0)
+    # P = 2, I = 0.5 * 2 * 5, D = 2 * 1 / 5
+    assert scalar.update(-2.0, dt=5.0) == pytest.approx(7.4)
+    assert bank.update([index], [-2.0], pid_clock.now, dt=5.0)[0] == pytest.approx(7.4)
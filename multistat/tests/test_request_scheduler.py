@@ -0,0 +1,141 @@
+"""
+Tests for the request scheduler priorities and cycle deadline.
+"""
+import asyncio
+
+import pytest
+
+from request_scheduler import (
+    RequestScheduler, DeadlineExceeded, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+)
+
+
+def test_in_flight_requests_are_bounded():
+    async def scenario():
+        scheduler = RequestScheduler(max_in_flight=2)
+        running = 0
+        peak = 0
+
+        async def request():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        await asyncio.gather(*[scheduler.run(request()) for _ in range(6)])
+        return scheduler, peak
+
+    scheduler, peak = asyncio.run(scenario())
+    assert peak == 2
+    assert scheduler.stats['completed'] == 6
+    assert scheduler.stats['max_queue_depth'] == 4
+
+
+def test_waiting_requests_run_in_priority_order():
+    async def scenario():
+        scheduler = RequestScheduler(max_in_flight=1)
+        release = asyncio.Event()
+        order = []
+
+        async def blocker():
+            await release.wait()
+
+        async def request(name):
+            order.append(name)
+
+        first = asyncio.create_task(scheduler.run(blocker()))
+        await asyncio.sleep(0)
+        waiting = [
+            asyncio.create_task(scheduler.run(request('low'), PRIORITY_LOW)),
+            asyncio.create_task(scheduler.run(request('normal'), PRIORITY_NORMAL)),
+            asyncio.create_task(scheduler.run(request('high 1'), PRIORITY_HIGH)),
+            asyncio.create_task(scheduler.run(request('high 2'), PRIORITY_HIGH)),
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(first, *waiting)
+        return order
+
+    assert asyncio.run(scenario()) == ['high 1', 'high 2', 'normal', 'low']
+
+
+def test_request_running_past_deadline_is_cancelled():
+    async def scenario():
+        scheduler = RequestScheduler()
+        scheduler.begin_cycle(0.02)
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.run(asyncio.sleep(1))
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.stats['cancelled'] == 1
+
+
+def test_request_started_after_deadline_is_rejected():
+    async def scenario():
+        scheduler = RequestScheduler()
+        scheduler.begin_cycle(0.01)
+        await asyncio.sleep(0.02)
+        request = asyncio.sleep(0)
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.run(request)
+        # The coroutine is closed, not left un-awaited
+        assert request.cr_frame is None
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.stats['cancelled'] == 1
+    assert scheduler.queue_depth == 0
+
+
+def test_cancelled_waiter_frees_its_slot():
+    async def scenario():
+        scheduler = RequestScheduler(max_in_flight=1)
+        scheduler.begin_cycle(0.02)
+        blocked = asyncio.create_task(scheduler.run(asyncio.sleep(1)))
+        await asyncio.sleep(0)
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.run(asyncio.sleep(0))
+        with pytest.raises(DeadlineExceeded):
+            await blocked
+
+        scheduler.begin_cycle(None)
+        return await scheduler.run(asyncio.sleep(0, 'done'))
+
+    assert asyncio.run(scenario()) == 'done'
+
+
+def test_begin_cycle_without_duration_disables_deadline():
+    async def scenario():
+        scheduler = RequestScheduler()
+        scheduler.begin_cycle(0.01)
+        scheduler.begin_cycle(None)
+        await asyncio.sleep(0.02)
+        return await scheduler.run(asyncio.sleep(0, 'done'))
+
+    assert asyncio.run(scenario()) == 'done'
+
+
+def test_end_cycle_clears_the_deadline():
+    async def scenario():
+        scheduler = RequestScheduler()
+        cycle = scheduler.begin_cycle(0.01)
+        scheduler.end_cycle(cycle)
+        await asyncio.sleep(0.02)
+        return await scheduler.run(asyncio.sleep(0, 'done'))
+
+    assert asyncio.run(scenario()) == 'done'
+
+
+def test_ending_an_older_cycle_keeps_the_current_deadline():
+    async def scenario():
+        scheduler = RequestScheduler()
+        first = scheduler.begin_cycle(0.01)
+        scheduler.begin_cycle(0.01)
+        scheduler.end_cycle(first)
+        await asyncio.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.run(asyncio.sleep(0))
+
+    asyncio.run(scenario())
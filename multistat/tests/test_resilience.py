@@ -0,0 +1,88 @@
+"""
+Tests for the circuit breaker states and the retry policy.
+"""
+import resilience
+from resilience import CircuitBreaker, RetryPolicy
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker('test', failure_threshold=3, recovery_timeout=30)
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker('test', failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_a_single_probe_through(monkeypatch, clock):
+    monkeypatch.setattr(resilience, 'time', clock)
+    breaker = CircuitBreaker('test', failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure()
+
+    clock.advance(29)
+    assert not breaker.allow_request()
+    clock.advance(1)
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+def test_failed_probe_reopens_circuit(monkeypatch, clock):
+    monkeypatch.setattr(resilience, 'time', clock)
+    breaker = CircuitBreaker('test', failure_threshold=5, recovery_timeout=30)
+    for _ in range(5):
+        breaker.record_failure()
+
+    clock.advance(30)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    clock.advance(30)
+    assert breaker.allow_request()
+
+
+def test_released_probe_can_be_claimed_again(monkeypatch, clock):
+    monkeypatch.setattr(resilience, 'time', clock)
+    breaker = CircuitBreaker('test', failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure()
+    clock.advance(30)
+
+    assert breaker.allow_request()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+
+
+def test_retry_delay_grows_and_is_capped(monkeypatch):
+    monkeypatch.setattr(resilience.random, 'uniform', lambda low, high: high)
+    policy = RetryPolicy(max_attempts=5, base_delay=0.2, max_delay=1.0)
+
+    assert [policy.get_delay(attempt) for attempt in range(1, 5)] == [0.2, 0.4, 0.8, 1.0]
+
+
+def test_retry_delay_uses_full_jitter():
+    policy = RetryPolicy(base_delay=0.2, max_delay=5.0)
+    delays = [policy.get_delay(3) for _ in range(200)]
+    assert all(0 <= delay <= 0.8 for delay in delays)
+    assert min(delays) < 0.4 < max(delays)
+
+
+def test_at_least_one_attempt():
+    assert RetryPolicy(max_attempts=0).max_attempts == 1
@@ -0,0 +1,173 @@
+"""
+Tests for the room manager demand index and dirty tracking.
+"""
+import random
+
+import pytest
+
+import pid_controller
+import vector_engine as vector_engine_module
+from room_manager import RoomManager
+
+
+def build_config(targets):
+    return [
+        {
+            'name': f'Room {i}',
+            'target_temp': target,
+            'current_temp_sensor': f'sensor.room_{i}',
+            'hrv_entity': f'fan.room_{i}',
+            'hrv_valves': [{'name': f'Valve {i}', 'valve_entity': f'number.valve_{i}'}]
+        }
+        for i, target in enumerate(targets)
+    ]
+
+
+def linear_leader(manager):
+    """Leader selection by a linear scan, ties going to the first room."""
+    best = None
+    for room in manager.rooms:
+        if room.needs_heating() and (
+                best is None or room.get_temperature_difference() > best.get_temperature_difference()):
+            best = room
+    return best
+
+
+def test_leader_is_room_with_highest_deficit():
+    manager = RoomManager(build_config([21.0, 21.0, 21.0]))
+    manager.update_room_temperature('Room 0', 20.0)
+    manager.update_room_temperature('Room 1', 18.0)
+    manager.update_room_temperature('Room 2', 22.0)
+
+    assert manager.get_room_with_highest_difference().name == 'Room 1'
+    assert manager.get_control_temperatures() == (21.0, 18.0)
+    assert [room.name for room in manager.get_top_demand_rooms(5)] == ['Room 1', 'Room 0']
+
+
+def test_leader_follows_temperature_changes():
+    manager = RoomManager(build_config([21.0, 21.0]))
+    manager.update_room_temperature('Room 0', 18.0)
+    manager.update_room_temperature('Room 1', 20.0)
+    assert manager.get_room_with_highest_difference().name == 'Room 0'
+
+    manager.update_room_temperature('Room 0', 21.5)
+    assert manager.get_room_with_highest_difference().name == 'Room 1'
+
+    manager.update_room_temperature('Room 1', 21.0)
+    assert manager.get_room_with_highest_difference() is None
+    assert manager.get_control_temperatures() is None
+
+
+def test_ties_go_to_the_room_configured_first():
+    manager = RoomManager(build_config([21.0, 21.0, 21.0]))
+    for name in ('Room 2', 'Room 0', 'Room 1'):
+        manager.update_room_temperature(name, 19.0)
+
+    assert manager.get_room_with_highest_difference().name == 'Room 0'
+
+
+def test_index_matches_linear_scan_under_random_updates():
+    rng = random.Random(7)
+    manager = RoomManager(build_config([20.0 + (i % 4) / 2 for i in range(20)]))
+    for _ in range(2000):
+        room = rng.choice(manager.rooms)
+        manager.update_room_temperature(room.name, round(rng.uniform(17.0, 23.0), 1))
+        assert manager.get_room_with_highest_difference() is linear_leader(manager)
+
+    # Removed entries do not pile up in the heap
+    assert len(manager._demand._heap) <= 2 * len(manager._demand) + 17
+
+
+def test_top_k_does_not_consume_the_index():
+    manager = RoomManager(build_config([21.0, 21.0, 21.0]))
+    for i, room in enumerate(manager.rooms):
+        manager.update_room_temperature(room.name, 18.0 + i)
+
+    first = manager.get_top_demand_rooms(2)
+    assert [room.name for room in first] == ['Room 0', 'Room 1']
+    assert manager.get_top_demand_rooms(2) == first
+    assert manager.get_room_with_highest_difference().name == 'Room 0'
+
+
+def test_changed_rooms_are_dirty_once():
+    manager = RoomManager(build_config([21.0, 21.0, 21.0]))
+    manager.update_room_temperature('Room 0', 20.0)
+    manager.update_room_temperature('Room 2', 20.0)
+    manager.update_room_temperature('Room 0', 19.5)
+
+    dirty = manager.pop_dirty_rooms()
+    assert [room.name for room in dirty] == ['Room 0', 'Room 2']
+    assert not any(room.dirty for room in manager.rooms)
+    assert manager.pop_dirty_rooms() == []
+
+
+def test_unchanged_temperature_does_not_mark_dirty():
+    manager = RoomManager(build_config([21.0, 21.0]))
+    assert manager.apply_entity_state('sensor.room_0', '20.0')
+    manager.pop_dirty_rooms()
+
+    assert not manager.apply_entity_state('sensor.room_0', '20.0')
+    assert not manager.apply_entity_state('sensor.room_0', 'unavailable')
+    assert not manager.apply_entity_state('sensor.unknown', '20.0')
+    assert manager.pop_dirty_rooms() == []
+
+
+def test_room_temperature_is_read_only():
+    manager = RoomManager(build_config([21.0]))
+    room = manager.rooms[0]
+    with pytest.raises(AttributeError):
+        room.current_temp = 18.0
+
+    manager.update_room_temperature('Room 0', 18.0)
+    assert room.current_temp == 18.0
+    assert manager.get_room_with_highest_difference() is room
+    assert manager.pop_dirty_rooms() == [room]
+
+
+def test_shared_sensor_updates_all_its_rooms():
+    config = build_config([21.0, 22.0])
+    config[1]['current_temp_sensor'] = 'sensor.room_0'
+    manager = RoomManager(config)
+
+    assert manager.apply_entity_state('sensor.room_0', '19.0')
+    assert [room.current_temp for room in manager.rooms] == [19.0, 19.0]
+    assert len(manager.pop_dirty_rooms()) == 2
+    assert manager.get_room_with_highest_difference().name == 'Room 1'
+
+
+@pytest.mark.parametrize('vector_engine', [False, True])
+def test_incremental_calculation_only_touches_given_rooms(vector_engine):
+    manager = RoomManager(build_config([21.0, 21.0]))
+    if vector_engine and not manager.enable_vector_engine():
+        pytest.skip('NumPy is not installed')
+    manager.update_room_temperature('Room 0', 19.0)
+    manager.update_room_temperature('Room 1', 19.0)
+
+    manager.calculate_rooms_hrv_positions(manager.pop_dirty_rooms()[:1])
+    positions = [room.hrv_valves[0].current_position for room in manager.rooms]
+    assert positions[0] > 0
+    assert positions[1] == 0.0
+
+
+@pytest.mark.parametrize('vector_engine', [False, True])
+def test_positions_do_not_depend_on_time_since_last_calculation(vector_engine, monkeypatch, clock):
+    monkeypatch.setattr(pid_controller, 'time', clock)
+    monkeypatch.setattr(vector_engine_module, 'time', clock)
+    full = RoomManager(build_config([21.0, 21.0]), pid_interval=5)
+    incremental = RoomManager(build_config([21.0, 21.0]), pid_interval=5)
+    if vector_engine and not (full.enable_vector_engine() and incremental.enable_vector_engine()):
+        pytest.skip('NumPy is not installed')
+
+    for cycle in range(12):
+        # Room 0 warms up on the first and the last cycle only
+        temperature = 19.0 if cycle == 0 else 19.5 if cycle < 11 else 20.0
+        for manager in (full, incremental):
+            manager.update_room_temperature('Room 0', temperature)
+            manager.update_room_temperature('Room 1', 18.0)
+        full.calculate_rooms_hrv_positions(full.rooms)
+        incremental.calculate_rooms_hrv_positions(incremental.pop_dirty_rooms())
+        clock.advance(5)
+
+    assert incremental.rooms[0].hrv_valves[0].current_position == pytest.approx(
+        full.rooms[0].hrv_valves[0].current_position
+    )
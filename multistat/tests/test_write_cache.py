@@ -0,0 +1,73 @@
+"""
+Tests for the write cache deadbands and forced refresh.
+"""
+import write_cache
+from write_cache import WriteCache
+
+
+def test_first_write_is_always_sent():
+    cache = WriteCache({'valve': 0.5})
+    assert cache.should_write('number.valve', 'position', 10.0, 'valve')
+
+
+def test_change_within_deadband_is_suppressed(monkeypatch, clock):
+    monkeypatch.setattr(write_cache, 'time', clock)
+    cache = WriteCache({'valve': 0.5})
+    cache.record('number.valve', 'position', 10.0)
+
+    assert not cache.should_write('number.valve', 'position', 10.4, 'valve')
+    assert cache.should_write('number.valve', 'position', 10.5, 'valve')
+    assert cache.suppressed == 1
+
+
+def test_unknown_value_type_needs_exact_match():
+    cache = WriteCache({'valve': 0.5})
+    cache.record('number.valve', 'position', 10.0)
+
+    assert not cache.should_write('number.valve', 'position', 10.0)
+    assert cache.should_write('number.valve', 'position', 10.1)
+
+
+def test_non_numeric_values_ignore_deadband():
+    cache = WriteCache({'valve': 0.5})
+    cache.record('fan.hrv', 'mode', 'on')
+
+    assert not cache.should_write('fan.hrv', 'mode', 'on', 'valve')
+    assert cache.should_write('fan.hrv', 'mode', 'auto', 'valve')
+    cache.record('switch.pump', 'state', True)
+    assert cache.should_write('switch.pump', 'state', False, 'valve')
+
+
+def test_refresh_interval_forces_write(monkeypatch, clock):
+    monkeypatch.setattr(write_cache, 'time', clock)
+    cache = WriteCache({'valve': 0.5}, refresh_interval=300)
+    cache.record('number.valve', 'position', 10.0)
+
+    clock.advance(299)
+    assert not cache.should_write('number.valve', 'position', 10.0, 'valve')
+    clock.advance(1)
+    assert cache.should_write('number.valve', 'position', 10.0, 'valve')
+
+
+def test_zero_refresh_interval_never_forces_write(monkeypatch, clock):
+    monkeypatch.setattr(write_cache, 'time', clock)
+    cache = WriteCache(refresh_interval=0)
+    cache.record('number.valve', 'position', 10.0)
+
+    clock.advance(1e6)
+    assert not cache.should_write('number.valve', 'position', 10.0)
+
+
+def test_invalidate_forgets_values():
+    cache = WriteCache()
+    cache.record('climate.a', 'temperature', 20.0)
+    cache.record('climate.a', 'mode', 'heat')
+    cache.record('climate.b', 'temperature', 20.0)
+
+    cache.invalidate('climate.a', 'temperature')
+    assert cache.should_write('climate.a', 'temperature', 20.0)
+    assert not cache.should_write('climate.a', 'mode', 'heat')
+
+    cache.invalidate('climate.a')
+    assert cache.should_write('climate.a', 'mode', 'heat')
+    assert not cache.should_write('climate.b', 'temperature', 20.0)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Cycle-latency benchmark for the MultiRoomThermostat control loop.
+
+Runs control cycles against the in-process fake Home Assistant for a
+matrix of room and valve counts and reports cycle latency percentiles,
+requests and bytes per cycle, CPU time and peak RSS. Results are written
+as JSON so runs of different versions can be compared:
+
+    python3 tools/bench_cycle_latency.py --output before.json
+    python3 tools/bench_cycle_latency.py --output after.json --compare before.json
+
+Every measured cycle runs all tasks of the multi-rate schedule. Each case
+runs in a fresh process so peak RSS is per case. CPU time and
+RSS include the fake Home Assistant, which runs in the same process.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+from typing import Dict, Any, List, Optional
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.dirname(TOOLS_DIR)
+APP_DIR = os.path.join(ADDON_DIR, 'rootfs', 'app')
+sys.path.insert(0, TOOLS_DIR)
+sys.path.insert(0, APP_DIR)
+
+from fake_ha import FakeHomeAssistant
+
+DEFAULT_ROOMS = [1, 10, 100, 1000]
+DEFAULT_VALVES = [0, 1, 2, 4, 8]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+async def run_case(rooms: int, valves: int, cycles: int, latency: float,
+                   change_fraction: float, use_websocket: bool, seed: int,
+                   pipelined: bool = False) -> Dict[str, Any]:
+    """Run one benchmark case and return its metrics."""
+    rng = random.Random(seed)
+
+    async with FakeHomeAssistant(latency=latency) as ha:
+        room_config = ha.add_rooms(rooms, valves)
+        options = {
+            'rooms': room_config,
+            'update_interval': 5,
+            'use_websocket': use_websocket,
+            'pipelined_loop': pipelined,
+        }
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(options, f)
+            options_path = f.name
+
+        os.environ['SUPERVISOR_URL'] = ha.url
+        from main import MultiRoomThermostat
+        logging.getLogger().setLevel(logging.WARNING)
+
+        app = MultiRoomThermostat(options_path)
+        await app.ha_api.start()
+        try:
+            if use_websocket:
+                await app.ha_api.subscribe_room_temperatures(
+                    app.room_manager,
+                    on_change=app._on_temperature_change
+                )
+                for _ in range(500):
+                    if app.ha_api.websocket.connected:
+                        break
+                    await asyncio.sleep(0.01)
+
+            # Warm-up cycle: sensor creation and service resolution
+            await app._run_cycle()
+            ha.reset_counters()
+            run_cycle = app._run_pipelined_cycle if pipelined else app._run_cycle
+
+            latencies = []
+            changes_per_cycle = int(round(rooms * change_fraction))
+            cpu_start = time.process_time()
+            for _ in range(cycles):
+                for index in rng.sample(range(rooms), changes_per_cycle):
+                    await ha.set_state(
+                        room_config[index]['current_temp_sensor'],
+                        round(rng.uniform(17.0, 23.0), 1)
+                    )
+                if use_websocket:
+                    # Let pushed changes reach the room manager
+                    await asyncio.sleep(0)
+                # Measure full cycles: every task is due, whatever its interval
+                for task in app.task_scheduler.tasks.values():
+                    task.next_due = None
+
+                start = time.perf_counter()
+                await run_cycle()
+                latencies.append(time.perf_counter() - start)
+            await app._wait_for_pending_writes()
+            cpu_time = time.process_time() - cpu_start
+
+            reuse_ratio = app.ha_api.get_connection_reuse_ratio()
+        finally:
+            await app.ha_api.stop()
+            os.unlink(options_path)
+
+    return {
+        'rooms': rooms,
+        'valves_per_room': valves,
+        'cycles': cycles,
+        'latency_ms': {
+            'p50': percentile(latencies, 50) * 1000,
+            'p95': percentile(latencies, 95) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+            'mean': sum(latencies) / len(latencies) * 1000,
+        },
+        'requests_per_cycle': ha.total_requests / cycles,
+        'bytes_in_per_cycle': ha.bytes_received / cycles,
+        'bytes_out_per_cycle': ha.bytes_sent / cycles,
+        'cpu_time_s': cpu_time,
+        'cpu_ms_per_cycle': cpu_time / cycles * 1000,
+        'connection_reuse_ratio': reuse_ratio,
+    }
+
+
+def _run_case_process(kwargs: Dict[str, Any], queue: multiprocessing.Queue):
+    """Run a case in a worker process and report it with its peak RSS."""
+    try:
+        result = asyncio.run(run_case(**kwargs))
+        # ru_maxrss is in kilobytes on Linux
+        result['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        queue.put(result)
+    except Exception as e:
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def run_case_isolated(context, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a case in a fresh process."""
+    # A plain process rather than a pool: the application installs its own
+    # SIGTERM handler, so pool workers would not exit on terminate()
+    queue = context.Queue()
+    process = context.Process(target=_run_case_process, args=(kwargs, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    if 'error' in result:
+        raise RuntimeError(f"Case {kwargs['rooms']} rooms x {kwargs['valves']} valves failed: {result['error']}")
+    return result
+
+
+def _metadata() -> Dict[str, Any]:
+    """Describe the environment and add-on version of a run."""
+    version = None
+    with open(os.path.join(ADDON_DIR, 'config.yaml')) as f:
+        for line in f:
+            if line.startswith('version:'):
+                version = line.split(':', 1)[1].strip().strip('"')
+                break
+
+    revision = None
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=ADDON_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'addon_version': version,
+        'git_revision': revision,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str):
+    """Print the change of each case against a previous results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r['rooms'], r['valves_per_room']): r for r in baseline['results']}
+
+    def delta(new: float, old: float) -> str:
+        if not old:
+            return 'n/a'
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    print(f"\nCompared with {baseline_path} ({baseline['metadata'].get('git_revision')})")
+    print(f"{'rooms':>6} {'valves':>6} {'p50':>9} {'p95':>9} {'req/cycle':>10} {'cpu/cycle':>10}")
+    for result in results:
+        old = previous.get((result['rooms'], result['valves_per_room']))
+        if old is None:
+            continue
+        print(
+            f"{result['rooms']:>6} {result['valves_per_room']:>6} "
+            f"{delta(result['latency_ms']['p50'], old['latency_ms']['p50']):>9} "
+            f"{delta(result['latency_ms']['p95'], old['latency_ms']['p95']):>9} "
+            f"{delta(result['requests_per_cycle'], old['requests_per_cycle']):>10} "
+            f"{delta(result['cpu_ms_per_cycle'], old['cpu_ms_per_cycle']):>10}"
+        )
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item]
+
+
+def main(argv: Optional[List[str]] = None):
+    """Run the benchmark matrix."""
+    parser = argparse.ArgumentParser(description='Benchmark control cycle latency')
+    parser.add_argument('--rooms', type=_int_list, default=DEFAULT_ROOMS,
+                        help='Comma separated room counts (default: 1,10,100,1000)')
+    parser.add_argument('--valves', type=_int_list, default=DEFAULT_VALVES,
+                        help='Comma separated valves per room (default: 0,1,2,4,8)')
+    parser.add_argument('--cycles', type=int, default=20, help='Measured cycles per case')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Latency added per request by the fake backend in seconds')
+    parser.add_argument('--change-fraction', type=float, default=0.1,
+                        help='Fraction of room sensors changed before each cycle')
+    parser.add_argument('--no-websocket', action='store_true',
+                        help='Poll temperatures over REST instead of the WebSocket API')
+    parser.add_argument('--pipelined', action='store_true',
+                        help='Measure pipelined cycles, whose writes overlap the next cycle')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='bench_cycle_latency.json', help='Results file')
+    parser.add_argument('--compare', help='Previous results file to compare with')
+    args = parser.parse_args(argv)
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    print(f"{'rooms':>6} {'valves':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'req/cycle':>10} {'KB/cycle':>9} {'cpu ms':>8} {'rss MB':>8}")
+    for rooms in args.rooms:
+        for valves in args.valves:
+            kwargs = {
+                'rooms': rooms,
+                'valves': valves,
+                'cycles': args.cycles,
+                'latency': args.latency,
+                'change_fraction': args.change_fraction,
+                'use_websocket': not args.no_websocket,
+                'seed': args.seed,
+                'pipelined': args.pipelined,
+            }
+            result = run_case_isolated(context, kwargs)
+            results.append(result)
+            kb = (result['bytes_in_per_cycle'] + result['bytes_out_per_cycle']) / 1024
+            print(
+                f"{rooms:>6} {valves:>6} "
+                f"{result['latency_ms']['p50']:>9.2f} {result['latency_ms']['p95']:>9.2f} "
+                f"{result['latency_ms']['p99']:>9.2f} {result['requests_per_cycle']:>10.1f} "
+                f"{kb:>9.1f} {result['cpu_ms_per_cycle']:>8.2f} "
+                f"{result['peak_rss_kb'] / 1024:>8.1f}"
+            )
+
+    report = {
+        'metadata': _metadata(),
+        'parameters': {
+            'cycles': args.cycles,
+            'latency': args.latency,
+            'change_fraction': args.change_fraction,
+            'use_websocket': not args.no_websocket,
+            'seed': args.seed,
+            'pipelined': args.pipelined,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for the room, valve and PID controller objects.
+
+Builds a RoomManager for a number of rooms and valves per room and reports
+the memory allocated per room (including its valves and PID controllers)
+and the time of one valve calculation over all rooms. Pass --app-dir to
+measure another checkout of the add-on, e.g. to compare two versions:
+
+    python3 tools/bench_memory.py --rooms 100,1000
+    python3 tools/bench_memory.py --rooms 100,1000 --app-dir /tmp/old/multistat/rootfs/app
+"""
+import os
+import gc
+import sys
+import time
+import logging
+import argparse
+import tracemalloc
+from typing import Dict, Any, List, Optional
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_APP_DIR = os.path.join(os.path.dirname(TOOLS_DIR), 'rootfs', 'app')
+DEFAULT_ROOMS = [10, 100, 1000, 10000]
+
+
+def build_config(rooms: int, valves: int) -> List[Dict[str, Any]]:
+    """Build a rooms configuration."""
+    return [
+        {
+            'name': f'Room {i}',
+            'target_temp': 20.0 + (i % 5) / 2,
+            'current_temp_sensor': f'sensor.room_{i}_temperature',
+            'hrv_entity': f'fan.room_{i}_hrv',
+            'hrv_valves': [
+                {
+                    'name': f'Room {i} Valve {v}',
+                    'valve_entity': f'number.room_{i}_valve_{v}',
+                    'kp': 1.0,
+                    'ki': 0.1,
+                    'kd': 0.05,
+                }
+                for v in range(valves)
+            ],
+        }
+        for i in range(rooms)
+    ]
+
+
+def run_case(room_manager_class, rooms: int, valves: int, repeats: int) -> Dict[str, Any]:
+    """Measure the footprint and calculation time for one room count."""
+    config = build_config(rooms, valves)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    manager = room_manager_class(config)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    for i, room in enumerate(manager.rooms):
+        manager.update_room_temperature(room.name, 18.0 + (i % 7) / 2)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for room in manager.rooms:
+            manager.calculate_hrv_positions(room)
+    calculate_time = (time.perf_counter() - start) / repeats
+
+    return {
+        'rooms': rooms,
+        'valves_per_room': valves,
+        'bytes_per_room': (after - before) / rooms,
+        'calculate_ms': calculate_time * 1000,
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item]
+
+
+def main(argv: Optional[List[str]] = None):
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description='Benchmark room state memory')
+    parser.add_argument('--rooms', type=_int_list, default=DEFAULT_ROOMS,
+                        help='Comma separated room counts (default: 10,100,1000,10000)')
+    parser.add_argument('--valves', type=int, default=2, help='Valves per room')
+    parser.add_argument('--repeats', type=int, default=20, help='Timed calculations per case')
+    parser.add_argument('--app-dir', default=DEFAULT_APP_DIR,
+                        help='Application directory to measure')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, args.app_dir)
+    from room_manager import RoomManager
+    # Valves import pid_controller (and NumPy with it) when the first one is
+    # built; import it now so the import is not traced as room memory
+    import pid_controller  # noqa: F401
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'rooms':>6} {'valves':>6} {'bytes/room':>11} {'calculate ms':>13}")
+    for rooms in args.rooms:
+        result = run_case(RoomManager, rooms, args.valves, args.repeats)
+        print(
+            f"{rooms:>6} {args.valves:>6} {result['bytes_per_room']:>11.0f} "
+            f"{result['calculate_ms']:>13.3f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
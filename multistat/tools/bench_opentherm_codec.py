@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the OpenTherm frame codec.
+
+Times decoding of a captured byte stream frame by frame and with NumPy:
+
+    python3 tools/bench_opentherm_codec.py --frames 1000,100000
+
+Exits with status 1 if a stream does not decode completely. The codec is
+checked against golden vectors in tests/test_opentherm_codec.py.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from typing import List, Optional
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(TOOLS_DIR), 'rootfs', 'app')
+sys.path.insert(0, APP_DIR)
+
+import opentherm_codec as codec
+
+DEFAULT_FRAMES = [1000, 10000, 100000]
+
+
+def build_stream(frames: int, seed: int) -> bytes:
+    """Build a byte stream of random valid responses."""
+    rng = random.Random(seed)
+    data_ids = list(codec.DATA_IDS)
+    return b''.join(
+        codec.encode_frame(codec.READ_ACK, rng.choice(data_ids), rng.getrandbits(16)).to_bytes(4, 'big')
+        for _ in range(frames)
+    )
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item]
+
+
+def main(argv: Optional[List[str]] = None):
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description='Check and benchmark the OpenTherm codec')
+    parser.add_argument('--frames', type=_int_list, default=DEFAULT_FRAMES,
+                        help='Comma separated stream lengths in frames (default: 1000,10000,100000)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed')
+    args = parser.parse_args(argv)
+
+    failures = 0
+
+    print(f"{'frames':>8} {'stream us/frame':>16} {'numpy us/frame':>15}")
+    for frames in args.frames:
+        data = build_stream(frames, args.seed)
+
+        start = time.perf_counter()
+        decoded = codec.decode_stream(data)
+        stream_time = time.perf_counter() - start
+        if len(decoded) != frames:
+            failures += 1
+            print(f"FAIL decoded {len(decoded)} of {frames} frames")
+
+        numpy_column = f"{'-':>15}"
+        if codec.np is not None:
+            start = time.perf_counter()
+            arrays = codec.decode_array(data)
+            numpy_time = time.perf_counter() - start
+            numpy_column = f"{numpy_time / frames * 1e6:>15.3f}"
+            if not arrays['valid'].all():
+                failures += 1
+                print("FAIL NumPy decode rejected valid frames")
+
+        print(f"{frames:>8} {stream_time / frames * 1e6:>16.3f} {numpy_column}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the NumPy vector engine against the per-object valve calculation.
+
+Builds rooms with HRV valves, steps both engines through the same sequence
+of temperatures and timestamps, and reports the time per full calculation
+and the largest difference between the valve positions of both paths:
+
+    python3 tools/bench_vector_engine.py --rooms 10,100,1000 --valves 2
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+from typing import Dict, Any, List, Optional
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(TOOLS_DIR), 'rootfs', 'app')
+sys.path.insert(0, APP_DIR)
+
+import pid_controller
+import vector_engine
+from room_manager import RoomManager
+
+DEFAULT_ROOMS = [10, 100, 1000, 5000]
+
+
+class ManualClock:
+    """Clock stand-in for the time module used by PIDController."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def build_rooms(rooms: int, valves: int, seed: int) -> List[Dict[str, Any]]:
+    """Build a rooms configuration with random gains."""
+    rng = random.Random(seed)
+    return [
+        {
+            'name': f'Room {i}',
+            'target_temp': round(rng.uniform(18.0, 22.0), 1),
+            'current_temp_sensor': f'sensor.room_{i}_temperature',
+            'hrv_valves': [
+                {
+                    'name': f'Room {i} Valve {v}',
+                    'valve_entity': f'number.room_{i}_valve_{v}',
+                    'kp': round(rng.uniform(0.5, 2.0), 2),
+                    'ki': round(rng.uniform(0.0, 0.3), 2),
+                    'kd': round(rng.uniform(0.0, 0.1), 2),
+                }
+                for v in range(valves)
+            ],
+        }
+        for i in range(rooms)
+    ]
+
+
+def run_case(rooms: int, valves: int, steps: int, interval: float, seed: int) -> Dict[str, Any]:
+    """Step both engines through the same inputs and compare them."""
+    config = build_rooms(rooms, valves, seed)
+    scalar = RoomManager(config)
+    vector = RoomManager(config)
+    vector.enable_vector_engine()
+
+    clock = ManualClock()
+    pid_controller.time = clock
+
+    rng = random.Random(seed + 1)
+    scalar_time = 0.0
+    vector_time = 0.0
+    max_difference = 0.0
+    for _ in range(steps):
+        clock.now += interval
+        for room_index in range(rooms):
+            temperature = round(rng.uniform(16.0, 24.0), 1)
+            scalar.update_room_temperature(f'Room {room_index}', temperature)
+            vector.update_room_temperature(f'Room {room_index}', temperature)
+
+        start = time.perf_counter()
+        scalar.calculate_rooms_hrv_positions()
+        scalar_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        vector.engine.calculate_hrv_positions(now=clock.now)
+        vector_time += time.perf_counter() - start
+
+        for scalar_room, vector_room in zip(scalar.rooms, vector.rooms):
+            for scalar_valve, vector_valve in zip(scalar_room.hrv_valves, vector_room.hrv_valves):
+                difference = abs(scalar_valve.current_position - vector_valve.current_position)
+                max_difference = max(max_difference, difference)
+
+    return {
+        'rooms': rooms,
+        'valves_per_room': valves,
+        'scalar_ms': scalar_time / steps * 1000,
+        'vector_ms': vector_time / steps * 1000,
+        'speedup': scalar_time / vector_time if vector_time else None,
+        'max_position_difference': max_difference,
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item]
+
+
+def main(argv: Optional[List[str]] = None):
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description='Benchmark the NumPy vector engine')
+    parser.add_argument('--rooms', type=_int_list, default=DEFAULT_ROOMS,
+                        help='Comma separated room counts (default: 10,100,1000,5000)')
+    parser.add_argument('--valves', type=int, default=2, help='Valves per room')
+    parser.add_argument('--steps', type=int, default=20, help='Calculations per case')
+    parser.add_argument('--interval', type=float, default=5.0, help='Seconds between calculations')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if not vector_engine.is_available():
+        print("NumPy is not installed")
+        sys.exit(1)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'rooms':>6} {'valves':>6} {'scalar ms':>10} {'vector ms':>10} {'speedup':>8} {'max diff':>10}")
+    for rooms in args.rooms:
+        result = run_case(rooms, args.valves, args.steps, args.interval, args.seed)
+        print(
+            f"{rooms:>6} {args.valves:>6} {result['scalar_ms']:>10.3f} {result['vector_ms']:>10.3f} "
+            f"{result['speedup']:>7.1f}x {result['max_position_difference']:>10.2e}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+In-process fake Home Assistant for integration tests and load benchmarks.
+
+Implements the parts of the Supervisor-proxied Home Assistant API used by
+the add-on:
+
+- GET/POST /core/api/states[/{entity_id}]
+- POST /core/api/services/{domain}/{service}
+- /core/websocket with auth, subscribe_entities and subscribe_trigger
+
+Latency, error injection, services rejected per entity domain and request
+counting are configurable, so requests per cycle and cycle latency can be
+measured offline.
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+from collections import Counter
+from typing import Optional, Dict, Any, List, Set, Tuple
+
+from aiohttp import web, WSMsgType
+
+logger = logging.getLogger(__name__)
+
+# Services and the state change they cause: (state field, attribute or None)
+SERVICE_EFFECTS = {
+    ('number', 'set_value'): ('value', None),
+    ('cover', 'set_cover_position'): ('position', 'current_position'),
+    ('climate', 'set_temperature'): ('temperature', 'temperature'),
+    ('climate', 'set_hvac_mode'): ('hvac_mode', None),
+    ('fan', 'set_preset_mode'): ('preset_mode', 'preset_mode'),
+    ('input_select', 'select_option'): ('option', None),
+}
+
+
+class FakeHomeAssistant:
+    """Fake Home Assistant server running on the current event loop."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, latency_jitter: float = 0.0,
+                 error_rate: float = 0.0, token: Optional[str] = None,
+                 support_subscribe_entities: bool = True,
+                 rejected_services: Optional[Dict[str, Set[str]]] = None):
+        """
+        Initialize fake server.
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+            latency: Delay added to every REST request in seconds
+            latency_jitter: Random extra delay up to this many seconds
+            error_rate: Probability of answering a REST request with a 500
+            token: Required access token (any token is accepted if None)
+            support_subscribe_entities: Reject subscribe_entities like older
+                Home Assistant versions when False
+            rejected_services: Services ('domain.service') rejected per entity
+                domain, in addition to services from other domains
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.token = token
+        self.support_subscribe_entities = support_subscribe_entities
+        self.rejected_services = rejected_services or {}
+
+        self.states: Dict[str, Dict[str, Any]] = {}
+        self.service_calls: List[Tuple[str, str, Dict[str, Any]]] = []
+        self.request_counts: Counter = Counter()
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+        self._fail_next = 0
+        self._subscribers: List[Tuple[web.WebSocketResponse, int, Optional[Set[str]], str]] = []
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as SUPERVISOR_URL."""
+        return f'http://{self.host}:{self.port}'
+
+    @property
+    def total_requests(self) -> int:
+        """Total number of REST requests served."""
+        return sum(self.request_counts.values())
+
+    async def start(self):
+        """Start serving."""
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get('/core/api/states', self._get_states)
+        app.router.add_get('/core/api/states/{entity_id}', self._get_state)
+        app.router.add_post('/core/api/states/{entity_id}', self._post_state)
+        app.router.add_post('/core/api/services/{domain}/{service}', self._call_service)
+        app.router.add_get('/core/websocket', self._websocket)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        logger.info(f"Fake Home Assistant listening on {self.url}")
+
+    async def stop(self):
+        """Stop serving and close WebSocket subscribers."""
+        await self.close_websockets()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def close_websockets(self):
+        """Close all WebSocket connections, as a Home Assistant restart does."""
+        for ws, _, _, _ in list(self._subscribers):
+            await ws.close()
+        self._subscribers.clear()
+
+    async def __aenter__(self) -> 'FakeHomeAssistant':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def reset_counters(self):
+        """Reset request, byte and service call counters."""
+        self.request_counts.clear()
+        self.service_calls.clear()
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+    def fail_next(self, count: int = 1):
+        """Answer the next count REST requests with a 500."""
+        self._fail_next += count
+
+    def add_entity(self, entity_id: str, state: Any, attributes: Optional[Dict[str, Any]] = None):
+        """Add an entity without notifying subscribers."""
+        now = time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime())
+        self.states[entity_id] = {
+            'entity_id': entity_id,
+            'state': str(state),
+            'attributes': dict(attributes or {}),
+            'last_changed': now,
+            'last_updated': now,
+            'context': {'id': f'{random.getrandbits(64):016x}', 'parent_id': None, 'user_id': None}
+        }
+
+    async def set_state(self, entity_id: str, state: Any, attributes: Optional[Dict[str, Any]] = None):
+        """Change an entity state and push the change to subscribers."""
+        if entity_id not in self.states:
+            self.add_entity(entity_id, state, attributes)
+        else:
+            self.states[entity_id]['state'] = str(state)
+            if attributes:
+                self.states[entity_id]['attributes'].update(attributes)
+        await self._notify(entity_id)
+
+    def add_rooms(self, count: int, valves_per_room: int = 1, base_temp: float = 19.0) -> List[Dict[str, Any]]:
+        """
+        Create sensor, HRV and valve entities for count rooms.
+
+        Returns:
+            Room configuration in the add-on options format
+        """
+        rooms = []
+        for i in range(count):
+            sensor = f'sensor.room_{i}_temperature'
+            hrv = f'fan.room_{i}_hrv'
+            self.add_entity(sensor, round(base_temp + (i % 7) * 0.3, 1),
+                            {'unit_of_measurement': '°C', 'device_class': 'temperature'})
+            self.add_entity(hrv, 'on', {'preset_mode': 'auto'})
+            valves = []
+            for j in range(valves_per_room):
+                valve = f'number.room_{i}_valve_{j}'
+                self.add_entity(valve, 0.0, {'min': 0, 'max': 100})
+                valves.append({'name': f'Room {i} Valve {j}', 'valve_entity': valve,
+                               'kp': 1.0, 'ki': 0.1, 'kd': 0.05})
+            rooms.append({
+                'name': f'Room {i}',
+                'target_temp': 21.0,
+                'current_temp_sensor': sensor,
+                'hrv_entity': hrv,
+                'hrv_valves': valves
+            })
+        return rooms
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        """Count requests and bytes, and inject latency and errors."""
+        if request.path == '/core/websocket':
+            return await handler(request)
+
+        if self.token is not None and request.headers.get('Authorization') != f'Bearer {self.token}':
+            return web.json_response({'message': 'Unauthorized'}, status=401)
+
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        self.request_counts[f'{request.method} {route}'] += 1
+        self.bytes_received += request.content_length or 0
+
+        delay = self.latency + random.uniform(0, self.latency_jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self._fail_next or (self.error_rate and random.random() < self.error_rate):
+            self._fail_next = max(0, self._fail_next - 1)
+            response = web.json_response({'message': 'Injected error'}, status=500)
+        else:
+            response = await handler(request)
+
+        if response.body is not None:
+            self.bytes_sent += len(response.body)
+        return response
+
+    async def _get_states(self, request: web.Request) -> web.Response:
+        return web.json_response(list(self.states.values()))
+
+    async def _get_state(self, request: web.Request) -> web.Response:
+        state = self.states.get(request.match_info['entity_id'])
+        if state is None:
+            return web.json_response({'message': 'Entity not found.'}, status=404)
+        return web.json_response(state)
+
+    async def _post_state(self, request: web.Request) -> web.Response:
+        entity_id = request.match_info['entity_id']
+        data = await request.json()
+        created = entity_id not in self.states
+        if created:
+            self.add_entity(entity_id, data.get('state', 'unknown'), data.get('attributes'))
+        else:
+            self.states[entity_id]['state'] = str(data.get('state', 'unknown'))
+            self.states[entity_id]['attributes'] = dict(data.get('attributes') or {})
+        await self._notify(entity_id)
+        return web.json_response(self.states[entity_id], status=201 if created else 200)
+
+    async def _call_service(self, request: web.Request) -> web.Response:
+        domain = request.match_info['domain']
+        service = request.match_info['service']
+        data = await request.json()
+        entity_ids = data.get('entity_id', [])
+        if isinstance(entity_ids, str):
+            entity_ids = [entity_ids]
+
+        effect = SERVICE_EFFECTS.get((domain, service))
+        if effect is None:
+            return web.json_response({'message': f'Service {domain}.{service} not found.'}, status=400)
+
+        for entity_id in entity_ids:
+            if not self._accepts_service(entity_id, domain, service):
+                return web.json_response(
+                    {'message': f'{entity_id} does not support {domain}.{service}'}, status=400
+                )
+
+        self.service_calls.append((domain, service, data))
+        field, attribute = effect
+        changed = []
+        for entity_id in entity_ids:
+            if entity_id not in self.states:
+                self.add_entity(entity_id, 'unknown')
+            if attribute:
+                self.states[entity_id]['attributes'][attribute] = data.get(field)
+            else:
+                self.states[entity_id]['state'] = str(data.get(field))
+            changed.append(self.states[entity_id])
+            await self._notify(entity_id)
+        return web.json_response(changed)
+
+    def _accepts_service(self, entity_id: str, domain: str, service: str) -> bool:
+        """Check if an entity accepts a service."""
+        entity_domain = entity_id.split('.', 1)[0]
+        if entity_domain != domain:
+            return False
+        return f'{domain}.{service}' not in self.rejected_services.get(entity_domain, set())
+
+    async def _websocket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.request_counts['WS /core/websocket'] += 1
+
+        await self._ws_send(ws, {'type': 'auth_required', 'ha_version': '2024.1.0'})
+        msg = await ws.receive_json()
+        if msg.get('type') != 'auth' or (self.token is not None and msg.get('access_token') != self.token):
+            await self._ws_send(ws, {'type': 'auth_invalid', 'message': 'Invalid access token'})
+            await ws.close()
+            return ws
+        await self._ws_send(ws, {'type': 'auth_ok', 'ha_version': '2024.1.0'})
+
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    break
+                self.bytes_received += len(msg.data)
+                await self._handle_ws_command(ws, msg.json())
+        finally:
+            self._subscribers = [sub for sub in self._subscribers if sub[0] is not ws]
+        return ws
+
+    async def _handle_ws_command(self, ws: web.WebSocketResponse, command: Dict[str, Any]):
+        msg_id = command.get('id')
+        command_type = command.get('type')
+
+        if command_type == 'subscribe_entities' and self.support_subscribe_entities:
+            entity_ids = set(command.get('entity_ids') or self.states)
+            self._subscribers.append((ws, msg_id, entity_ids, 'entities'))
+            await self._ws_send(ws, {'id': msg_id, 'type': 'result', 'success': True, 'result': None})
+            await self._ws_send(ws, {'id': msg_id, 'type': 'event', 'event': {'a': {
+                entity_id: self._compressed(self.states[entity_id])
+                for entity_id in entity_ids if entity_id in self.states
+            }}})
+        elif command_type == 'subscribe_trigger':
+            entity_ids = command.get('trigger', {}).get('entity_id', [])
+            if isinstance(entity_ids, str):
+                entity_ids = [entity_ids]
+            self._subscribers.append((ws, msg_id, set(entity_ids), 'trigger'))
+            await self._ws_send(ws, {'id': msg_id, 'type': 'result', 'success': True, 'result': None})
+        elif command_type == 'ping':
+            await self._ws_send(ws, {'id': msg_id, 'type': 'pong'})
+        else:
+            await self._ws_send(ws, {
+                'id': msg_id, 'type': 'result', 'success': False,
+                'error': {'code': 'unknown_command', 'message': 'Unknown command.'}
+            })
+
+    async def _notify(self, entity_id: str):
+        """Push a state change to the WebSocket subscribers."""
+        state = self.states[entity_id]
+        for ws, msg_id, entity_ids, kind in list(self._subscribers):
+            if entity_ids is not None and entity_id not in entity_ids:
+                continue
+            if kind == 'entities':
+                compressed = self._compressed(state)
+                event = {'c': {entity_id: {'+': {'s': compressed['s'], 'a': compressed['a']}}}}
+            else:
+                event = {'variables': {'trigger': {
+                    'platform': 'state', 'entity_id': entity_id, 'to_state': state
+                }}}
+            try:
+                await self._ws_send(ws, {'id': msg_id, 'type': 'event', 'event': event})
+            except ConnectionError:
+                pass
+
+    async def _ws_send(self, ws: web.WebSocketResponse, message: Dict[str, Any]):
+        data = json.dumps(message)
+        self.bytes_sent += len(data)
+        await ws.send_str(data)
+
+    @staticmethod
+    def _compressed(state: Dict[str, Any]) -> Dict[str, Any]:
+        """Compressed state format used by subscribe_entities."""
+        return {'s': state['state'], 'a': state['attributes'], 'c': state['context']['id'], 'lc': 0}
+
+
+async def _serve(args: argparse.Namespace):
+    ha = FakeHomeAssistant(port=args.port, latency=args.latency, error_rate=args.error_rate)
+    rooms = ha.add_rooms(args.rooms, args.valves)
+    await ha.start()
+    print(f"SUPERVISOR_URL={ha.url}")
+    print(f"Created {len(rooms)} rooms with {args.valves} valves each")
+    try:
+        while True:
+            await asyncio.sleep(args.report_interval)
+            print(f"{ha.total_requests} requests, {ha.bytes_received} bytes in, {ha.bytes_sent} bytes out")
+    finally:
+        await ha.stop()
+
+
+def main():
+    """Run the fake server standalone."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8123)
+    parser.add_argument('--rooms', type=int, default=10)
+    parser.add_argument('--valves', type=int, default=1, help='Valves per room')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added per request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Probability of a 500 response')
+    parser.add_argument('--report-interval', type=float, default=10.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()